@@ -0,0 +1,138 @@
+"""
+Bounded background writer for measurement output.
+
+run_test hands the fetched data to the writer and returns immediately, so the SMUs can be released and
+the next device started while the file is still being written. The queue is bounded: if the disk falls
+behind by more than max_pending sweeps, submit() blocks instead of letting memory grow.
+"""
+
+import atexit
+import queue
+import threading
+import time
+import traceback
+
+
+class WriteFailure:
+    __slots__ = ("description", "error", "when")
+
+    def __init__(self, description, error):
+        self.description = description
+        self.error = error
+        self.when = time.time()
+
+    def __repr__(self):
+        return f"WriteFailure({self.description!r}, {self.error!r})"
+
+
+class BackgroundWriter:
+    def __init__(self, max_pending=8, num_workers=1, on_error=None):
+        """
+        :param max_pending: maximum number of queued writes before submit() blocks
+        :param num_workers: number of writer threads
+        :param on_error: optional callback(WriteFailure), called from the writer thread
+        """
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.on_error = on_error
+        self.failures = []
+        self._lock = threading.Lock()
+        self._closed = False
+        # set by close(): workers exit after their current write instead of draining the queue
+        self._stopping = threading.Event()
+        self._workers = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._run, name=f"BackgroundWriter-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, func, *args, description="", **kwargs):
+        """
+        Queue func(*args, **kwargs). A return value of False or an exception counts as a failure.
+        """
+        if self._closed:
+            raise RuntimeError("BackgroundWriter is closed")
+        self._queue.put((func, args, kwargs, description or getattr(func, "__name__", "write")))
+
+    @property
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            func, args, kwargs, description = item
+            try:
+                result = func(*args, **kwargs)
+                if result is False:
+                    self._report(description, RuntimeError("write returned False"))
+            except Exception as e:
+                traceback.print_exc()
+                self._report(description, e)
+            finally:
+                self._queue.task_done()
+            if self._stopping.is_set():
+                return
+
+    def _report(self, description, error):
+        failure = WriteFailure(description, error)
+        with self._lock:
+            self.failures.append(failure)
+        print(f"Background write failed: {description}: {error}")
+        if self.on_error:
+            try:
+                self.on_error(failure)
+            except Exception as e:
+                print(f"Error in write failure callback: {e}")
+
+    def pop_failures(self):
+        with self._lock:
+            failures, self.failures = self.failures, []
+        return failures
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued write has finished. Returns False if the timeout expired first.
+        """
+        if timeout is None:
+            self._queue.join()
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=None):
+        if self._closed:
+            return
+        flushed = self.flush(timeout)
+        self._closed = True
+        self._stopping.set()
+        # wake idle workers; never block here, a full queue means the workers are busy and will see the stop flag
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        if not flushed:
+            print(f"BackgroundWriter closed with {self.pending} write(s) still pending")
+
+
+_default_writer = None
+_default_lock = threading.Lock()
+
+
+def get_writer():
+    """
+    Shared writer for the application, flushed automatically at interpreter exit.
+    """
+    global _default_writer
+    with _default_lock:
+        if _default_writer is None:
+            _default_writer = BackgroundWriter()
+            atexit.register(_default_writer.close)
+        return _default_writer
@@ -0,0 +1,234 @@
+"""
+Headless batch runner for the LIV, EAM and Spectrum tests.
+
+Runs the same controllers as main_gui.py from a YAML or JSON job file, without building the Tk window
+or importing matplotlib/PIL, so it can run unattended on a station without a display.
+
+Job file:
+    data_path: D:/Data/Lot42             # default for every job
+    temperature: 25
+    output_format: store                 # controller attributes may be set globally or per job
+    jobs:
+      - test: LIV
+        devices: [AA1234, AA1235]        # or device_id: AA1234
+        params_laser: {start: 0, stop: 100, num_points: 21}
+      - test: Spectrum
+        device_id: AA1234
+        params_spectrum: {osa_type: ms9710c, osa_ip: "ASRL1::INSTR"}
+        repeat: 2
+
+usage: python batch_runner.py jobs.yaml [--dry-run] [--trace trace.json|trace.csv]
+                               [--record session.visa.json.gz | --replay session.visa.json.gz [--latency-scale 0]]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+TESTS = ("LIV", "EAM", "Spectrum")
+PARAM_SETS = ("params_photodetector", "params_laser", "params_eam", "params_spectrum")
+# Controller attributes a job may set
+CONTROLLER_OPTIONS = ("output_format", "background_write", "plot_mode", "spectrum_output",
+                      "smu_setup_timeout", "osa_setup_timeout")
+JOB_KEYS = {"test", "device_id", "devices", "temperature", "data_path", "repeat",
+            *PARAM_SETS, *CONTROLLER_OPTIONS}
+
+
+def load_job_file(path):
+    """
+    Read a job file (.yaml/.yml or .json). Top level keys other than 'jobs' are defaults for every job.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f"{path}: PyYAML is needed for YAML job files (pip install pyyaml), or use JSON")
+            config = yaml.safe_load(f)
+        else:
+            config = json.load(f)
+    if not isinstance(config, dict) or not isinstance(config.get("jobs"), list):
+        raise ValueError(f"{path}: expected a mapping with a 'jobs' list")
+
+    defaults = {k: v for k, v in config.items() if k != "jobs"}
+    jobs = []
+    for i, job in enumerate(config["jobs"]):
+        merged = {**defaults, **job}
+        for key in PARAM_SETS:  # parameter overrides are merged key by key
+            if key in defaults and key in job:
+                merged[key] = {**defaults[key], **job[key]}
+        unknown = set(merged) - JOB_KEYS
+        if unknown:
+            raise ValueError(f"Job {i + 1}: unknown keys {sorted(unknown)}")
+        if merged.get("test") not in TESTS:
+            raise ValueError(f"Job {i + 1}: 'test' must be one of {TESTS}, got {merged.get('test')!r}")
+        jobs.append(merged)
+    return jobs
+
+
+def make_controller(test):
+    # Imported here so --help and job file errors do not wait for the instrument drivers to load
+    from test_classes import LIV, EAM, Spectrum
+    return {"LIV": LIV, "EAM": EAM, "Spectrum": Spectrum}[test]()
+
+
+def apply_job(controller, job):
+    """
+    Apply the parameter overrides and options of a job to a controller, converting values with the
+    controller's parameter metadata as the GUI entries do.
+    """
+    from utils import string_to_num
+    metadata = {}
+    for _, param_config, params_dict, _ in controller.param_sets:
+        for key, (_, data_type, options) in param_config.items():
+            metadata[id(params_dict), key] = (data_type, options)
+
+    for set_name in PARAM_SETS:
+        overrides = job.get(set_name)
+        if not overrides:
+            continue
+        params_dict = getattr(controller, set_name)
+        for key, value in overrides.items():
+            if (id(params_dict), key) not in metadata:
+                raise ValueError(f"{controller.name}: unknown parameter {set_name}.{key}")
+            data_type, options = metadata[id(params_dict), key]
+            if options and value not in [script_value for _, script_value in options]:
+                raise ValueError(f"{controller.name}: {set_name}.{key} must be one of "
+                                 f"{[script_value for _, script_value in options]}, got {value!r}")
+            if value is not None and data_type in (int, float):
+                converted = string_to_num(str(value), data_type)
+                if converted is None:
+                    raise ValueError(f"{controller.name}: invalid value {value!r} for {set_name}.{key}")
+                value = converted
+            elif value is not None and data_type == str:
+                value = str(value)
+            params_dict[key] = value
+
+    for option in CONTROLLER_OPTIONS:
+        if option in job:
+            setattr(controller, option, job[option])
+
+
+def job_devices(job):
+    devices = job.get("devices")
+    if devices is None:
+        devices = [job.get("device_id", "")]
+    return [str(d) for d in devices] * int(job.get("repeat", 1))
+
+
+def run_jobs(jobs, dry_run=False):
+    """
+    Run every job in order. Returns the number of failed runs.
+    """
+    controllers = {}
+    failures = 0
+    runs = 0
+    try:
+        for i, job in enumerate(jobs):
+            test = job["test"]
+            if test not in controllers:
+                controllers[test] = make_controller(test)
+            controller = controllers[test]
+            apply_job(controller, job)
+            data_path = job.get("data_path", "")
+            if data_path:
+                # the controllers expect the folder with a trailing separator, as the GUI passes it
+                data_path = os.path.join(data_path, "")
+            temperature = job.get("temperature", "")
+            temperature = "" if temperature in ("", None) else str(float(temperature))
+            if data_path:
+                os.makedirs(data_path, exist_ok=True)
+
+            for device_id in job_devices(job):
+                runs += 1
+                print(f"\n=== Job {i + 1}/{len(jobs)}: {test} '{device_id}' at {temperature or '-'}°C -> {data_path or '.'} ===")
+                if dry_run:
+                    continue
+                timestamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+                start = time.perf_counter()
+                controller.last_run = None
+                try:
+                    controller.run_test(data_path=data_path, device_id=device_id, temperature=temperature,
+                                        timestamp=timestamp)
+                except Exception as e:
+                    failures += 1
+                    print(f"Error during {test} test of '{device_id}': {e}")
+                else:
+                    # run_test handles its own errors (e.g. no SMU connection) and only marks the run as failed
+                    if controller.last_run is None or controller.last_run.status != "ok":
+                        failures += 1
+                        print(f"{test} test of '{device_id}' failed")
+                print(f"{test} '{device_id}' finished in {time.perf_counter() - start:.1f} s")
+    finally:
+        if not dry_run and controllers:
+            from async_writer import get_writer
+            writer = get_writer()
+            print("\nFlushing pending measurement writes...")
+            writer.flush()
+            for failure in writer.pop_failures():
+                failures += 1
+                print(f"Saving failed: {failure.description}: {failure.error}")
+        for controller in controllers.values():
+            controller.close_smus()
+        if not dry_run and controllers:
+            from run_telemetry import get_throughput_monitor
+            print(f"Throughput: {get_throughput_monitor().summary()}")
+
+    print(f"\n{runs} run(s){' validated' if dry_run else ''}, {failures} failure(s)")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run LIV/EAM/Spectrum tests headless from a YAML or JSON job file")
+    parser.add_argument("job_file", help="job file (.yaml, .yml or .json)")
+    parser.add_argument("--dry-run", action="store_true", help="validate the job file and list the runs")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="trace instrument I/O and save it to PATH (.csv: every call, .json: latency summary)")
+    session = parser.add_mutually_exclusive_group()
+    session.add_argument("--record", metavar="PATH", help="record the instrument sessions (SCPI transcript) to PATH")
+    session.add_argument("--replay", metavar="PATH",
+                         help="run offline, answering instrument I/O from a session recorded with --record")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="replay: scale of the recorded latencies (0 = as fast as possible)")
+    parser.add_argument("--strict", action="store_true", help="replay: fail on the first command that differs")
+    args = parser.parse_args(argv)
+
+    if args.record or args.replay:
+        import visa_session
+        if args.record:
+            visa_session.start_recording()
+        else:
+            try:
+                visa_session.start_replay(args.replay, latency_scale=args.latency_scale, strict=args.strict)
+            except (OSError, ValueError) as e:
+                print(f"Error: {e}")
+                return 2
+
+    tracer = None
+    if args.trace:
+        from scpi_trace import get_tracer
+        tracer = get_tracer()
+        tracer.enable()
+    try:
+        jobs = load_job_file(args.job_file)
+        return 1 if run_jobs(jobs, dry_run=args.dry_run) else 0
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 2
+    finally:
+        if tracer is not None:
+            print(f"Instrument I/O trace saved to {tracer.export(args.trace)}")
+        if args.record:
+            visa_session.stop_recording(args.record, metadata={"job_file": os.path.abspath(args.job_file)})
+            print(f"Instrument session recorded to {args.record}")
+        elif args.replay:
+            for name, counts in visa_session.stop_replay().report().items():
+                print(f"Replay {name}: {counts['calls']} recorded calls, {counts['unused']} unused, "
+                      f"{counts['skipped']} skipped")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,63 +1,25 @@
+import collections
+import glob
 import os
+import sys
+import time
 import tkinter as tk
 import re
 import pandas as pd
-import math
 from datetime import datetime
 from openpyxl.styles import Font
 import numpy as np
 from test_classes import Base
-
-def linear_regression(x, y):
-    """
-    Custom linear regression function using numpy to replace scipy.stats.linregress
-    Returns slope, intercept, r_value, p_value, std_err
-    """
-    n = len(x)
-    if n < 2:
-        return np.nan, np.nan, np.nan, np.nan, np.nan
-
-    x = np.array(x)
-    y = np.array(y)
-
-    # Calculate means
-    x_mean = np.mean(x)
-    y_mean = np.mean(y)
-
-    # Calculate slope and intercept
-    numerator = np.sum((x - x_mean) * (y - y_mean))
-    denominator = np.sum((x - x_mean) ** 2)
-
-    if denominator == 0:
-        return np.nan, np.nan, np.nan, np.nan, np.nan
-
-    slope = numerator / denominator
-    intercept = y_mean - slope * int(x_mean)
-
-    # Calculate correlation coefficient (r_value)
-    y_pred = slope * x + intercept
-    ss_res = np.sum((y - y_pred) ** 2)
-    ss_tot = np.sum((y - y_mean) ** 2)
-
-    if ss_tot == 0:
-        r_value = np.nan
-    else:
-        r_squared = 1 - (ss_res / ss_tot)
-        r_value = np.sqrt(r_squared) if r_squared >= 0 else -np.sqrt(-r_squared)
-        if slope < 0:
-            r_value = -r_value
-
-    # Calculate standard error of slope
-    if n > 2:
-        s_y = np.sqrt(ss_res / (n - 2))
-        std_err = s_y / np.sqrt(denominator)
-    else:
-        std_err = np.nan
-
-    # p_value calculation is complex, so we'll return NaN for simplicity
-    p_value = np.nan
-
-    return slope, intercept, r_value, p_value, std_err
+from liv_analysis import linear_regression, analyze_liv_folder
+from spectrum_analysis import analyze_spectrum_folder
+from plot_renderer import get_renderer
+from device_metrics import extinction_ratio, load_metrics
+from measurement_store import MeasurementStore, default_store_root, store_sources
+from spectrum_archive import archive_row_sources
+from lot_summary import update_lot_summary
+from extraction_pipeline import (ExtractionPipeline, WorkbookSink, CsvSink, DatabaseSink, export_measurements,
+                                 is_lot_archive, lot_archive_stem)
+from results_db import ResultsDB, TESTS, default_db_path
 
 def extract_date_from_filename(filename):
     """
@@ -86,11 +48,38 @@ def extract_date_from_filename(filename):
         print(f"  Error extracting date from {filename}: {e}")
         return np.nan
 
+def measurement_sources(input_dir, marker):
+    """
+    (filename, loader) pairs for every sweep whose name contains marker, from Excel files
+    and from the measurement store of the folder. loader() returns the sweep as a DataFrame.
+    """
+    sources = dict(store_sources(input_dir, marker))
+    for filename in os.listdir(input_dir):
+        if filename.endswith(".xlsx") and marker in filename and filename not in sources:
+            sources[filename] = lambda p=os.path.join(input_dir, filename): pd.read_excel(p)
+    return list(sources.items())
+
+def spectrum_row_sources(input_dir):
+    """
+    (filename, loader) pairs for every spectrum analysis row, from pkpow_pkwl_smsr CSV files
+    and from the spectrum archive of the folder. loader() returns a one-row DataFrame.
+    """
+    sources = dict(archive_row_sources(input_dir))
+    for filename in os.listdir(input_dir):
+        if filename.endswith(".csv") and "pkpow_pkwl_smsr_" in filename and filename not in sources:
+            sources[filename] = lambda p=os.path.join(input_dir, filename): pd.read_csv(p)
+    return list(sources.items())
+
 class Extraction(Base):
     path = ""
+    # "summary": Run updates lot_summary.xlsx incrementally; "timestamped": Run writes the four timestamped reports
+    report_mode = "summary"
+    # Worker processes for the streaming measurement export
+    jobs = max(1, (os.cpu_count() or 2) - 1)
+
     def setup_tab(self, parent):
 
-        tk.Label(parent, text="Click \"Run\" to run all 4").grid(row=0, column=0, pady=2)
+        tk.Label(parent, text="Click \"Run\" to update the lot summary").grid(row=0, column=0, pady=2)
 
         liv_button = tk.Button(parent, text="LIV Data", command= lambda: self.get_LIV_data(self.path),
                                     bg='#2196F3', fg='white', font=('Arial', 8, 'bold'), relief='raised')
@@ -108,8 +97,40 @@ class Extraction(Base):
                                     bg='#2196F3', fg='white', font=('Arial', 8, 'bold'), relief='raised')
         org_data_button.grid(row=4, column=0, pady=2, sticky="W")
 
+        liv_analysis_button = tk.Button(parent, text="LIV Analysis (dL/dI)", command=lambda: analyze_liv_folder(self.path),
+                                        bg='#2196F3', fg='white', font=('Arial', 8, 'bold'), relief='raised')
+        liv_analysis_button.grid(row=5, column=0, pady=2, sticky="W")
+
+        metrics_button = tk.Button(parent, text="Metrics Summary", command=lambda: self.get_metrics_summary(self.path),
+                                   bg='#2196F3', fg='white', font=('Arial', 8, 'bold'), relief='raised')
+        metrics_button.grid(row=6, column=0, pady=2, sticky="W")
+
+        export_button = tk.Button(parent, text="Export Store to Excel", command=lambda: self.export_store_excel(self.path),
+                                  bg='#2196F3', fg='white', font=('Arial', 8, 'bold'), relief='raised')
+        export_button.grid(row=7, column=0, pady=2, sticky="W")
+
+        spectrum_analysis_button = tk.Button(parent, text="Reanalyze Spectra", command=lambda: analyze_spectrum_folder(self.path),
+                                             bg='#2196F3', fg='white', font=('Arial', 8, 'bold'), relief='raised')
+        spectrum_analysis_button.grid(row=8, column=0, pady=2, sticky="W")
+
+        render_button = tk.Button(parent, text="Render Spectrum Images", command=lambda: self.render_spectrum_images(self.path),
+                                  bg='#2196F3', fg='white', font=('Arial', 8, 'bold'), relief='raised')
+        render_button.grid(row=9, column=0, pady=2, sticky="W")
+
+        summary_button = tk.Button(parent, text="Update Lot Summary", command=lambda: self.update_summary(self.path),
+                                   bg='#2196F3', fg='white', font=('Arial', 8, 'bold'), relief='raised')
+        summary_button.grid(row=10, column=0, pady=2, sticky="W")
+
+        export_measurements_button = tk.Button(parent, text="Export Measurements",
+                                               command=lambda: self.export_measurements(self.path),
+                                               bg='#2196F3', fg='white', font=('Arial', 8, 'bold'), relief='raised')
+        export_measurements_button.grid(row=11, column=0, pady=2, sticky="W")
+
     def run_test(self, data_path="", device_id="", temperature="", timestamp=""):
         print(f"Running Data Extraction at {data_path}")
+        if self.report_mode == "summary":
+            self.update_summary(str(data_path))
+            return
         self.get_LIV_data(str(data_path))
         self.get_extinction(str(data_path))
         self.get_spectrum_data(str(data_path))
@@ -122,7 +143,7 @@ class Extraction(Base):
             return
         results = []
 
-        for filename in os.listdir(input_dir):
+        for filename, load_sweep in measurement_sources(input_dir, "_LIV_"):
             if filename.endswith(".xlsx") and "_LIV_" in filename and not filename.startswith('~'):
                 # Chip Name
                 chip_name = None
@@ -140,7 +161,7 @@ class Extraction(Base):
                 file_date = extract_date_from_filename(filename)
 
                 try:
-                    df = pd.read_excel(filepath)
+                    df = load_sweep()
                     pd_current = [None, None, None, None, None]
                     current_intercept = None
 
@@ -222,7 +243,7 @@ class Extraction(Base):
         bold_flags_80 = []
         bold_flags_100 = []
 
-        for filename in os.listdir(input_dir):
+        for filename, load_sweep in measurement_sources(input_dir, "_EAM_"):
             if filename.endswith(".xlsx") and "_EAM_" in filename and not filename.startswith('~'):
                 chip_name = None
                 bold = False
@@ -237,30 +258,12 @@ class Extraction(Base):
                     print(f"Error extracting chip name from {filename}: {e}")
                     continue
 
-                file_path = os.path.join(input_dir, filename)
-                df = pd.read_excel(file_path)
+                df = load_sweep()
                 ext_i = df.iat[1, 5]
                 ext_f = df.iat[31, 5]
 
                 if pd.notna(ext_i) and pd.notna(ext_f):
-                    numer = abs(ext_f)
-                    denom = abs(ext_i)
-
-                    # Determine if subtraction should occur
-                    if numer > 0.111 and denom > 0.111:
-                        numer -= 0.111
-                        denom -= 0.111
-                    else:
-                        bold = True
-
-                    # Attempt to calculate ext value
-                    if denom != 0 and numer > 0:
-                        ext_val = 10 * math.log10(numer / denom)
-
-                    else:
-                        print("Math Error")
-                        ext_val = f"{ext_i},{ext_f}"
-
+                    ext_val, bold = extinction_ratio(ext_i, ext_f)
                 else:
                     print("Error: Unsuccessful Extraction of PD Current Values")
 
@@ -318,7 +321,7 @@ class Extraction(Base):
         chip_names = []
 
         # Get chip names
-        for filename in os.listdir(input_dir):
+        for filename, _ in measurement_sources(input_dir, "_LIV_"):
             if filename.endswith(".xlsx") and "_LIV_" in filename and not filename.startswith('~'):
                 try:
                     match = re.search(r'[A-Za-z]{2}\d{4}', filename)
@@ -329,6 +332,7 @@ class Extraction(Base):
                     print(f"Error extracting chip name from {filename}: {e}")
                     continue
 
+        row_sources = spectrum_row_sources(input_dir)
         chip_found = False
         spectrum_data = [ [], [], [], [], [],
                          [], [], [], [] ]
@@ -336,13 +340,13 @@ class Extraction(Base):
         for chip_name in chip_names:
             spectrum_data[0].append(chip_name)
 
-            for filename in os.listdir(input_dir):
+            for filename, load_row in row_sources:
                 if filename.endswith(".csv") and required_string in filename and chip_name in filename:
                     if chip_found:
                         print("Error: duplicate chip name.")
                         break
                     chip_found = True
-                    df = pd.read_csv(os.path.join(input_dir, filename))
+                    df = load_row()
                     for i in range(1, 9):
                         spectrum_data[i].append(df.iat[0, i - 1])
 
@@ -353,7 +357,7 @@ class Extraction(Base):
                 chip_found = False
 
         #Find chips without LIV/EAM Data
-        for filename in os.listdir(input_dir):
+        for filename, load_row in row_sources:
             if filename.endswith(".csv") and required_string in filename:
                 chip_name = None
                 try:
@@ -366,7 +370,7 @@ class Extraction(Base):
 
                 if chip_name not in chip_names:
                     spectrum_data[0].append(f"NO LIV: {chip_name}")
-                    df = pd.read_csv(os.path.join(input_dir, filename))
+                    df = load_row()
                     for i in range(1, 9):
                         spectrum_data[i].append(df.iat[0, i - 1])
 
@@ -389,6 +393,81 @@ class Extraction(Base):
             results_df.to_excel(output_path, index=False)
             print(f"File Saved to {output_path}")
 
+    def export_store_excel(self, input_dir):
+        """
+        On-demand Excel export of every store record of the folder that has no workbook yet.
+        """
+        print("\nExporting measurement store to Excel...")
+        if not os.path.isdir(input_dir):
+            print(f"Error: Folder {input_dir} not found")
+            return
+        exported = MeasurementStore(default_store_root(input_dir)).export_all_excel(input_dir)
+        print(f"{len(exported)} file(s) exported")
+
+    def render_spectrum_images(self, input_dir):
+        """
+        On-demand JPGs for every spectrum trace of the folder that has none yet.
+        """
+        print("\nRendering spectrum images...")
+        if not os.path.isdir(input_dir):
+            print(f"Error: Folder {input_dir} not found")
+            return
+        futures = get_renderer().render_missing(input_dir)
+        for future in futures:
+            future.exception()
+        print(f"{len(futures)} image(s) rendered")
+
+    def update_summary(self, input_dir):
+        """
+        Add the new or changed measurements of the folder to its results database and rewrite lot_summary.xlsx
+        (Threshold, Extinction, Spectrum and Final sheets), instead of new timestamped reports.
+        """
+        print("\nUpdating Lot Summary...")
+        if not os.path.isdir(input_dir):
+            print(f"Error: Folder {input_dir} not found")
+            return
+        output_path, imported, rows = update_lot_summary(input_dir)
+        print(f"{imported['imported']} new or changed measurement(s), {imported['unchanged']} unchanged, "
+              f"{imported['removed']} removed")
+        print(f"File Saved to {output_path} ({', '.join(f'{k}: {v} rows' for k, v in rows.items())})")
+
+    def export_measurements(self, input_dir):
+        """
+        One row per measurement (LIV, EAM and Spectrum sheets) streamed into measurements.xlsx, with bounded
+        memory; files unchanged since the last export are taken from the folder's results database.
+        """
+        print("\nExporting Measurements...")
+        if not os.path.isdir(input_dir):
+            print(f"Error: Folder {input_dir} not found")
+            return
+        output_path, stats = export_measurements(input_dir, jobs=self.jobs)
+        print(f"{stats['written']} measurement(s): {stats['processed']} parsed, {stats['cached']} cached, "
+              f"{stats['errors']} error(s) in {stats['seconds']:.1f} s")
+        print(f"File Saved to {output_path}")
+
+    def get_metrics_summary(self, input_dir):
+        """
+        Lot report from the metrics sidecar written at acquisition time (no workbook re-parsing).
+        """
+        print("\nGetting Metrics Summary...")
+        if not os.path.isdir(input_dir):
+            print(f"Error: Folder {input_dir} not found")
+            return
+
+        metrics_df = load_metrics(input_dir)
+        if metrics_df is None or metrics_df.empty:
+            print(f"No metrics sidecar found in {input_dir}")
+            return
+
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        output_path = os.path.join(input_dir, f"metrics_values_{timestamp}.xlsx")
+        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+            metrics_df[metrics_df["Test"] == "LIV"].dropna(axis=1, how="all") \
+                .to_excel(writer, sheet_name="LIV", index=False)
+            metrics_df[metrics_df["Test"] == "EAM"].dropna(axis=1, how="all") \
+                .to_excel(writer, sheet_name="EAM", index=False)
+        print(f"File Saved to {output_path}")
+
     def get_organized_data(self, input_dir):
         print("\nGetting Organized Data...")
         if not os.path.isdir(input_dir):
@@ -397,7 +476,9 @@ class Extraction(Base):
         results = [[], [], [], [],
                    [], [], [], []]
 
-        for filename in os.listdir(input_dir):
+        eam_sources = measurement_sources(input_dir, "_EAM_")
+        row_sources = spectrum_row_sources(input_dir)
+        for filename, load_sweep in measurement_sources(input_dir, "_LIV_"):
             name = None
             pd_curr = [None, None]
             thresh = None
@@ -422,7 +503,7 @@ class Extraction(Base):
                 date = extract_date_from_filename(filename)
 
                 try:
-                    df = pd.read_excel(filepath)
+                    df = load_sweep()
 
                     # PD Current from Laser Current
                     idx = 0
@@ -461,35 +542,17 @@ class Extraction(Base):
                 except Exception as e:
                     print(f"An unexpected error occurred while processing {filename}: {e}")
 
-                for filename_2nd in os.listdir(input_dir):
+                for filename_2nd, load_eam in eam_sources:
 
                     if filename_2nd.endswith(".xlsx") and "_EAM_" in filename_2nd and not filename_2nd.startswith(
                             '~') and name in filename_2nd:
                         ext_val = None
-                        file_path = os.path.join(input_dir, filename_2nd)
-                        df = pd.read_excel(file_path)
+                        df = load_eam()
                         ext_i = df.iat[1, 5]
                         ext_f = df.iat[31, 5]
 
                         if pd.notna(ext_i) and pd.notna(ext_f):
-                            numer = abs(ext_f)
-                            denom = abs(ext_i)
-
-                            # Determine if subtraction should occur
-                            if numer > 0.111 and denom > 0.111:
-                                numer -= 0.111
-                                denom -= 0.111
-                            else:
-                                bold = True
-
-                            # Attempt to calculate ext value
-                            if denom != 0 and numer > 0:
-                                ext_val = 10 * math.log10(numer / denom)
-
-                            else:
-                                print("Math Error")
-                                ext_val = f"{ext_i},{ext_f}"
-
+                            ext_val, bold = extinction_ratio(ext_i, ext_f)
                         else:
                             print(f"Error: Unsuccessful Extraction of PD Current Values: {filename_2nd}")
 
@@ -498,11 +561,11 @@ class Extraction(Base):
 
                         break
 
-                for filename_2nd in os.listdir(input_dir):
+                for filename_2nd, load_row in row_sources:
                     if filename_2nd.endswith(
                             ".csv") and "pkpow_pkwl_smsr_" in filename_2nd and name in filename_2nd and not filename_2nd.startswith(
                             '~'):
-                        df = pd.read_csv(os.path.join(input_dir, filename_2nd))
+                        df = load_row()
                         pkwl = df.iat[0, 1]
                         smsr = df.iat[0, 7]
 
@@ -534,11 +597,134 @@ class Extraction(Base):
             results_df.to_excel(output_path, index=False)
             print(f"File Saved to {output_path}")
 
+def _temperature_filter(text):
+    """25 -> 25.0, 20:85 -> (20.0, 85.0)"""
+    if ":" in text:
+        low, high = text.split(":", 1)
+        return float(low), float(high)
+    return float(text)
+
+def expand_inputs(patterns):
+    """
+    Data folders and lot archives named on the command line. Glob patterns are expanded here,
+    so they also work quoted (cron) and on Windows.
+    """
+    inputs = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            print(f"Warning: {pattern} matches nothing")
+        for path in matches:
+            if os.path.isdir(path) or (os.path.isfile(path) and is_lot_archive(path)):
+                inputs.append(os.path.normpath(path))
+            elif not glob.has_magic(pattern):
+                print(f"Error: {path} is not a data folder or lot archive")
+    return list(dict.fromkeys(inputs))
+
+def main(argv=None):
+    """
+    Headless extraction, e.g. nightly over the data drive:
+        python data_extraction.py "D:/Data/Lot*" --recursive --jobs 8 --since 2025-07-01
+    Every folder or archive gets its own measurements.xlsx (or .csv) and results.sqlite cache,
+    unless --output collects them all in one file.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract LIV/EAM/Spectrum measurements of data folders")
+    parser.add_argument("inputs", nargs="+", help="data folders, .zip/.tar.gz lot archives or glob patterns")
+    parser.add_argument("-r", "--recursive", action="store_true", help="include subfolders and the archives in them")
+    parser.add_argument("--chip", action="append", help="chip name or pattern (AA12*), repeatable")
+    parser.add_argument("--test", action="append", choices=TESTS, help="repeatable")
+    parser.add_argument("--since", help="YYYY-MM-DD")
+    parser.add_argument("--until", help="YYYY-MM-DD")
+    parser.add_argument("--temperature", type=_temperature_filter, help="value (25) or range (20:85)")
+    parser.add_argument("-j", "--jobs", type=int, help=f"worker processes (default {Extraction.jobs})")
+    parser.add_argument("--format", default="xlsx", choices=("xlsx", "csv", "db", "summary", "reports"),
+                        help="xlsx/csv: one row per measurement; db: the results database only; "
+                             "summary: lot_summary.xlsx; reports: the four timestamped Extraction reports")
+    parser.add_argument("-o", "--output", help="one output file for all inputs (xlsx, csv and db formats)")
+    cache = parser.add_mutually_exclusive_group()
+    cache.add_argument("--cache", metavar="PATH",
+                       help="results database used as cache (default: results.sqlite of each folder, or next to --output)")
+    cache.add_argument("--no-cache", action="store_true", help="parse every file, without reading or writing a cache")
+    cache.add_argument("--refresh", action="store_true", help="parse every file and rewrite its cached row")
+    args = parser.parse_args(argv)
+    if args.format in ("summary", "reports"):
+        # Whole-folder reports of Extraction: no filters, workers, output file or cache choice
+        ignored = [option for option, value in (("--recursive", args.recursive), ("--chip", args.chip),
+                                                ("--test", args.test), ("--since", args.since),
+                                                ("--until", args.until), ("--temperature", args.temperature),
+                                                ("--jobs", args.jobs), ("--output", args.output),
+                                                ("--cache", args.cache), ("--no-cache", args.no_cache),
+                                                ("--refresh", args.refresh))
+                   if value not in (None, False)]
+        if ignored:
+            parser.error(f"{', '.join(ignored)} cannot be used with --format {args.format}")
+    jobs = args.jobs or Extraction.jobs
+
+    start = time.perf_counter()
+    inputs = expand_inputs(args.inputs)
+    if not inputs:
+        print("Error: no data folder or lot archive to extract")
+        return 2
+
+    if args.format in ("summary", "reports"):
+        folders = [path for path in inputs if os.path.isdir(path)]
+        for path in inputs:
+            if path not in folders:
+                print(f"Skipping {path}: --format {args.format} needs a folder")
+        extraction = Extraction()
+        extraction.report_mode = "summary" if args.format == "summary" else "timestamped"
+        for folder in folders:
+            extraction.run_test(folder + os.sep)
+        print(f"\n{len(folders)} folder(s) in {time.perf_counter() - start:.1f} s")
+        return 0
+
+    def default_output(path):
+        if args.format == "db":
+            return None
+        if is_lot_archive(path):
+            return f"{lot_archive_stem(path)}_measurements.{args.format}"
+        return os.path.join(path, f"measurements.{args.format}")
+
+    def cache_path(path):
+        if args.format == "db" and args.output:
+            return args.output
+        if args.cache:
+            return args.cache
+        if args.output:
+            return default_db_path(os.path.dirname(os.path.abspath(args.output)))
+        return default_db_path(os.path.dirname(os.path.abspath(path)) if is_lot_archive(path) else path)
+
+    # One run per input, or a single run over all of them into --output
+    runs = [(inputs, args.output)] if args.output else [([path], default_output(path)) for path in inputs]
+    totals = collections.Counter()
+    for run_inputs, output_path in runs:
+        db = None if args.no_cache and args.format != "db" else ResultsDB(cache_path(run_inputs[0]))
+        sinks = []
+        if args.format == "xlsx":
+            sinks.append(WorkbookSink(output_path))
+        elif args.format == "csv":
+            sinks.append(CsvSink(output_path))
+        if db is not None and (args.format == "db" or args.refresh or args.no_cache):
+            sinks.append(DatabaseSink(db))
+        pipeline = ExtractionPipeline(jobs=jobs, cache=None if args.refresh or args.no_cache else db,
+                                      chips=args.chip, since=args.since, until=args.until,
+                                      temperature=args.temperature, tests=args.test, recursive=args.recursive)
+        try:
+            stats = pipeline.run(run_inputs, sinks)
+        finally:
+            if db is not None:
+                db.close()
+        totals.update(stats)
+        print(f"{', '.join(run_inputs)}: {stats['written']} measurement(s) ({stats['processed']} parsed, "
+              f"{stats['cached']} cached, {stats['filtered']} filtered out, {stats['errors']} error(s)) "
+              f"in {stats['seconds']:.1f} s -> {output_path or db.path}")
+
+    print(f"\n{len(inputs)} input(s), {totals['scanned']} file(s): {totals['processed']} processed, "
+          f"{totals['cached']} cached, {totals['filtered']} skipped by filters, {totals['errors']} error(s) "
+          f"in {time.perf_counter() - start:.1f} s")
+    return 1 if totals["errors"] else 0
+
 if __name__ == "__main__":
-    from tkinter import filedialog
-    extraction = Extraction()
-    folder = filedialog.askdirectory()
-    extraction.get_LIV_data(folder)
-    extraction.get_extinction(folder)
-    extraction.get_spectrum_data(folder)
-    extraction.get_organized_data(folder)
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Per-device metrics computed right after a measurement is fetched, while the arrays are still in memory.
+Each measurement appends one row to metrics_summary.csv in the data folder, so lot reports only need to
+concatenate that file instead of re-reading every workbook.
+"""
+
+import csv
+import math
+import os
+import re
+import numpy as np
+from liv_analysis import linear_regression, analyze_liv_batch
+
+METRICS_FILENAME = "metrics_summary.csv"
+
+METRIC_COLUMNS = [
+    "File", "Chip Name", "Test", "Date", "Temperature",
+    "PD_Current_at_0mA_Laser", "PD_Current_at_80mA_Laser", "PD_Current_at_100mA_Laser",
+    "Laser_Current_Intercept_mA", "PD_Current_at_0V_EAM", "PD_Current_at_-3V_EAM",
+    "Threshold_d2L_mA", "Slope_Efficiency_mA_per_mA", "Kink_Count", "Rollover_mA", "Series_Resistance_Ohm",
+    "LD_Bias_mA", "Extinction_Ratio_dB", "Extinction_Bold",
+]
+
+EXTINCTION_OFFSET_MA = 0.111
+
+
+def extinction_ratio(ext_i, ext_f):
+    """
+    Extinction ratio (dB) from the PD currents at the start and end of an EAM sweep.
+    Returns (ext_val, bold); bold flags values where the dark-current offset could not be subtracted.
+    """
+    ext_val = None
+    bold = False
+    numer = abs(ext_f)
+    denom = abs(ext_i)
+
+    # Determine if subtraction should occur
+    if numer > EXTINCTION_OFFSET_MA and denom > EXTINCTION_OFFSET_MA:
+        numer -= EXTINCTION_OFFSET_MA
+        denom -= EXTINCTION_OFFSET_MA
+    else:
+        bold = True
+
+    # Attempt to calculate ext value
+    if denom != 0 and numer > 0:
+        ext_val = 10 * math.log10(numer / denom)
+    else:
+        print("Math Error")
+        ext_val = f"{ext_i},{ext_f}"
+
+    return ext_val, bold
+
+
+def _value_at(x, y, target):
+    """
+    First y value where x equals target exactly (same rule as the Extraction pandas filters).
+    """
+    hits = np.flatnonzero(x == target)
+    if hits.size == 0 or not np.isfinite(y[hits[0]]):
+        return None
+    return float(y[hits[0]])
+
+
+def compute_liv_metrics(laser_current_mA, pd_current_mA, eam_voltage_V, laser_voltage_V):
+    """
+    LIV metrics matching Extraction.get_LIV_data, plus the derivative based figures from liv_analysis.
+    """
+    laser_current_mA = np.asarray(laser_current_mA, dtype=float)
+    pd_current_mA = np.asarray(pd_current_mA, dtype=float)
+    eam_voltage_V = np.asarray(eam_voltage_V, dtype=float)
+    laser_voltage_V = np.asarray(laser_voltage_V, dtype=float)
+
+    metrics = {
+        "PD_Current_at_0mA_Laser": _value_at(laser_current_mA, pd_current_mA, 0),
+        "PD_Current_at_80mA_Laser": _value_at(laser_current_mA, pd_current_mA, 80),
+        "PD_Current_at_100mA_Laser": _value_at(laser_current_mA, pd_current_mA, 100),
+        "PD_Current_at_0V_EAM": _value_at(eam_voltage_V, pd_current_mA, 0),
+        "PD_Current_at_-3V_EAM": _value_at(eam_voltage_V, pd_current_mA, -3),
+        "Laser_Current_Intercept_mA": None,
+    }
+
+    # Intercept of the 30-50 mA linear fit
+    window = (laser_current_mA >= 30) & (laser_current_mA <= 50)
+    if window.sum() >= 2:
+        slope, intercept, _, _, _ = linear_regression(laser_current_mA[window], pd_current_mA[window])
+        if slope != 0 and np.isfinite(slope):
+            metrics["Laser_Current_Intercept_mA"] = float(-intercept / slope)
+
+    analysis = analyze_liv_batch(laser_current_mA, pd_current_mA, laser_voltage_V)
+    metrics.update({
+        "Threshold_d2L_mA": float(analysis["threshold_mA"][0]),
+        "Slope_Efficiency_mA_per_mA": float(analysis["slope_efficiency"][0]),
+        "Kink_Count": int(analysis["kink_count"][0]),
+        "Rollover_mA": float(analysis["rollover_mA"][0]),
+        "Series_Resistance_Ohm": float(analysis["series_resistance_ohm"][0]),
+    })
+    return metrics
+
+
+def compute_eam_metrics(pd_current_mA, ld_bias_mA):
+    """
+    EAM metrics matching Extraction.get_extinction (PD current at rows 1 and 31 of the sweep).
+    """
+    pd_current_mA = np.asarray(pd_current_mA, dtype=float)
+    metrics = {"LD_Bias_mA": ld_bias_mA, "Extinction_Ratio_dB": None, "Extinction_Bold": None}
+    if len(pd_current_mA) > 31 and np.isfinite(pd_current_mA[1]) and np.isfinite(pd_current_mA[31]):
+        ext_val, bold = extinction_ratio(pd_current_mA[1], pd_current_mA[31])
+        metrics["Extinction_Ratio_dB"] = ext_val
+        metrics["Extinction_Bold"] = bold
+    else:
+        print("Error: Unsuccessful Extraction of PD Current Values")
+    return metrics
+
+
+def append_metrics(data_path, row):
+    """
+    Append one metrics row to the metrics sidecar of a data folder, writing the header for a new file.
+    """
+    metrics_path = os.path.join(data_path or ".", METRICS_FILENAME)
+    is_new = not os.path.exists(metrics_path)
+    with open(metrics_path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=METRIC_COLUMNS, extrasaction="ignore")
+        if is_new:
+            writer.writeheader()
+        writer.writerow({k: ("" if v is None else v) for k, v in row.items()})
+    return metrics_path
+
+
+def load_metrics(data_path):
+    """
+    Read the metrics sidecar of a data folder into a DataFrame (None if the folder has none).
+    """
+    import pandas as pd
+    metrics_path = os.path.join(data_path, METRICS_FILENAME)
+    if not os.path.exists(metrics_path):
+        return None
+    return pd.read_csv(metrics_path)
+
+
+def record_device_metrics(measurement):
+    """
+    Post-acquisition hook: compute metrics for a freshly fetched measurement and append them to the sidecar.
+    :param measurement: dict with the combined columns plus filename/device_id/temperature/timestamp/is_eam
+    """
+    try:
+        filename = os.path.basename(measurement["filename"])
+        device_id = measurement.get("device_id") or ""
+        match = re.search(r'[A-Za-z]{2}\d{4}', device_id or filename)
+        timestamp = measurement.get("timestamp") or ""
+        date = f"{timestamp[4:6]}/{timestamp[6:8]}/{timestamp[:4]}" if len(timestamp) >= 8 else ""
+
+        row = {
+            "File": filename,
+            "Chip Name": match.group() if match else device_id,
+            "Test": "EAM" if measurement["is_eam"] else "LIV",
+            "Date": date,
+            "Temperature": measurement.get("temperature"),
+        }
+        columns = measurement["columns"]
+        if measurement["is_eam"]:
+            row.update(compute_eam_metrics(columns['SMU1_Ch1_PD_Current_Meas_mA'], measurement.get("ld_bias_mA")))
+        else:
+            row.update(compute_liv_metrics(columns['SMU1_Ch2_Laser_Current_Set_mA'],
+                                           columns['SMU1_Ch1_PD_Current_Meas_mA'],
+                                           columns['SMU2_Ch1_EAM_Voltage_Set_V'],
+                                           columns['SMU1_Ch2_Laser_Voltage_Meas_V']))
+
+        metrics_path = append_metrics(measurement.get("data_path"), row)
+        print(f"Metrics appended to {metrics_path}")
+        return row
+    except Exception as e:
+        print(f"Error computing device metrics: {e}")
+        return None
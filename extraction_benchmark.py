@@ -0,0 +1,302 @@
+"""
+Extraction benchmark on synthetic lots.
+
+Generates lot folders of N chips with the files the stations write: LIV and EAM (80 and 100 mA) sweeps
+saved by create_combined_excel_file with the LIV/EAM default parameters, and spectrum traces + analysis
+rows saved by Spectrum.save_spectrum. A few chips have no spectrum, no 100 mA EAM sweep, or only a
+spectrum ("NO LIV" rows), as in real lots. Lots are kept in the work folder and reused between runs.
+
+Each extraction pass (get_LIV_data, get_extinction, get_spectrum_data, get_organized_data) runs in a fresh
+interpreter: once for the time, once under tracemalloc for the peak memory. The report it writes is
+compared to a reference saved from the current implementation (--save-reference), so an optimized
+Extraction can be checked to give the same results.
+
+usage: python extraction_benchmark.py [--sizes 100,1000,10000] [--format xlsx|store] [--passes LIV,...]
+                                      [--workdir DIR] [--save-reference | --reference DIR] [--log FILE]
+"""
+
+import argparse
+import contextlib
+import csv
+import glob
+import json
+import os
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+PASSES = {
+    "LIV": ("get_LIV_data", "threshold_values_"),
+    "extinction": ("get_extinction", "extinction_values_"),
+    "spectrum": ("get_spectrum_data", "spectrum_values_"),
+    "organized": ("get_organized_data", "final_values_"),
+}
+LOT_VERSION = 1
+MANIFEST_FILENAME = "benchmark_lot.json"
+TEMPERATURE = "25"
+SPECTRUM_POINTS = 501
+
+
+def chip_name(index, prefix=None):
+    """AA0000, AA0001, ... AA9999, AB0000 ... (the [A-Za-z]{2}\\d{4} chip names of the lots)"""
+    if prefix is None:
+        letters = string.ascii_uppercase
+        block = index // 10000
+        prefix = letters[block // 26 % 26] + letters[block % 26]
+    return f"{prefix}{index % 10000:04d}"
+
+
+def scpi_array(values):
+    """Fetched array as the B2912A returns it (:fetc:arr?)"""
+    return ",".join(f"{v:+.6E}" for v in values)
+
+
+def liv_sweep(rng, liv):
+    laser_mA = np.linspace(liv.params_laser["start"], liv.params_laser["stop"], liv.params_laser["num_points"])
+    threshold = rng.uniform(8, 15)
+    slope = rng.uniform(0.004, 0.008)  # mA of PD current per mA of laser current
+    pd_mA = np.clip(laser_mA - threshold, 0, None) * slope + rng.normal(1e-4, 2e-5, laser_mA.size)
+    laser_V = 0.9 + 0.012 * laser_mA + rng.normal(0, 1e-3, laser_mA.size)
+    return scpi_array(laser_V), scpi_array(-pd_mA / 1000), ""
+
+
+def eam_sweep(rng, eam, ld_bias_mA):
+    eam_V = np.linspace(eam.params_eam["start"], eam.params_eam["stop"], eam.params_eam["num_points"])
+    er_dB = rng.uniform(8, 14)
+    pd_on_mA = ld_bias_mA * rng.uniform(0.004, 0.008)
+    pd_mA = pd_on_mA * 10 ** (-er_dB * (eam_V / eam_V.min()) / 10)
+    eam_mA = 0.05 * pd_mA + rng.normal(0, 1e-4, eam_V.size)
+    laser_V = np.full(eam_V.size, 0.9 + 0.012 * ld_bias_mA)
+    return scpi_array(laser_V), scpi_array(-pd_mA / 1000), scpi_array(eam_mA / 1000)
+
+
+def spectrum_trace(rng, spectrum):
+    centre = spectrum.params_spectrum["centre"]
+    span = spectrum.params_spectrum["span"]
+    wavelength = np.linspace(centre - span / 2, centre + span / 2, SPECTRUM_POINTS)
+    pkwl = centre + rng.uniform(-2, 2)
+    pkpow = rng.uniform(-8, 2)
+    smsr = rng.uniform(35, 50)
+    side_wl = pkwl + rng.choice([-1, 1]) * rng.uniform(0.8, 1.2)
+    level = np.full(SPECTRUM_POINTS, -70.0) + rng.normal(0, 0.5, SPECTRUM_POINTS)
+    level = np.maximum(level, pkpow - 400 * (wavelength - pkwl) ** 2)
+    level = np.maximum(level, pkpow - smsr - 400 * (wavelength - side_wl) ** 2)
+    row = [pkpow, pkwl, pkwl - 0.05, pkpow - 20, pkwl + 0.05, pkpow - 20, 0.1, smsr]
+    return wavelength, level, row
+
+
+def generate_lot(lot_dir, chips, output_format="xlsx", variants=50, seed=0):
+    """
+    Write a synthetic lot of chips devices into lot_dir (which must not exist or be empty).
+    output_format "xlsx" writes one workbook per sweep and spectrum CSVs; only `variants` distinct
+    workbooks are generated per test and copied under each chip's name (openpyxl would otherwise
+    dominate generation time). "store" writes the measurement store and the spectrum archive.
+    """
+    from utils import create_combined_excel_file
+    from test_classes import LIV, EAM, Spectrum
+
+    os.makedirs(lot_dir, exist_ok=True)
+    data_path = os.path.join(lot_dir, "")  # with a trailing separator, as the GUI passes data paths
+    rng = np.random.default_rng(seed)
+    liv, eam, spectrum = LIV(), EAM(), Spectrum()
+    spectrum.plot_mode = "off"
+    spectrum.spectrum_output = "csv" if output_format == "xlsx" else "archive"
+    # LIV has no EAM parameter set but the combined file has an EAM voltage column: EAM held at 0 V
+    liv_eam = {"source_mode": "fix", "start": 0.0, "stop": 0.0, "initval": 0.0, "num_points": 1}
+    templates = {}
+    measurements = 0
+    start = datetime(2025, 7, 29, 8, 0, 0)
+
+    def save_sweep(kind, index, timestamp, device_id, sweep, params_laser, params_eam, is_eam, detector):
+        nonlocal measurements
+        measurements += 1
+        if output_format == "xlsx" and index >= variants:
+            template = templates[kind][index % variants]
+            name = os.path.basename(template).replace(chip_name(index % variants), device_id, 1)
+            name = name.replace(template.rsplit("_", 1)[1], f"{timestamp}.xlsx")
+            shutil.copyfile(template, os.path.join(lot_dir, name))
+            return
+        create_combined_excel_file(*sweep, timestamp, dict(detector), dict(params_laser), dict(params_eam),
+                                   is_eam, device_id, TEMPERATURE, data_path, output_format)
+        if output_format == "xlsx":
+            templates.setdefault(kind, []).append(glob.glob(os.path.join(lot_dir, f"{device_id}_*{kind}*.xlsx"))[0])
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(chips):
+            device_id = chip_name(i)
+            stamp = start + timedelta(minutes=3 * i)
+            save_sweep("LIV", i, stamp.strftime("%Y%m%dT%H%M%S"), device_id, liv_sweep(rng, liv),
+                       liv.params_laser, liv_eam, False, liv.params_photodetector)
+            for ld_bias, minute in ((80, 1), (100, 2)):
+                if ld_bias == 100 and i % 97 == 96:
+                    continue  # 100 mA sweep missing
+                laser = dict(eam.params_laser, start=ld_bias, stop=ld_bias, initval=ld_bias)
+                save_sweep(f"EAM_LDBias({ld_bias})", i, (stamp + timedelta(minutes=minute)).strftime("%Y%m%dT%H%M%S"),
+                           device_id, eam_sweep(rng, eam, ld_bias), laser, eam.params_eam, True,
+                           eam.params_photodetector)
+            if i % 50 != 49:  # spectrum missing
+                measurements += 1
+                spectrum.save_spectrum(*spectrum_trace(rng, spectrum), data_path, device_id, TEMPERATURE,
+                                       (stamp + timedelta(minutes=2, seconds=30)).strftime("%Y%m%dT%H%M%S"))
+        for j in range(max(1, chips // 100)):  # spectrum only
+            measurements += 1
+            spectrum.save_spectrum(*spectrum_trace(rng, spectrum), data_path, chip_name(j, "SX"), TEMPERATURE,
+                                   (start - timedelta(minutes=j + 1)).strftime("%Y%m%dT%H%M%S"))
+
+    with open(os.path.join(lot_dir, MANIFEST_FILENAME), "w") as f:
+        json.dump({"version": LOT_VERSION, "chips": chips, "format": output_format, "variants": variants,
+                   "seed": seed, "measurements": measurements}, f)
+    return measurements
+
+
+def ensure_lot(workdir, chips, output_format, variants, seed):
+    """
+    The cached lot folder for these settings, generated if missing or stale.
+    :return: (lot_dir, number of measurements, generation time in s, 0 if cached)
+    """
+    lot_dir = os.path.join(workdir, f"lot_{output_format}_{chips}")
+    wanted = {"version": LOT_VERSION, "chips": chips, "format": output_format, "variants": variants, "seed": seed}
+    try:
+        with open(os.path.join(lot_dir, MANIFEST_FILENAME)) as f:
+            manifest = json.load(f)
+        if {k: manifest.get(k) for k in wanted} == wanted:
+            return lot_dir, manifest["measurements"], 0.0
+    except (OSError, ValueError, KeyError):
+        pass
+    shutil.rmtree(lot_dir, ignore_errors=True)
+    start = time.perf_counter()
+    measurements = generate_lot(lot_dir, chips, output_format, variants, seed)
+    return lot_dir, measurements, time.perf_counter() - start
+
+
+def remove_outputs(lot_dir, prefix):
+    for path in glob.glob(os.path.join(lot_dir, f"{prefix}*.xlsx")):
+        os.remove(path)
+
+
+def child(pass_name, lot_dir, memory):
+    """Run one pass in this (fresh) interpreter and print its time, peak memory and report path"""
+    import tracemalloc
+    from data_extraction import Extraction
+
+    method, prefix = PASSES[pass_name]
+    remove_outputs(lot_dir, prefix)
+    extraction = Extraction()
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        getattr(extraction, method)(lot_dir)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if memory else None
+    tracemalloc.stop()
+    outputs = glob.glob(os.path.join(lot_dir, f"{prefix}*.xlsx"))
+    print(json.dumps({"seconds": seconds, "peak_bytes": peak, "output": outputs[0] if outputs else None}))
+
+
+def run_pass(pass_name, lot_dir, memory=False):
+    command = [sys.executable, os.path.abspath(__file__), "--child", pass_name, lot_dir]
+    if memory:
+        command.append("--memory")
+    result = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "child failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def normalized_report(path):
+    """The report as a DataFrame in a stable row order (the passes follow os.listdir order)"""
+    import pandas as pd
+    df = pd.read_excel(path)
+    return df.sort_values(list(df.columns), na_position="first", kind="mergesort").reset_index(drop=True)
+
+
+def check_report(path, reference_path, save):
+    """'saved', 'match', 'no reference' or a description of the first difference"""
+    import pandas as pd
+    if path is None:
+        return "no output"
+    df = normalized_report(path)
+    if save:
+        os.makedirs(os.path.dirname(reference_path), exist_ok=True)
+        df.to_csv(reference_path, index=False)
+        return "saved"
+    if not os.path.exists(reference_path):
+        return "no reference"
+    reference = pd.read_csv(reference_path)
+    try:
+        pd.testing.assert_frame_equal(df, reference, check_dtype=False, rtol=1e-9, atol=1e-12)
+    except AssertionError as e:
+        return "DIFF: " + " ".join(str(e).split())[:200]
+    return "match"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and check the Extraction passes on synthetic lots")
+    parser.add_argument("--sizes", default="100,1000,10000", help="comma separated chip counts")
+    parser.add_argument("--format", choices=("xlsx", "store"), default="xlsx",
+                        help="sweep files as written by output_format xlsx, or the measurement store")
+    parser.add_argument("--passes", default=",".join(PASSES), help=f"comma separated, from {', '.join(PASSES)}")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "extraction_benchmark"),
+                        help="where lots are generated and kept between runs")
+    parser.add_argument("--variants", type=int, default=50, help="distinct workbooks per test in xlsx lots")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    reference = parser.add_mutually_exclusive_group()
+    reference.add_argument("--save-reference", action="store_true",
+                           help="save the reports of this run as the reference")
+    reference.add_argument("--reference", help="reference folder (default: <workdir>/reference)")
+    parser.add_argument("--log", help="append the results to this CSV file")
+    parser.add_argument("--child", nargs=2, metavar=("PASS", "LOT"), help=argparse.SUPPRESS)
+    parser.add_argument("--memory", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        child(args.child[0], args.child[1], args.memory)
+        return
+
+    passes = [p.strip() for p in args.passes.split(",") if p.strip()]
+    unknown = [p for p in passes if p not in PASSES]
+    if unknown:
+        parser.error(f"unknown pass(es) {', '.join(unknown)}; choose from {', '.join(PASSES)}")
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    reference_dir = args.reference or os.path.join(args.workdir, "reference")
+
+    results = []
+    print(f"{'chips':>7} {'sweeps':>7}  {'pass':<11}{'time s':>9}{'sweeps/s':>10}{'peak MB':>9}  check")
+    for chips in sizes:
+        lot_dir, measurements, generated = ensure_lot(args.workdir, chips, args.format, args.variants, args.seed)
+        if generated:
+            print(f"Generated {lot_dir} in {generated:.1f} s")
+        for pass_name in passes:
+            timing = run_pass(pass_name, lot_dir)
+            check = check_report(timing["output"],
+                                 os.path.join(reference_dir, f"{args.format}_{chips}", f"{pass_name}.csv"),
+                                 args.save_reference)
+            peak = None if args.no_memory else run_pass(pass_name, lot_dir, memory=True)["peak_bytes"]
+            seconds = timing["seconds"]
+            peak_mb = peak / 1e6 if peak is not None else None
+            results.append({"date": datetime.now().isoformat(timespec="seconds"), "format": args.format,
+                            "chips": chips, "measurements": measurements, "pass": pass_name, "seconds": f"{seconds:.3f}",
+                            "peak_mb": f"{peak_mb:.1f}" if peak_mb is not None else "", "check": check})
+            print(f"{chips:>7} {measurements:>7}  {pass_name:<11}{seconds:>9.2f}{measurements / seconds:>10.0f}"
+                  f"{f'{peak_mb:.1f}' if peak_mb is not None else '-':>9}  {check}")
+
+    if args.log:
+        new_file = not os.path.exists(args.log)
+        with open(args.log, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]) if results else [])
+            if new_file:
+                writer.writeheader()
+            writer.writerows(results)
+        print(f"Logged to {args.log}")
+    return 1 if any(r["check"].startswith("DIFF") for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
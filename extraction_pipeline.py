@@ -0,0 +1,524 @@
+"""
+Streaming extraction pipeline: scan -> filter -> parse + compute metrics -> write rows.
+
+Every stage is a generator, so only the measurements in flight are held in memory, whatever the size
+of the lot or archive:
+    scan      walks data folders lazily (os.scandir) and yields one small source dict per workbook,
+              spectrum row CSV, measurement store record or spectrum archive record; .zip and .tar(.gz)
+              lot archives are read in place, their members are never extracted to disk
+    filter    drops sources by chip, date, temperature and test, from the filename alone
+    process   parses each source and computes its metrics (device_metrics, same rules as Extraction),
+              in worker processes when jobs > 1 with a bounded number of sources in flight; sources
+              already in the cache (results database) with the same size and mtime are not parsed
+    sinks     rows are streamed into a write-only workbook (one sheet per test), a CSV file or the
+              results database
+
+    pipeline = ExtractionPipeline(jobs=4, cache=ResultsDB("results.sqlite"))
+    pipeline.run(["D:/Data/Lot42"], [WorkbookSink("lot42_measurements.xlsx")])
+"""
+
+import collections
+import csv
+import fnmatch
+import functools
+import io
+import json
+import os
+import tarfile
+import time
+import zipfile
+
+import numpy as np
+from device_metrics import compute_liv_metrics, compute_eam_metrics
+from measurement_store import MeasurementStore, STORE_DIRNAME, default_store_root
+from spectrum_archive import ARCHIVE_DIRNAME, SpectrumArchive, default_archive_dir
+from spectrum_analysis import SPECTRUM_ROW_HEADER
+from results_db import ResultsDB, parse_measurement_name, record_params, test_from_name, LD_BIAS
+
+BASE_COLUMNS = ["File", "Chip Name", "Test", "Date", "Temperature", "LD_Bias_mA"]
+TEST_METRIC_COLUMNS = {
+    "LIV": ["PD_Current_at_0mA_Laser", "PD_Current_at_80mA_Laser", "PD_Current_at_100mA_Laser",
+            "Laser_Current_Intercept_mA", "PD_Current_at_0V_EAM", "PD_Current_at_-3V_EAM", "Threshold_d2L_mA",
+            "Slope_Efficiency_mA_per_mA", "Kink_Count", "Rollover_mA", "Series_Resistance_Ohm"],
+    "EAM": ["Extinction_Ratio_dB", "Extinction_Bold"],
+    "Spectrum": SPECTRUM_ROW_HEADER,
+}
+SHEET_COLUMNS = {test: BASE_COLUMNS + columns for test, columns in TEST_METRIC_COLUMNS.items()}
+SKIPPED_DIRS = (STORE_DIRNAME, ARCHIVE_DIRNAME)
+LOT_ARCHIVE_SUFFIXES = (".zip", ".tar.gz", ".tgz", ".tar")
+
+
+def is_lot_archive(path):
+    return path.lower().endswith(LOT_ARCHIVE_SUFFIXES)
+
+
+def lot_archive_stem(path):
+    """D:/Data/Lot42.tar.gz -> D:/Data/Lot42"""
+    for suffix in LOT_ARCHIVE_SUFFIXES:
+        if path.lower().endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def file_kind(name):
+    """(kind, test) of a measurement file name, None for any other file"""
+    test = test_from_name(name)
+    if name.startswith("~") or test is None:
+        return None
+    if name.endswith(".xlsx") and test in ("LIV", "EAM"):
+        return "xlsx", test
+    if name.endswith(".csv") and "pkpow_pkwl_smsr_" in name:
+        return "csv", test
+    return None
+
+
+# --- scan ---
+def scan_folder(folder, recursive=False):
+    """
+    Source dicts for every measurement of a data folder (and its subfolders and lot archives if recursive).
+    """
+    subfolders = []
+    file_names = set()
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            name = entry.name
+            if entry.is_dir():
+                if recursive and name not in SKIPPED_DIRS:
+                    subfolders.append(entry.path)
+                continue
+            if recursive and is_lot_archive(name):
+                subfolders.append(entry.path)
+                continue
+            kind_test = file_kind(name)
+            if kind_test is None:
+                continue
+            kind, test = kind_test
+            file_names.add(name)
+            stat = entry.stat()
+            yield {"kind": kind, "path": entry.path, "name": name, "folder": folder, "test": test,
+                   "size": stat.st_size, "mtime": stat.st_mtime}
+
+    # A sweep or spectrum row saved both as a file and to the store/archive is yielded once, from the file
+    store = MeasurementStore(default_store_root(folder))
+    for entry in store.records():
+        if entry["name"] in file_names:
+            continue
+        yield {"kind": "store", "path": store.record_path(entry), "name": entry["name"], "folder": folder,
+               "test": entry.get("test") or test_from_name(entry["name"]), "size": None, "mtime": None,
+               "root": store.root, "entry": entry}
+    archive = SpectrumArchive(default_archive_dir(folder))
+    for entry in archive.records():
+        if entry["param_name"] in file_names:
+            continue
+        yield {"kind": "archive", "path": archive.record_path(entry), "name": entry["param_name"],
+               "folder": folder, "test": "Spectrum", "size": None, "mtime": None, "entry": entry}
+
+    for subfolder in sorted(subfolders):
+        if is_lot_archive(subfolder):
+            yield from scan_archive(subfolder)
+        else:
+            yield from scan_folder(subfolder, recursive)
+
+
+def scan_archive(archive_path):
+    """
+    Source dicts for the workbooks and spectrum row CSVs inside a .zip or .tar(.gz) lot archive, without
+    extracting it. A member's path is the archive path joined with its name inside the archive (the cache key),
+    its size and mtime those recorded in the archive.
+
+    Zip members are read by the parsers straight from the archive. A compressed tar can only be read front to
+    back, so a tar source carries a "reader" that is only valid until the next source is scanned: the process
+    stage reads the member then (load_member) and the scan drops the reader when it moves on.
+    """
+    def member_source(member, size, mtime, name=None):
+        parts = (name or member).split("/")
+        if any(part in SKIPPED_DIRS for part in parts[:-1]):
+            return None
+        kind_test = file_kind(parts[-1])
+        if kind_test is None:
+            return None
+        path = os.path.join(archive_path, *parts)
+        return {"kind": kind_test[0], "path": path, "name": parts[-1], "folder": os.path.dirname(path),
+                "test": kind_test[1], "size": size, "mtime": mtime, "container": archive_path, "member": member}
+
+    try:
+        if archive_path.lower().endswith(".zip"):
+            with zipfile.ZipFile(archive_path) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    source = member_source(info.filename, info.file_size,
+                                           time.mktime(info.date_time + (0, 0, -1)), _zip_member_name(info))
+                    if source is not None:
+                        yield source
+        else:
+            with tarfile.open(archive_path, "r|*") as archive:
+                for info in archive:
+                    if not info.isfile():
+                        continue
+                    source = member_source(info.name, info.size, float(info.mtime))
+                    if source is not None:
+                        source["reader"] = functools.partial(_read_tar_member, archive, info)
+                        yield source
+                        source.pop("reader", None)
+    except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+        print(f"Error reading archive {archive_path}: {e}")
+
+
+def _zip_member_name(info):
+    # Names without the UTF-8 flag are decoded as cp437 by zipfile, but most zip tools write them as UTF-8
+    # anyway, which would turn the 25°C of a file name into 25┬░C
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode("cp437").decode("utf-8")
+    except UnicodeError:
+        return info.filename
+
+
+def _read_tar_member(archive, info):
+    return archive.extractfile(info).read()
+
+
+def load_member(source):
+    """Read a tar member into its source while the scan is still at it (main process, before queuing)"""
+    reader = source.pop("reader", None)
+    if reader is not None:
+        source["data"] = reader()
+
+
+# --- parse + compute (runs in the worker processes) ---
+def read_sweep(file):
+    """Columns of a combined LIV/EAM workbook (path or file object) as float arrays"""
+    from openpyxl import load_workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows)
+        values = np.array([row for row in rows], dtype=float).reshape(-1, len(header))
+    finally:
+        workbook.close()
+    return {name: values[:, i] for i, name in enumerate(header)}
+
+
+def read_spectrum_row(file):
+    """The [pkpow, pkwl, wl1, pow1, wl2, pow2, dwl, smsr] row of a pkpow_pkwl_smsr CSV (path or file object)"""
+    values = np.atleast_1d(np.loadtxt(file, delimiter=",", skiprows=1))
+    return dict(zip(SPECTRUM_ROW_HEADER, (float(v) for v in values)))
+
+
+def sweep_metrics(columns, test, name):
+    if test == "EAM":
+        match = LD_BIAS.search(name)
+        return compute_eam_metrics(columns['SMU1_Ch1_PD_Current_Meas_mA'], float(match.group(1)) if match else None)
+    return compute_liv_metrics(columns['SMU1_Ch2_Laser_Current_Set_mA'], columns['SMU1_Ch1_PD_Current_Meas_mA'],
+                               columns['SMU2_Ch1_EAM_Voltage_Set_V'], columns['SMU1_Ch2_Laser_Voltage_Meas_V'])
+
+
+@functools.lru_cache(maxsize=8)
+def _open_zip(path, mtime_ns, pid):
+    # One open ZipFile per archive and process, so the central directory is not re-read for every member.
+    # Keyed by pid: forked workers must not share the parent's file handle (and its file offset)
+    return zipfile.ZipFile(path)
+
+
+def open_source(source):
+    """Path or file object to read a file source from (archive members are read into memory, never to disk)"""
+    if "data" in source:
+        return io.BytesIO(source["data"])
+    if "container" in source:
+        archive = _open_zip(source["container"], os.stat(source["container"]).st_mtime_ns, os.getpid())
+        return io.BytesIO(archive.read(source["member"]))
+    return source["path"]
+
+
+def process_source(source):
+    """
+    Parse one source and compute its metrics. Returns the metrics dict; only this small dict goes
+    back to the main process, the parsed arrays stay in the worker.
+    """
+    kind = source["kind"]
+    if kind == "archive":
+        return {k: source["entry"][k] for k in SPECTRUM_ROW_HEADER}
+    if kind == "store":
+        columns = MeasurementStore(source["root"]).read(source["entry"])
+        return sweep_metrics(columns, source["test"], source["name"])
+    if kind == "csv":
+        return read_spectrum_row(open_source(source))
+    return sweep_metrics(read_sweep(open_source(source)), source["test"], source["name"])
+
+
+def _process_quietly(source):
+    # compute_*_metrics print their warnings; keep the workers' output out of the pipeline summary
+    import contextlib
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return process_source(source)
+
+
+# --- output rows ---
+def output_row(record):
+    """Workbook/CSV row (dict keyed by SHEET_COLUMNS) of a processed record"""
+    fields, metrics = record["fields"], record["metrics"]
+    ld_bias = fields["params"].get("ld_bias_mA")
+    row = {
+        "File": record["name"],
+        "Chip Name": fields["chip"],
+        "Test": record["test"],
+        "Date": f"{fields['date'][5:7]}/{fields['date'][8:10]}/{fields['date'][:4]}" if fields["date"] else None,
+        "Temperature": fields["temperature"],
+        "LD_Bias_mA": ld_bias if isinstance(ld_bias, float) else None,
+    }
+    for column in TEST_METRIC_COLUMNS[record["test"]]:
+        value = metrics.get(column)
+        if isinstance(value, str) and value:  # rows cached from a metrics sidecar hold strings
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        row[column] = None if value in ("", None) or (isinstance(value, float) and np.isnan(value)) else value
+    return row
+
+
+class WorkbookSink:
+    """One sheet per test in a write-only (streaming) openpyxl workbook"""
+
+    def __init__(self, path):
+        from openpyxl import Workbook
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheets = {}
+
+    def write(self, record):
+        test = record["test"]
+        sheet = self.sheets.get(test)
+        if sheet is None:
+            sheet = self.sheets[test] = self.workbook.create_sheet(test)
+            sheet.append(SHEET_COLUMNS[test])
+        row = output_row(record)
+        sheet.append([row[c] for c in SHEET_COLUMNS[test]])
+
+    def close(self):
+        if not self.sheets:
+            self.workbook.create_sheet("Empty")
+        temporary_path = self.path + ".tmp"
+        self.workbook.save(temporary_path)
+        os.replace(temporary_path, self.path)
+
+
+class CsvSink:
+    """Every test in one CSV file (union of the sheet columns)"""
+    COLUMNS = list(dict.fromkeys(c for columns in SHEET_COLUMNS.values() for c in columns))
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=self.COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, record):
+        self.writer.writerow(output_row(record))
+
+    def close(self):
+        self.file.close()
+
+
+class DatabaseSink:
+    """Rows into a results database, committed in batches"""
+
+    def __init__(self, db, batch_size=500):
+        self.db = db
+        self.batch_size = batch_size
+        self.batch = []
+
+    def write(self, record):
+        if record.get("cached"):
+            return
+        self.batch.append(self.db.make_row(record["path"], record["name"], record["folder"], record["test"],
+                                           record["metrics"], fields=record["fields"], size=record["size"],
+                                           mtime=record["mtime"],
+                                           params=record_params(record["entry"]) if "entry" in record else None))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.db.upsert(self.batch)
+            self.batch = []
+
+    def close(self):
+        self.flush()
+
+
+class ExtractionPipeline:
+    def __init__(self, jobs=1, cache=None, chips=None, since=None, until=None, temperature=None, tests=None,
+                 recursive=False, window=None):
+        """
+        :param jobs: worker processes for parsing (1: in this process)
+        :param cache: ResultsDB whose rows are reused for unchanged sources (and which receives new ones)
+        :param chips: chip names or fnmatch patterns (AA12*)
+        :param since/until: YYYY-MM-DD, inclusive
+        :param temperature: exact value or (min, max)
+        :param tests: subset of LIV, EAM, Spectrum
+        :param window: sources in flight at most (default 4 per job)
+        """
+        self.jobs = max(1, jobs)
+        self.cache = cache
+        self.chips = list(chips or [])
+        self.since = since
+        self.until = until
+        self.temperature = temperature
+        self.tests = set(tests or ())
+        self.recursive = recursive
+        self.window = window or 4 * self.jobs
+        self.stats = collections.Counter()
+
+    def scan(self, folders):
+        for folder in folders:
+            folder = os.path.normpath(folder)
+            scan = scan_archive(folder) if is_lot_archive(folder) else scan_folder(folder, self.recursive)
+            for source in scan:
+                self.stats["scanned"] += 1
+                yield source
+
+    def accepts(self, source, fields):
+        if self.tests and source["test"] not in self.tests:
+            return False
+        if self.chips and not any(fnmatch.fnmatchcase(fields["chip"] or "", pattern) for pattern in self.chips):
+            return False
+        if (self.since or self.until) and not fields["date"]:
+            return False
+        if self.since and fields["date"] < self.since:
+            return False
+        if self.until and fields["date"] > self.until:
+            return False
+        if self.temperature is not None:
+            temperature = fields["temperature"]
+            if temperature is None:
+                return False
+            if isinstance(self.temperature, (tuple, list)):
+                if not self.temperature[0] <= temperature <= self.temperature[1]:
+                    return False
+            elif temperature != self.temperature:
+                return False
+        return True
+
+    def filter(self, sources):
+        for source in sources:
+            fields = parse_measurement_name(source["name"])
+            if self.accepts(source, fields):
+                source["fields"] = fields
+                yield source
+            else:
+                self.stats["filtered"] += 1
+
+    def _from_cache(self, source):
+        if self.cache is None:
+            return None
+        row = self.cache.cached(source["path"], source["size"], source["mtime"])
+        if row is None:
+            return None
+        return json.loads(row["metrics"])
+
+    def process(self, sources):
+        """
+        Records (source + fields + metrics) in scan order. At most `window` sources are in flight, so memory
+        does not grow with the number of sources.
+        """
+        executor = None
+        if self.jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=self.jobs)
+        pending = collections.deque()
+
+        def finish(source, future):
+            try:
+                metrics = future.result() if executor else future
+            except Exception as e:
+                print(f"Error processing {source['path']}: {e}")
+                self.stats["errors"] += 1
+                return None
+            self.stats["processed"] += 1
+            source.pop("data", None)
+            source["metrics"] = metrics
+            return source
+
+        try:
+            for source in sources:
+                metrics = self._from_cache(source)
+                if metrics is not None:
+                    self.stats["cached"] += 1
+                    source.update(metrics=metrics, cached=True)
+                    pending.append((source, None))
+                else:
+                    try:
+                        load_member(source)
+                        if executor:
+                            pending.append((source, executor.submit(_process_quietly, source)))
+                        else:
+                            pending.append((source, _process_quietly(source)))
+                    except Exception as e:
+                        print(f"Error processing {source['path']}: {e}")
+                        self.stats["errors"] += 1
+                        continue
+                while pending and (len(pending) >= self.window or pending[0][1] is None
+                                   or not executor or pending[0][1].done()):
+                    source, result = pending.popleft()
+                    record = source if result is None else finish(source, result)
+                    if record is not None:
+                        yield record
+            while pending:
+                source, result = pending.popleft()
+                record = source if result is None else finish(source, result)
+                if record is not None:
+                    yield record
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+    def run(self, folders, sinks):
+        """
+        Stream every matching measurement of folders into the sinks.
+        :return: stats (scanned, filtered, cached, processed, errors, seconds)
+        """
+        start = time.perf_counter()
+        self.stats.clear()
+        # New results go into the cache too, unless one of the sinks already writes there
+        cache_sink = None
+        if self.cache is not None and not any(isinstance(s, DatabaseSink) and s.db is self.cache for s in sinks):
+            cache_sink = DatabaseSink(self.cache)
+        try:
+            for record in self.process(self.filter(self.scan(folders))):
+                for sink in sinks:
+                    sink.write(record)
+                if cache_sink:
+                    cache_sink.write(record)
+                self.stats["written"] += 1
+        finally:
+            for sink in sinks:
+                sink.close()
+            if cache_sink:
+                cache_sink.close()
+        self.stats["seconds"] = time.perf_counter() - start
+        return self.stats
+
+
+def export_measurements(folder, output_path=None, jobs=1, use_cache=True):
+    """
+    Per-measurement metrics of a data folder streamed into measurements.xlsx, cached in the folder's results
+    database so unchanged files are not parsed again. For a lot archive (Lot42.zip) these are Lot42_measurements.xlsx
+    and the results database of the folder holding the archive.
+    """
+    from results_db import default_db_path
+    if is_lot_archive(folder):
+        output_path = output_path or lot_archive_stem(folder) + "_measurements.xlsx"
+        cache_folder = os.path.dirname(os.path.abspath(folder))
+    else:
+        output_path = output_path or os.path.join(folder, "measurements.xlsx")
+        cache_folder = folder
+    cache = ResultsDB(default_db_path(cache_folder)) if use_cache else None
+    try:
+        stats = ExtractionPipeline(jobs=jobs, cache=cache).run([folder], [WorkbookSink(output_path)])
+    finally:
+        if cache is not None:
+            cache.close()
+    return output_path, stats
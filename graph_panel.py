@@ -1,17 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
-import matplotlib.pyplot as plt
-import pandas as pd
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from plot_renderer import get_renderer
+from measurement_store import MeasurementStore, default_store_root, is_store_path, read_store_path
+from spectrum_archive import SpectrumArchive, default_archive_dir, is_archive_path, read_archive_path
 
 class GraphPanel:
     def __init__(self, root):
         self.root = root
         self.current_excel_file = None
         self.fig = None
+        self.ax = None
         self.canvas = None
         self.toolbar = None
+        self.graph_display_frame = None
+        self.placeholder = None
         self.excel_path_var = None
 
         self.setup_graph_panel()
@@ -64,11 +67,29 @@ class GraphPanel:
         self.graph_status.pack(pady=(0, 10))
 
         # --- Graph Display Area ---
-        graph_display_frame = ttk.LabelFrame(self.root, text="Live Graph", padding="5")
-        graph_display_frame.pack(expand=True, fill='both')
+        self.graph_display_frame = ttk.LabelFrame(self.root, text="Live Graph", padding="5")
+        self.graph_display_frame.pack(expand=True, fill='both')
+
+        # The matplotlib figure is created on the first plot, so startup does not wait for matplotlib
+        self.placeholder = tk.Label(self.graph_display_frame, text="No data plotted yet",
+                                    font=('Arial', 10), fg='#999999')
+        self.placeholder.pack(expand=True)
+
+    def ensure_figure(self):
+        """Create the matplotlib figure, canvas and toolbar the first time something is plotted"""
+        if self.fig is not None:
+            return
+        import matplotlib
+        matplotlib.use('TkAgg')
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+        self.placeholder.destroy()
+        graph_display_frame = self.graph_display_frame
 
         # Initialize matplotlib figure with smaller size for side panel
-        self.fig, self.ax = plt.subplots(figsize=(6, 5))
+        self.fig = Figure(figsize=(6, 5))
+        self.ax = self.fig.add_subplot()
         self.fig.tight_layout(pad=3.0)  # Increased padding to ensure labels fit
 
         # Create canvas and toolbar
@@ -102,13 +123,19 @@ class GraphPanel:
             messagebox.showwarning("No File Selected", "Please select an Excel file first.")
             return
 
-        if not os.path.exists(excel_file_path):
+        if not os.path.exists(excel_file_path) and not is_store_path(excel_file_path) \
+                and not is_archive_path(excel_file_path):
             messagebox.showerror("File Not Found", f"The specified file does not exist:\n{excel_file_path}")
             return
 
         try:
+            import pandas as pd
             # Read the Excel file into a pandas DataFrame
-            if excel_file_path.endswith(('.xlsx', '.xls')):
+            if is_store_path(excel_file_path):
+                df = read_store_path(excel_file_path)
+            elif is_archive_path(excel_file_path):
+                df = read_archive_path(excel_file_path)
+            elif excel_file_path.endswith(('.xlsx', '.xls')):
                 df = pd.read_excel(excel_file_path)
             elif excel_file_path.endswith(".csv"):
                 df = pd.read_csv(excel_file_path)
@@ -160,6 +187,7 @@ class GraphPanel:
             return
 
         # Clear the previous plot and make axes visible
+        self.ensure_figure()
         self.ax.clear()
         self.ax.set_visible(True)
 
@@ -197,8 +225,14 @@ class GraphPanel:
 
         self.update_status(f"📊 Plotted: {os.path.basename(excel_file_path)}", "#2e8b57")
 
+        # Spectrum JPGs are rendered lazily the first time the trace is viewed
+        if '_Spectrum_' in filename and excel_file_path.endswith(".csv"):
+            get_renderer().ensure_image(excel_file_path)
+
     def clear_plot(self):
         """Clear the current plot"""
+        if self.fig is None:
+            return
         self.ax.clear()
 
         # Check if there's a twin axis and clear it
@@ -212,7 +246,7 @@ class GraphPanel:
         self.update_status("Plot cleared", "#333333")
 
     def find_latest_excel_file(self, path):
-        """Find the most recent Excel file in the data path"""
+        """Find the most recent Excel file or measurement store record in the data path"""
         try:
             if not os.path.exists(path):
                 return None
@@ -224,6 +258,16 @@ class GraphPanel:
                     file_path = os.path.join(path, file)
                     excel_files.append((file_path, os.path.getmtime(file_path)))
 
+            # Sweeps saved to the measurement store are plotted through their virtual record path
+            store = MeasurementStore(default_store_root(path))
+            latest_record = store.latest_record()
+            if latest_record:
+                excel_files.append((store.record_path(latest_record), latest_record.get("written", 0)))
+            archive = SpectrumArchive(default_archive_dir(path))
+            latest_trace = archive.latest_record()
+            if latest_trace:
+                excel_files.append((archive.record_path(latest_trace), latest_trace.get("written", 0)))
+
             if excel_files:
                 # Sort by modification time, newest first
                 excel_files.sort(key=lambda x: x[1], reverse=True)
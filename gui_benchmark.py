@@ -0,0 +1,309 @@
+"""
+GUI responsiveness benchmark.
+
+Builds PulsedGuiApp in this process (under Xvfb when there is no display) and measures:
+    first_plot     time from "Plot" to the first figure on screen (matplotlib import and figure included)
+    plot latency   plot_excel_data + redraw for LIV workbooks and spectrum CSVs of increasing size
+    live redraw    frame times while a sweep is drawn point by point, as a live plot would
+    stalls         gaps in the Tk event loop while a test runs from the Run button (simulated, or
+                   replayed from a recorded instrument session, see visa_session.py)
+
+Files are written by create_combined_excel_file and Spectrum.save_spectrum into a temporary data folder.
+
+usage: python gui_benchmark.py [--sizes 21,201,2001,20001] [--frames 200] [--sim-seconds 5]
+                               [--replay session.visa.json.gz --test LIV|EAM|Spectrum] [--log gui_benchmark.csv]
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+HEARTBEAT_MS = 10
+STALL_MS = 50
+
+
+def start_xvfb():
+    """Start Xvfb on a free display number; returns the process, or None when Xvfb is not installed"""
+    if not shutil.which("Xvfb"):
+        return None
+    for number in range(99, 120):
+        if os.path.exists(f"/tmp/.X11-unix/X{number}") or os.path.exists(f"/tmp/.X{number}-lock"):
+            continue
+        process = subprocess.Popen(["Xvfb", f":{number}", "-screen", "0", "1920x1080x24", "-nolisten", "tcp"],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(50):
+            if os.path.exists(f"/tmp/.X11-unix/X{number}"):
+                os.environ["DISPLAY"] = f":{number}"
+                return process
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+        process.kill()
+    return None
+
+
+def percentiles(values_ms):
+    values = np.array(values_ms)
+    if not values.size:
+        return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {"count": int(values.size), "p50_ms": float(p50), "p95_ms": float(p95), "max_ms": float(values.max())}
+
+
+class StallMonitor:
+    """
+    Schedules a Tk callback every HEARTBEAT_MS and records how late each one runs.
+    A late heartbeat means the event loop was blocked (window frozen) for that long.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.gaps_ms = []
+        self.running = False
+        self._last = None
+
+    def start(self):
+        self.gaps_ms = []
+        self.running = True
+        self._last = time.perf_counter()
+        self.root.after(HEARTBEAT_MS, self._beat)
+
+    def _beat(self):
+        now = time.perf_counter()
+        self.gaps_ms.append((now - self._last) * 1000 - HEARTBEAT_MS)
+        self._last = now
+        if self.running:
+            self.root.after(HEARTBEAT_MS, self._beat)
+
+    def stop(self):
+        self.running = False
+        stalls = [gap for gap in self.gaps_ms if gap >= STALL_MS]
+        return {"heartbeats": len(self.gaps_ms), "stalls": len(stalls), "stalled_ms": float(sum(stalls)),
+                "longest_stall_ms": float(max(stalls, default=0.0)),
+                "p95_lateness_ms": percentiles(self.gaps_ms)["p95_ms"]}
+
+
+def write_liv_file(data_path, num_points, device_id):
+    """LIV workbook of num_points points, as saved by a LIV run"""
+    from utils import create_combined_excel_file
+    from test_classes import LIV
+    liv = LIV()
+    laser = dict(liv.params_laser, num_points=num_points)
+    detector = dict(liv.params_photodetector, num_points=num_points)
+    eam = {"source_mode": "fix", "start": 0.0, "stop": 0.0, "initval": 0.0, "num_points": 1}
+    current = np.linspace(laser["start"], laser["stop"], num_points)
+    pd_current = np.clip(current - 10, 0, None) * 6e-6
+    timestamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    create_combined_excel_file(0.9 + 0.012 * current, pd_current, "", timestamp, detector, laser, eam,
+                               False, device_id, "25", data_path, "xlsx")
+    return max((os.path.join(data_path, f) for f in os.listdir(data_path)
+                if f.startswith(f"{device_id}_") and "_LIV_" in f), key=os.path.getmtime)
+
+
+def write_spectrum_file(data_path, num_points, device_id):
+    """Spectrum trace CSV of num_points points, as saved by a Spectrum run"""
+    from test_classes import Spectrum
+    spectrum = Spectrum()
+    spectrum.spectrum_output = "csv"
+    spectrum.plot_mode = "off"
+    wavelength = np.linspace(1304, 1316, num_points)
+    level = np.maximum(-70 + np.random.default_rng(0).normal(0, 0.5, num_points), -3 - 400 * (wavelength - 1310) ** 2)
+    timestamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    spectrum.save_spectrum(wavelength, level, [-3, 1310, 1309.95, -23, 1310.05, -23, 0.1, 45], data_path, device_id,
+                           "25", timestamp)
+    return max((os.path.join(data_path, f) for f in os.listdir(data_path)
+                if f.startswith(f"{device_id}_") and "_Spectrum_" in f), key=os.path.getmtime)
+
+
+class SimulatedRun:
+    """
+    Stand-in for a test controller: blocks like instrument I/O for `seconds`, then saves a LIV workbook,
+    so the Run button path (status updates, background write, auto-plot) is exercised without instruments.
+    """
+
+    def __init__(self, controller, seconds):
+        self.controller = controller
+        self.seconds = seconds
+
+    def __getattr__(self, attr):
+        return getattr(self.controller, attr)
+
+    def run_test(self, data_path="", device_id="", temperature="", timestamp=""):
+        deadline = time.perf_counter() + self.seconds
+        while time.perf_counter() < deadline:
+            time.sleep(0.02)  # one SMU query
+        write_liv_file(data_path, 21, device_id or "SIM0001")
+
+
+def pump(root, seconds):
+    """Process Tk events for a while, like mainloop"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        root.update()
+        time.sleep(0.001)
+
+
+def measure(args, data_path):
+    import tkinter as tk
+    import main_gui
+
+    results = {}
+    root = tk.Tk()
+    app = main_gui.PulsedGuiApp(root)
+    app.path_var.set(data_path)
+    root.update()
+    panel = app.graph_panel
+
+    def plot(path):
+        # As the auto-plot after a test: clear (drops the previous twin axis), then plot
+        start = time.perf_counter()
+        panel.clear_plot()
+        panel.excel_path_var.set(path)
+        panel.plot_excel_data()
+        root.update()
+        return (time.perf_counter() - start) * 1000
+
+    # First plot: lazy figure creation (matplotlib import) + first draw
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    liv_files = {n: write_liv_file(data_path, n, f"GB{i:04d}") for i, n in enumerate(sizes)}
+    spectrum_files = {n * 25: write_spectrum_file(data_path, n * 25, f"GS{i:04d}") for i, n in enumerate(sizes)}
+    results["first_plot"] = {"ms": plot(liv_files[sizes[0]])}
+
+    # Plot latency per file size
+    latency = []
+    for kind, files in (("LIV xlsx", liv_files), ("Spectrum csv", spectrum_files)):
+        for points, path in files.items():
+            times = [plot(path) for _ in range(args.repeat)]
+            latency.append({"file": kind, "points": points, "bytes": os.path.getsize(path),
+                            "median_ms": statistics.median(times), "max_ms": max(times)})
+    results["plot_latency"] = latency
+
+    # Live redraw: the largest LIV sweep drawn point by point
+    plot(liv_files[sizes[-1]])
+    line = panel.ax.get_lines()[0]
+    x, y = line.get_xdata(), line.get_ydata()
+    frames = []
+    for k in np.linspace(1, len(x), args.frames).astype(int):
+        start = time.perf_counter()
+        line.set_data(x[:k], y[:k])
+        panel.ax.relim()
+        panel.ax.autoscale_view()
+        panel.canvas.draw_idle()
+        root.update()
+        frames.append((time.perf_counter() - start) * 1000)
+    live = percentiles(frames)
+    live["fps"] = 1000 / statistics.mean(frames) if frames else 0.0
+    results["live_redraw"] = live
+
+    # Event-loop stalls during a test started from the Run button
+    tab = {"LIV": 0, "EAM": 1, "Spectrum": 2}[args.test]
+    app.notebook.select(tab)
+    root.update()
+    controllers = {"LIV": "liv_controller", "EAM": "eam_controller", "Spectrum": "spectrum_controller"}
+    if not args.replay:
+        setattr(app, controllers[args.test], SimulatedRun(getattr(app, controllers[args.test]), args.sim_seconds))
+    monitor = StallMonitor(root)
+    monitor.start()
+    pump(root, 0.5)  # idle baseline
+    start = time.perf_counter()
+    root.after(0, app.run_test_threaded)
+    pump(root, 0.1)
+    while str(app.run_button.cget("state")) == "disabled":
+        pump(root, 0.05)
+        if time.perf_counter() - start > args.timeout:
+            print(f"Test did not finish within {args.timeout} s")
+            break
+    pump(root, 1.0)  # auto-plot
+    stalls = monitor.stop()
+    stalls["run_s"] = time.perf_counter() - start
+    stalls["status"] = app.status_var.get()
+    results["stalls"] = stalls
+    root.destroy()
+    return results
+
+
+def print_results(results):
+    print(f"\nTime to first plot: {results['first_plot']['ms']:.0f} ms")
+    print(f"\n{'file':<14}{'points':>8}{'bytes':>11}{'median ms':>11}{'max ms':>9}")
+    for row in results["plot_latency"]:
+        print(f"{row['file']:<14}{row['points']:>8}{row['bytes']:>11}{row['median_ms']:>11.1f}{row['max_ms']:>9.1f}")
+    live = results["live_redraw"]
+    print(f"\nLive redraw: {live['count']} frames, p50 {live['p50_ms']:.1f} ms, p95 {live['p95_ms']:.1f} ms, "
+          f"max {live['max_ms']:.1f} ms ({live['fps']:.0f} fps)")
+    stalls = results["stalls"]
+    print(f"\nTest run from the Run button: {stalls['run_s']:.1f} s, {stalls['stalls']} stall(s) >= {STALL_MS} ms, "
+          f"{stalls['stalled_ms'] / 1000:.2f} s frozen, longest {stalls['longest_stall_ms']:.0f} ms, "
+          f"p95 heartbeat lateness {stalls['p95_lateness_ms']:.1f} ms")
+    print(f"Final status: {stalls['status']}")
+
+
+def log_results(path, results, label):
+    """One row per metric, so runs before and after a change can be compared in a spreadsheet"""
+    date = datetime.now().isoformat(timespec="seconds")
+    rows = [("first_plot_ms", "", results["first_plot"]["ms"])]
+    rows += [(f"plot_ms {r['file']}", r["points"], r["median_ms"]) for r in results["plot_latency"]]
+    rows += [(f"live_redraw_{k}", "", v) for k, v in results["live_redraw"].items()]
+    rows += [(f"run_{k}", "", v) for k, v in results["stalls"].items() if k != "status"]
+    new_file = not os.path.exists(path)
+    with open(path, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(["date", "label", "metric", "points", "value"])
+        for metric, points, value in rows:
+            writer.writerow([date, label, metric, points, f"{value:.3f}" if isinstance(value, float) else value])
+    print(f"Logged to {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure plot latency and event-loop stalls of the GUI")
+    parser.add_argument("--sizes", default="21,201,2001,20001",
+                        help="LIV sweep points (spectrum traces use 25x as many points)")
+    parser.add_argument("--repeat", type=int, default=5, help="plots per file")
+    parser.add_argument("--frames", type=int, default=200, help="live redraw frames")
+    parser.add_argument("--test", choices=("LIV", "EAM", "Spectrum"), default="LIV")
+    parser.add_argument("--sim-seconds", type=float, default=5.0, help="length of the simulated test run")
+    parser.add_argument("--replay", help="run the real controller against this recorded instrument session")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="replayed I/O latency factor")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--log", help="append the results to this CSV file")
+    parser.add_argument("--label", default="", help="label of this run in the log (e.g. a branch name)")
+    args = parser.parse_args(argv)
+
+    xvfb = None
+    if not os.environ.get("DISPLAY") and sys.platform.startswith("linux"):
+        xvfb = start_xvfb()
+        if xvfb is None:
+            print("No display and Xvfb is not installed (apt install xvfb)")
+            return 2
+    data_path = os.path.join(tempfile.mkdtemp(prefix="gui_benchmark_"), "")
+    try:
+        if args.replay:
+            from visa_session import start_replay
+            start_replay(args.replay, latency_scale=args.latency_scale)
+        results = measure(args, data_path)
+    finally:
+        if args.replay:
+            from visa_session import stop_replay
+            stop_replay()
+        from async_writer import get_writer
+        get_writer().flush(timeout=60)
+        shutil.rmtree(data_path, ignore_errors=True)
+        if xvfb is not None:
+            xvfb.terminate()
+    print_results(results)
+    if args.log:
+        log_results(args.log, results, args.label)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,17 @@
-from turtle import delay
+import time
 
+import numpy as np
 import pyvisa
-from fontTools.varLib.models import nonNone
 
+try:
+    from scpi_trace import traced_resource
+    from visa_session import open_resource
+except ImportError:  # driver used on its own, outside the station code
+    def traced_resource(resource, name):
+        return resource
+
+    def open_resource(resource_name, resource=None):
+        return resource if resource is not None else pyvisa.ResourceManager().open_resource(resource_name)
 
 # # connect to OSA
 # rm = pyvisa.ResourceManager()
@@ -12,17 +21,37 @@ from fontTools.varLib.models import nonNone
 
 class AnritsuMS9710CDriver:
 
-    def __init__(self, port):
+    # Extended event status register 2 bits (see sections 9.64 and 9.76 in the remote operation manual)
+    ESR2_SWEEP_COMPLETE = 0x01
+    ESR2_ANALYSIS_COMPLETE = 0x02
+
+    # Binary trace readout (DBA?/DBB?): assumed big-endian int32 levels in units of 0.001 dBm.
+    # Not yet checked on hardware, so the first binary readout is compared to an ASCII one (checkBinaryFormat)
+    TRACE_BINARY_DTYPE = '>i4'
+    TRACE_BINARY_SCALE = 0.001
+    TRACE_BINARY_TOLERANCE = 0.01  # dB
+
+    def __init__(self, port, sweep_timeout=120.0, analysis_timeout=20.0, poll_interval=0.2,
+                 completion_mode="esr2"):
         self.port = port  # format: ASRL#::INSTR
-        self.osa = pyvisa.ResourceManager()
+        self.osa = None
         # match these settings with the OSA (see section 2.2.3 in the MS9710C remote operation manual)
         self.speed = 9600
         self.parity = "none"
         self.stopBit = 1
         self.characterLength = 8
 
-        self.osa.read_termination = '\n'
-        self.osa.write_termination = '\n'
+        # completion detection: "esr2" polls the event status register, "opc" polls *OPC?
+        self.sweep_timeout = sweep_timeout  # s
+        self.analysis_timeout = analysis_timeout  # s
+        self.poll_interval = poll_interval  # s
+        self.completion_mode = completion_mode
+
+        # trace readout: "ascii" (DMA?/DMB?) or, opt-in, "binary" (DBA?/DBB?), read in chunks of trace_chunk_size bytes
+        self.trace_format = "ascii"
+        self.trace_chunk_size = 4096
+        # set once a binary readout has matched the ASCII readout of the same trace
+        self.binary_verified = False
 
     def setAddress(self, port):
         if "::INSTR" not in port:
@@ -31,8 +60,16 @@ class AnritsuMS9710CDriver:
             self.port = port
 
     # method to connect to OSA
-    def open(self):
-        self.osa = pyvisa.ResourceManager().open_resource(self.port)
+    def open(self, resource=None):
+        # an already opened (or simulated) resource can be passed in instead of the VISA address
+        self.osa = traced_resource(open_resource(self.port, resource), f"MS9710C {self.port}")
+        self.osa.read_termination = '\n'
+        self.osa.write_termination = '\n'
+        if self.port.upper().startswith("ASRL"):
+            self.osa.baud_rate = self.speed
+            self.osa.data_bits = self.characterLength
+            self.osa.parity = getattr(pyvisa.constants.Parity, self.parity)
+            self.osa.stop_bits = pyvisa.constants.StopBits.one if self.stopBit == 1 else pyvisa.constants.StopBits.two
 
     # method to send query and receive response from OSA
     def query(self, command):
@@ -47,6 +84,32 @@ class AnritsuMS9710CDriver:
     def write(self, command):
         return self.osa.write(command)
 
+    # --- Completion detection ---
+    def clearEvents(self):
+        # reading ESR2 clears it, so a stale completion bit cannot end the next wait early
+        self.query("ESR2?")
+
+    def waitForEvent(self, mask, timeout, poll_interval=None, description="operation"):
+        """
+        Poll until the operation started after clearEvents() has completed.
+        :param mask: ESR2 bit(s) signalling completion (ignored in "opc" mode)
+        :param timeout: seconds before a TimeoutError is raised
+        :return: elapsed time in seconds
+        """
+        poll_interval = self.poll_interval if poll_interval is None else poll_interval
+        start = time.monotonic()
+        while True:
+            if self.completion_mode == "opc":
+                done = self.query("*OPC?").strip() == "1"
+            else:
+                done = bool(int(self.query("ESR2?").strip()) & mask)
+            elapsed = time.monotonic() - start
+            if done:
+                return elapsed
+            if elapsed > timeout:
+                raise TimeoutError(f"{description} did not complete within {timeout} s")
+            time.sleep(poll_interval)
+
     # The methods below can be found in section 3.3.3 in the MS9710C remote control operation manual
 
     # method to set center (in nm)
@@ -100,27 +163,27 @@ class AnritsuMS9710CDriver:
         return (self.query("RES?"))
 
     # method to perform single sweep
-    def singleSweep(self, center=None, span=None):
+    def singleSweep(self, center=None, span=None, timeout=None):
         if center is not None:
             self.setCenter(center)
         if span is not None:
             self.setSpan(span)
+        self.clearEvents()
         self.write("SSI")
-        # see section 9.76 in operation manual to know when single sweep is complete
-        # unsure how to implement that in code
+        # see section 9.76 in operation manual: ESR2 bit 0 is set when the single sweep is complete
         print("Performing single sweep... please wait...")
-        delay(30000)
-        print("Single sweep complete.")
+        elapsed = self.waitForEvent(self.ESR2_SWEEP_COMPLETE, timeout or self.sweep_timeout, description="Single sweep")
+        print(f"Single sweep complete ({elapsed:.1f} s).")
 
     # returns peak wavelength in nm
     def getPeakWavelength(self):
         # find peak wavelength
+        self.clearEvents()
         self.write("PKS PEAK")  # moves trace marker to peak
 
-        # see section 9.64 in remote operation manual to know when this is complete
-        # unsure how to implement that in code
+        # see section 9.64 in remote operation manual: ESR2 bit 1 is set when the search is complete
         print("Searching for peak... please wait...")
-        delay(30000)
+        self.waitForEvent(self.ESR2_ANALYSIS_COMPLETE, self.analysis_timeout, description="Peak search")
         print("Search complete.")
 
         # read peak
@@ -128,11 +191,11 @@ class AnritsuMS9710CDriver:
 
     # returns side mode suppression ratio
     def getSMSR(self):
+        self.clearEvents()
         self.write("ANA SMSR, 2NDPEAK")
 
-        # replace code below with check for opration complete using *OPC? or event register 2?
         print("Searching for SMSR... please wait...")
-        delay(30000)
+        self.waitForEvent(self.ESR2_ANALYSIS_COMPLETE, self.analysis_timeout, description="SMSR analysis")
         print("Search complete.")
 
         return self.query("ANAR?")
@@ -153,9 +216,78 @@ class AnritsuMS9710CDriver:
         return self.query("TSL?")
 
 
-    # returns x and y values of datapoints from OSA sweep
-    def getTraceVals(self):
-        pass
+    # reads the trace in chunks until the terminator, or the full length of a #<n><len> definite length block
+    # (an indefinite length #0 block is read up to the terminator)
+    def _readBlock(self):
+        data = bytearray(self.osa.read_raw(self.trace_chunk_size))
+        if data[:1] == b"#":
+            n_digits = int(data[1:2])
+            if n_digits == 0:
+                # indefinite length block (#0): the data runs up to the terminator
+                termination = self._readToTermination(data)
+                end = len(data) - len(termination) if data.endswith(termination) else len(data)
+                return bytes(data[2:end])
+            length = int(data[2:2 + n_digits])
+            header = 2 + n_digits
+            while len(data) < header + length:
+                data += self.osa.read_bytes(min(self.trace_chunk_size, header + length - len(data)))
+            return bytes(data[header:header + length])
+        self._readToTermination(data)
+        return bytes(data)
+
+    # appends chunks to data until it ends with the read terminator (or nothing more arrives); returns the terminator
+    def _readToTermination(self, data):
+        termination = (self.osa.read_termination or '\n').encode("ascii")
+        while not data.endswith(termination):
+            chunk = self.osa.read_raw(self.trace_chunk_size)
+            if not chunk:
+                break
+            data += chunk
+        return termination
+
+    # returns the wavelength axis (nm) built from start/stop/sampling points, without per-point queries
+    def getWavelengthAxis(self):
+        start = float(self.query("STA?"))
+        stop = float(self.query("STO?"))
+        points = int(float(self.query("MPT?")))
+        return np.linspace(start, stop, points)
+
+    def _readAsciiTrace(self, trace):
+        self.write(f"DM{trace}?")
+        text = self._readBlock().decode("ascii").replace("\r\n", ",").replace("\n", ",").strip(", ")
+        return np.fromstring(text, dtype=float, sep=",")
+
+    def _readBinaryTrace(self, trace):
+        self.write(f"DB{trace}?")
+        return np.frombuffer(self._readBlock(), dtype=self.TRACE_BINARY_DTYPE) * self.TRACE_BINARY_SCALE
+
+    # compares a binary readout of the trace to the ASCII readout; on a mismatch binary readout is switched off
+    def checkBinaryFormat(self, trace="A"):
+        binary = self._readBinaryTrace(trace)
+        ascii_vals = self._readAsciiTrace(trace)
+        if binary.size == ascii_vals.size and np.allclose(binary, ascii_vals, atol=self.TRACE_BINARY_TOLERANCE):
+            self.binary_verified = True
+        else:
+            print(f"WARNING: binary trace readout does not match the ASCII readout "
+                  f"({binary.size} vs {ascii_vals.size} points), using ASCII readout")
+            self.trace_format = "ascii"
+        return self.binary_verified
+
+    # returns x and y values of datapoints from OSA sweep as NumPy arrays (wavelength in nm, level in dBm)
+    def getTraceVals(self, trace=None, trace_format=None):
+        trace = trace or self.getActiveTrace().strip() or "A"
+        trace_format = trace_format or self.trace_format
+        xvals = self.getWavelengthAxis()
+
+        if trace_format == "binary" and (self.binary_verified or self.checkBinaryFormat(trace)):
+            yvals = self._readBinaryTrace(trace)
+        else:
+            yvals = self._readAsciiTrace(trace)
+
+        if yvals.size != xvals.size:
+            print(f"WARNING: trace has {yvals.size} points, sampling points setting is {xvals.size}")
+            xvals = np.linspace(xvals[0], xvals[-1], yvals.size)
+        return xvals, yvals
 
 
     # method to close connection with OSA
@@ -163,3 +295,20 @@ class AnritsuMS9710CDriver:
         self.osa.close()
 
 
+if __name__ == "__main__":
+    # Trace readout benchmark against the simulated instrument: ASCII vs binary at several baud rates
+    import sys
+    from simulated_MS9710C import SimulatedMS9710C
+
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 501
+    for baud in (9600, 19200, 38400, 115200):
+        for trace_format in ("ascii", "binary"):
+            driver = AnritsuMS9710CDriver("ASRL1::INSTR")
+            driver.speed = baud
+            driver.open(SimulatedMS9710C(baud_rate=baud, points=points))
+            if trace_format == "binary" and not driver.checkBinaryFormat():
+                continue
+            start = time.perf_counter()
+            xvals, yvals = driver.getTraceVals(trace_format=trace_format)
+            elapsed = time.perf_counter() - start
+            print(f"{baud:>6} baud  {trace_format:<6}  {len(yvals)} points  {elapsed:6.2f} s")
@@ -0,0 +1,202 @@
+import time
+
+import numpy as np
+
+##### common interface over the optical spectrum analyzers used on the stations #####
+# Every backend exposes the same steps so Spectrum.run_test does not depend on one instrument's API:
+#   connect -> configure -> sweep -> wait -> fetch_trace -> analyse -> close
+# Wavelengths are always returned in nm and levels in dBm.
+
+
+class OSABackend:
+    name = "base"
+
+    def __init__(self, address):
+        self.address = address
+        self.connected = False
+
+    def connect(self):
+        raise NotImplementedError
+
+    def configure(self, centre, span, res, sens=None, avg=1, ref_val=None):
+        raise NotImplementedError
+
+    # starts a single sweep
+    def sweep(self):
+        raise NotImplementedError
+
+    # blocks until the sweep started by sweep() is complete
+    def wait(self, timeout=None):
+        pass
+
+    # returns (wavelength_nm, level_dBm) NumPy arrays
+    def fetch_trace(self):
+        raise NotImplementedError
+
+    # returns [pkpow, pkwl, wl1, pow1, wl2, pow2, dwl, smsr], computed locally from the trace
+    def analyse(self, wavelength, levels):
+        from spectrum_analysis import spectrum_row
+        return spectrum_row(wavelength, levels)
+
+    def close(self):
+        self.connected = False
+
+
+class AQ6370Backend(OSABackend):
+    name = "aq6370"
+
+    def __init__(self, address):
+        super().__init__(address)
+        self.osa = None
+
+    def connect(self):
+        from AQ6370Controls import AQ6370Controls
+        self.osa = AQ6370Controls(self.address)
+        self.osa.setAddress(self.address)  # connect to OSA through IP address
+        self.osa.open()
+        self.connected = bool(self.osa.connected)
+        if not self.connected:
+            raise ConnectionError(f"Cannot connect to AQ6370 at {self.address}")
+
+    def configure(self, centre, span, res, sens=None, avg=1, ref_val=None):
+        self.osa.setCenter(centre)
+        self.osa.setSpan(span)
+        self.osa.setResolution(res)
+        if sens is not None:
+            self.osa.setSensitivity(sens)
+        self.osa.setAvg(avg)
+        if ref_val is not None:
+            self.osa.setRefValue(ref_val)
+
+    def sweep(self):
+        self.osa.singleSweep()  # returns when the sweep is complete
+
+    def fetch_trace(self):
+        xvals, yvals = self.osa.getTraceVals()
+        xvals = np.asarray(xvals, dtype=float)
+        if 0 < np.nanmax(xvals) < 1e-5:  # trace in metres
+            xvals = xvals * 1e9
+        return xvals, np.asarray(yvals, dtype=float)
+
+    def close(self):
+        if self.osa is not None and hasattr(self.osa, "close"):
+            self.osa.close()
+        self.connected = False
+
+
+class AnritsuMS9710CBackend(OSABackend):
+    name = "ms9710c"
+
+    def __init__(self, address, resource=None, **driver_kwargs):
+        super().__init__(address)
+        from instruments.Anritsu_MS9710C_driver import AnritsuMS9710CDriver
+        self.driver = AnritsuMS9710CDriver(address, **driver_kwargs)
+        self.resource = resource  # optional pre-opened / simulated resource
+
+    def connect(self):
+        self.driver.open(self.resource)
+        self.connected = True
+
+    def configure(self, centre, span, res, sens=None, avg=1, ref_val=None):
+        self.driver.setCenter(f"{centre}")
+        self.driver.setSpan(f"{span}")
+        self.driver.setResolution(f"{res:g}" if isinstance(res, (int, float)) else res)
+        if sens is not None:
+            self.driver.setSensitivity(sens)  # not supported by the driver yet
+        self.driver.setAvg(f"{int(avg)}")
+        if ref_val is not None:
+            self.driver.setRefValue(f"{ref_val}")
+
+    def sweep(self):
+        self.driver.clearEvents()
+        self.driver.write("SSI")
+
+    def wait(self, timeout=None):
+        self.driver.waitForEvent(self.driver.ESR2_SWEEP_COMPLETE, timeout or self.driver.sweep_timeout,
+                                 description="Single sweep")
+
+    def fetch_trace(self):
+        return self.driver.getTraceVals()
+
+    def close(self):
+        if self.connected:
+            self.driver.close()
+        self.connected = False
+
+
+class SimulatedOSABackend(AnritsuMS9710CBackend):
+    name = "sim"
+
+    def __init__(self, address="SIM", baud_rate=115200, sweep_time=0.5, points=1001, **driver_kwargs):
+        from instruments.simulated_MS9710C import SimulatedMS9710C
+        driver_kwargs.setdefault("poll_interval", 0.05)
+        super().__init__("ASRL1::INSTR", SimulatedMS9710C(baud_rate=baud_rate, sweep_time=sweep_time, points=points),
+                         **driver_kwargs)
+        self.driver.speed = baud_rate
+
+
+OSA_BACKENDS = {
+    "aq6370": AQ6370Backend,
+    "ms9710c": AnritsuMS9710CBackend,
+    "sim": SimulatedOSABackend,
+}
+
+
+def make_osa_backend(kind, address):
+    try:
+        backend_class = OSA_BACKENDS[kind.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown OSA type '{kind}'. Choose from: {list(OSA_BACKENDS)}")
+    return backend_class() if backend_class is SimulatedOSABackend else backend_class(address)
+
+
+def benchmark_backend(backend, settings, n_sweeps=3):
+    """
+    Time each step of a spectrum measurement on one backend.
+    :param settings: dict with centre, span, res, sens, avg, ref_val
+    :return: dict step -> list of durations (s)
+    """
+    timings = {step: [] for step in ("connect", "configure", "sweep", "wait", "fetch_trace", "analyse", "close")}
+
+    def timed(step, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        timings[step].append(time.perf_counter() - start)
+        return result
+
+    timed("connect", backend.connect)
+    try:
+        timed("configure", backend.configure, settings["centre"], settings["span"], settings["res"],
+              settings.get("sens"), settings.get("avg", 1), settings.get("ref_val"))
+        for _ in range(n_sweeps):
+            timed("sweep", backend.sweep)
+            timed("wait", backend.wait)
+            wavelength, levels = timed("fetch_trace", backend.fetch_trace)
+            timed("analyse", backend.analyse, wavelength, levels)
+    finally:
+        timed("close", backend.close)
+    return timings
+
+
+def print_benchmark(name, timings):
+    total = sum(sum(values) for values in timings.values())
+    print(f"\n{name}: total {total:.2f} s")
+    for step, values in timings.items():
+        if values:
+            print(f"  {step:<12} mean {np.mean(values) * 1000:9.1f} ms  max {np.max(values) * 1000:9.1f} ms  (n={len(values)})")
+
+
+if __name__ == "__main__":
+    # usage: python -m instruments.osa_backends [kind address] ...   (default: simulated backend only)
+    import sys
+
+    settings = {"centre": 1310, "span": 12, "res": 0.05, "sens": None, "avg": 1, "ref_val": -20}
+    targets = [("sim", "SIM")]
+    args = sys.argv[1:]
+    targets += [(args[i], args[i + 1]) for i in range(0, len(args) - 1, 2)]
+    for kind, address in targets:
+        backend = make_osa_backend(kind, address)
+        try:
+            print_benchmark(f"{kind} ({address})", benchmark_backend(backend, settings))
+        except Exception as e:
+            print(f"{kind} ({address}) failed: {e}")
@@ -0,0 +1,159 @@
+import time
+import numpy as np
+
+##### a simulated Anritsu MS9710C behind a pyvisa-like resource, for benchmarking without the instrument #####
+# Serial transfer time is emulated from the configured baud rate (10 bits per byte: start + 8 data + stop).
+
+
+class SimulatedMS9710C:
+
+    def __init__(self, baud_rate=9600, sweep_time=2.0, analysis_time=0.2, points=1001, seed=0):
+        self.baud_rate = baud_rate
+        self.sweep_time = sweep_time  # s per single sweep
+        self.analysis_time = analysis_time  # s per peak search / SMSR analysis
+        self.read_termination = '\n'
+        self.write_termination = '\n'
+        self.timeout = 10000
+        self.chunk_size = 20 * 1024
+        self.data_bits = 8
+        self.parity = None
+        self.stop_bits = None
+
+        self.center = 1310.0
+        self.span = 12.0
+        self.resolution = 0.07
+        self.avg = 1
+        self.ref_level = -20.0
+        self.points = points
+        self.trace = "A"
+
+        self._rng = np.random.default_rng(seed)
+        self._levels = self._spectrum()
+        self._busy_until = 0.0
+        self._esr2 = 0
+        self._pending_bit = 0
+        self._output = b""
+
+    # --- pyvisa-like resource interface ---
+    def write(self, command):
+        self._transfer(len(command) + 1)
+        self._handle(command.strip())
+        return len(command) + 1
+
+    def read_raw(self, size=None):
+        size = size or self.chunk_size
+        data, self._output = self._output[:size], self._output[size:]
+        self._transfer(len(data))
+        return data
+
+    def read_bytes(self, count, chunk_size=None, break_on_termchar=False):
+        data = b""
+        while len(data) < count and self._output:
+            data += self.read_raw(min(count - len(data), chunk_size or self.chunk_size))
+        return data
+
+    def read(self):
+        data = b""
+        while self._output:
+            data += self.read_raw()
+            if data.endswith(self.read_termination.encode()):
+                break
+        return data.decode("ascii").rstrip("\r\n")
+
+    def query(self, command):
+        self.write(command)
+        return self.read()
+
+    def close(self):
+        pass
+
+    # --- instrument model ---
+    def _transfer(self, n_bytes):
+        time.sleep(n_bytes * 10.0 / self.baud_rate)
+
+    def _update_events(self):
+        if self._pending_bit and time.monotonic() >= self._busy_until:
+            self._esr2 |= self._pending_bit
+            self._pending_bit = 0
+
+    def _start(self, duration, bit):
+        self._busy_until = time.monotonic() + duration
+        self._pending_bit = bit
+
+    def _wavelengths(self):
+        return np.linspace(self.center - self.span / 2, self.center + self.span / 2, self.points)
+
+    def _spectrum(self):
+        wl = self._wavelengths()
+        levels = -70 + self._rng.normal(0, 0.5, wl.size)
+        # main mode plus side modes of a DFB laser
+        for offset, peak in ((0.0, -5.0), (-1.1, -42.0), (1.1, -45.0), (2.2, -55.0)):
+            levels = np.maximum(levels, peak - ((wl - (self.center + offset)) / (self.resolution / 2)) ** 2 * 3)
+        return levels
+
+    def _reply(self, text):
+        self._output = (text + self.read_termination).encode("ascii")
+
+    def _handle(self, command):
+        upper = command.upper()
+        self._update_events()
+        if upper.startswith("SSI"):
+            self._levels = self._spectrum()
+            self._start(self.sweep_time, 0x01)
+        elif upper.startswith("PKS") or upper.startswith("ANA "):
+            self._start(self.analysis_time, 0x02)
+        elif upper == "ESR2?":
+            self._reply(str(self._esr2))
+            self._esr2 = 0
+        elif upper == "*OPC?":
+            while time.monotonic() < self._busy_until:
+                time.sleep(0.01)
+            self._update_events()
+            self._reply("1")
+        elif upper == "CNT?":
+            self._reply(f"{self.center:.3f}")
+        elif upper == "SPN?":
+            self._reply(f"{self.span:.3f}")
+        elif upper == "STA?":
+            self._reply(f"{self.center - self.span / 2:.3f}")
+        elif upper == "STO?":
+            self._reply(f"{self.center + self.span / 2:.3f}")
+        elif upper == "MPT?":
+            self._reply(str(self.points))
+        elif upper == "RES?":
+            self._reply(str(self.resolution))
+        elif upper == "AVS?":
+            self._reply(str(self.avg))
+        elif upper == "RLV?":
+            self._reply(f"{self.ref_level:.2f}")
+        elif upper == "TSL?":
+            self._reply(self.trace)
+        elif upper == "TMK?":
+            self._reply(f"{self._wavelengths()[np.argmax(self._levels)]:.3f}")
+        elif upper == "ANAR?":
+            order = np.argsort(self._levels)[::-1]
+            wl = self._wavelengths()
+            main = order[0]
+            side = next(i for i in order if abs(wl[i] - wl[main]) > 0.5)
+            self._reply(f"{wl[main]:.3f},{self._levels[main]:.2f},{wl[side]:.3f},{self._levels[side]:.2f},"
+                        f"{wl[side] - wl[main]:.3f},{self._levels[main] - self._levels[side]:.2f}")
+        elif upper == "DMA?" or upper == "DMB?":
+            self._reply("\r\n".join(f"{v:.2f}" for v in self._levels))
+        elif upper == "DBA?" or upper == "DBB?":
+            payload = np.round(self._levels * 1000).astype('>i4').tobytes()
+            length = str(len(payload)).encode("ascii")
+            self._output = b"#" + str(len(length)).encode("ascii") + length + payload
+        elif upper.startswith("CNT"):
+            self.center = float(command[3:])
+        elif upper.startswith("SPN"):
+            self.span = float(command[3:])
+        elif upper.startswith("RES"):
+            self.resolution = float(command[3:])
+        elif upper.startswith("AVS"):
+            self.avg = int(float(command[3:]))
+        elif upper.startswith("RLV"):
+            self.ref_level = float(command[3:])
+        elif upper.startswith("MPT"):
+            self.points = int(command[3:])
+        elif upper.startswith("TSL"):
+            self.trace = command[3:].strip()
@@ -0,0 +1,350 @@
+"""
+Vectorized LIV curve analysis.
+
+Every function works on a batch of curves stored as 2D arrays of shape (n_curves, n_points),
+one row per device, so a whole lot is processed with a handful of NumPy operations instead of
+a Python loop per file. Curves shorter than the longest one are right-padded with NaN.
+
+Units follow the combined Excel files: laser current in mA, light as PD current in mA,
+laser voltage in V.
+"""
+
+import os
+import re
+import math
+import warnings
+from datetime import datetime
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from measurement_store import store_sources
+
+LASER_CURRENT_COL = 'SMU1_Ch2_Laser_Current_Set_mA'
+LASER_VOLTAGE_COL = 'SMU1_Ch2_Laser_Voltage_Meas_V'
+PD_CURRENT_COL = 'SMU1_Ch1_PD_Current_Meas_mA'
+
+
+def _savgol_coefficients(window, polyorder, deriv):
+    """
+    Savitzky-Golay convolution coefficients for a centred window on a unit-spaced grid.
+    """
+    half = window // 2
+    offsets = np.arange(-half, half + 1, dtype=float)
+    vander = np.vander(offsets, polyorder + 1, increasing=True)
+    # Row `deriv` of the pseudo-inverse gives the fitted polynomial coefficient of order `deriv`
+    coefs = np.linalg.pinv(vander)[deriv]
+    return coefs * math.factorial(deriv)
+
+
+def savgol_batch(y, window=5, polyorder=2, deriv=0, step=1.0):
+    """
+    Smooth (deriv=0) or differentiate (deriv>0) every row of y with a Savitzky-Golay filter.
+    :param y: 2D array (n_curves, n_points)
+    :param window: odd window length in points
+    :param polyorder: polynomial order of the local fit
+    :param deriv: derivative order
+    :param step: grid spacing per curve, scalar or array of shape (n_curves,)
+    :return: array with the same shape as y
+    """
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    n_points = y.shape[1]
+    window = min(window, n_points if n_points % 2 else n_points - 1)
+    if window < polyorder + 2:
+        # Not enough points for the requested fit, fall back to plain finite differences
+        out = y.copy()
+        for _ in range(deriv):
+            out = np.gradient(out, axis=1) if out.shape[1] > 1 else np.zeros_like(out)
+        return out / np.power(np.reshape(step, (-1, 1)), deriv)
+
+    half = window // 2
+    padded = np.pad(y, ((0, 0), (half, half)), mode='reflect', reflect_type='odd')
+    windows = sliding_window_view(padded, window, axis=1)
+    coefs = _savgol_coefficients(window, polyorder, deriv)
+    out = windows @ coefs
+    if deriv:
+        out = out / np.power(np.reshape(step, (-1, 1)), deriv)
+    return out
+
+
+def linear_regression(x, y):
+    """
+    Custom linear regression function using numpy to replace scipy.stats.linregress
+    Returns slope, intercept, r_value, p_value, std_err
+    """
+    n = len(x)
+    if n < 2:
+        return np.nan, np.nan, np.nan, np.nan, np.nan
+
+    x = np.array(x)
+    y = np.array(y)
+
+    # Calculate means
+    x_mean = np.mean(x)
+    y_mean = np.mean(y)
+
+    # Calculate slope and intercept
+    numerator = np.sum((x - x_mean) * (y - y_mean))
+    denominator = np.sum((x - x_mean) ** 2)
+
+    if denominator == 0:
+        return np.nan, np.nan, np.nan, np.nan, np.nan
+
+    slope = numerator / denominator
+    intercept = y_mean - slope * int(x_mean)
+
+    # Calculate correlation coefficient (r_value)
+    y_pred = slope * x + intercept
+    ss_res = np.sum((y - y_pred) ** 2)
+    ss_tot = np.sum((y - y_mean) ** 2)
+
+    if ss_tot == 0:
+        r_value = np.nan
+    else:
+        r_squared = 1 - (ss_res / ss_tot)
+        r_value = np.sqrt(r_squared) if r_squared >= 0 else -np.sqrt(-r_squared)
+        if slope < 0:
+            r_value = -r_value
+
+    # Calculate standard error of slope
+    if n > 2:
+        s_y = np.sqrt(ss_res / (n - 2))
+        std_err = s_y / np.sqrt(denominator)
+    else:
+        std_err = np.nan
+
+    # p_value calculation is complex, so we'll return NaN for simplicity
+    p_value = np.nan
+
+    return slope, intercept, r_value, p_value, std_err
+
+
+def _masked_linear_fit(x, y, mask):
+    """
+    Row-wise least squares slope of y against x using only points where mask is True.
+    Rows with fewer than 2 valid points return NaN.
+    """
+    mask = mask & np.isfinite(x) & np.isfinite(y)
+    n = mask.sum(axis=1)
+    xm = np.where(mask, x, 0.0)
+    ym = np.where(mask, y, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = xm.sum(axis=1) / n
+        y_mean = ym.sum(axis=1) / n
+        dx = np.where(mask, x - x_mean[:, None], 0.0)
+        dy = np.where(mask, y - y_mean[:, None], 0.0)
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+    slope[n < 2] = np.nan
+    return slope
+
+
+def liv_derivatives(current, light, window=5, polyorder=2):
+    """
+    Smoothed L, dL/dI and d2L/dI2 for a batch of LIV curves on uniform current grids.
+    :return: (light_smooth, dL_dI, d2L_dI2), each shaped like `light`
+    """
+    current = np.atleast_2d(np.asarray(current, dtype=float))
+    light = np.atleast_2d(np.asarray(light, dtype=float))
+    with np.errstate(invalid='ignore'):
+        step = np.nanmedian(np.diff(current, axis=1), axis=1)
+    step = np.where(np.isfinite(step) & (step != 0), step, 1.0)
+
+    light_smooth = savgol_batch(light, window, polyorder, deriv=0)
+    dl_di = savgol_batch(light, window, polyorder, deriv=1, step=step)
+    d2l_di2 = savgol_batch(light, window, max(polyorder, 2), deriv=2, step=step)
+    return light_smooth, dl_di, d2l_di2
+
+
+def analyze_liv_batch(current, light, voltage=None, window=5, polyorder=2,
+                      kink_tolerance=0.1, rs_fraction=0.5):
+    """
+    Extract LIV figures of merit for every curve of a batch.
+    :param current: laser current set points (mA), shape (n_curves, n_points)
+    :param light: PD current (mA), same shape
+    :param voltage: laser voltage (V), same shape, optional
+    :param kink_tolerance: fractional drop of dL/dI below its running maximum that counts as a kink
+    :param rs_fraction: series resistance is fitted on the top `rs_fraction` of the current range
+    :return: dict of 1D arrays (one value per curve) plus the 2D `kink_mask`
+    """
+    current = np.atleast_2d(np.asarray(current, dtype=float))
+    light = np.atleast_2d(np.asarray(light, dtype=float))
+    n_curves, n_points = light.shape
+    rows = np.arange(n_curves)
+    valid = np.isfinite(current) & np.isfinite(light)
+
+    light_smooth, dl_di, d2l_di2 = liv_derivatives(current, light, window, polyorder)
+    dl_di = np.where(valid, dl_di, np.nan)
+    d2l_di2 = np.where(valid, d2l_di2, np.nan)
+
+    # Threshold: peak of the second derivative
+    all_nan = ~np.isfinite(d2l_di2).any(axis=1)
+    th_idx = np.nanargmax(np.where(all_nan[:, None], 0.0, d2l_di2), axis=1)
+    threshold = current[rows, th_idx]
+    threshold[all_nan] = np.nan
+
+    # Thermal rollover: maximum of the smoothed L-I curve, only if it lies inside the sweep
+    # (points within half a window of NaN padding have no smoothed value)
+    smooth_valid = valid & np.isfinite(light_smooth)
+    peak_idx = np.argmax(np.where(smooth_valid, light_smooth, -np.inf), axis=1)
+    last_idx = n_points - 1 - np.argmax(smooth_valid[:, ::-1], axis=1)
+    has_rollover = (peak_idx < last_idx) & (peak_idx > th_idx) & ~all_nan
+    rollover = np.where(has_rollover, current[rows, peak_idx], np.nan)
+    peak_power = np.where(all_nan, np.nan, light_smooth[rows, peak_idx])
+
+    # Lasing region: above threshold (plus the filter half-width) and below rollover
+    idx = np.arange(n_points)[None, :]
+    guard = window // 2
+    stop_idx = np.where(has_rollover, peak_idx, last_idx)
+    lasing = valid & (idx > (th_idx + guard)[:, None]) & (idx <= stop_idx[:, None])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        slope_eff = np.nanmedian(np.where(lasing, dl_di, np.nan), axis=1)
+
+    # Kinks: local minima of dL/dI that drop more than kink_tolerance below the running maximum
+    slope_lasing = np.where(lasing, dl_di, -np.inf)
+    running_max = np.maximum.accumulate(slope_lasing, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drop = (running_max - dl_di) / np.abs(slope_eff)[:, None]
+    local_min = np.zeros_like(lasing)
+    local_min[:, 1:-1] = (dl_di[:, 1:-1] <= dl_di[:, :-2]) & (dl_di[:, 1:-1] < dl_di[:, 2:])
+    kink_mask = lasing & local_min & (drop > kink_tolerance)
+    kink_count = kink_mask.sum(axis=1)
+    first_kink = np.where(kink_count > 0, current[rows, np.argmax(kink_mask, axis=1)], np.nan)
+
+    # Series resistance: dV/dI over the upper part of the current range (V/mA -> Ohm)
+    if voltage is not None:
+        voltage = np.atleast_2d(np.asarray(voltage, dtype=float))
+        i_max = np.nanmax(np.where(valid, current, np.nan), axis=1)
+        i_min = np.nanmin(np.where(valid, current, np.nan), axis=1)
+        i_cut = i_max - rs_fraction * (i_max - i_min)
+        with np.errstate(invalid='ignore'):
+            rs_mask = current >= i_cut[:, None]
+        series_resistance = _masked_linear_fit(current, voltage, rs_mask) * 1000
+    else:
+        series_resistance = np.full(n_curves, np.nan)
+
+    return {
+        "threshold_mA": threshold,
+        "slope_efficiency": slope_eff,
+        "kink_count": kink_count,
+        "first_kink_mA": first_kink,
+        "rollover_mA": rollover,
+        "peak_pd_current_mA": peak_power,
+        "series_resistance_ohm": series_resistance,
+        "kink_mask": kink_mask,
+    }
+
+
+def stack_curves(curves):
+    """
+    Stack a list of 1D arrays into a NaN padded 2D array.
+    """
+    curves = [np.asarray(c, dtype=float).ravel() for c in curves]
+    length = max((len(c) for c in curves), default=0)
+    out = np.full((len(curves), length), np.nan)
+    for i, c in enumerate(curves):
+        out[i, :len(c)] = c
+    return out
+
+
+def liv_sources(input_dir):
+    """
+    (filename, loader) pairs for every LIV sweep of a folder, from Excel files and from its measurement store.
+    loader() returns the sweep as a DataFrame.
+    """
+    import pandas as pd
+    sources = dict(store_sources(input_dir, "_LIV_"))
+    for filename in os.listdir(input_dir):
+        if filename.endswith(".xlsx") and "_LIV_" in filename and not filename.startswith('~') \
+                and filename not in sources:
+            sources[filename] = lambda p=os.path.join(input_dir, filename): pd.read_excel(
+                p, usecols=[LASER_CURRENT_COL, LASER_VOLTAGE_COL, PD_CURRENT_COL])
+    return list(sources.items())
+
+
+def load_liv_curves(sources):
+    """
+    Read LIV sweeps into stacked current / PD current / voltage arrays.
+    sources are Excel file paths or (name, loader) pairs (see liv_sources). Sweeps that cannot be read are skipped.
+    :return: (kept file paths / names, current, light, voltage)
+    """
+    import pandas as pd
+    kept, currents, lights, voltages = [], [], [], []
+    for source in sources:
+        filepath, load = source if isinstance(source, tuple) else (source, None)
+        try:
+            if load is None:
+                df = pd.read_excel(filepath, usecols=[LASER_CURRENT_COL, LASER_VOLTAGE_COL, PD_CURRENT_COL])
+            else:
+                df = load()
+        except Exception as e:
+            print(f"Error reading {filepath}: {e}")
+            continue
+        kept.append(filepath)
+        currents.append(df[LASER_CURRENT_COL].to_numpy(dtype=float))
+        lights.append(df[PD_CURRENT_COL].to_numpy(dtype=float))
+        voltages.append(df[LASER_VOLTAGE_COL].to_numpy(dtype=float))
+    return kept, stack_curves(currents), stack_curves(lights), stack_curves(voltages)
+
+
+def analyze_liv_folder(input_dir, window=5, polyorder=2, kink_tolerance=0.1):
+    """
+    Run analyze_liv_batch over every LIV sweep of a folder (Excel files and measurement store) and save
+    liv_analysis_<timestamp>.xlsx
+    """
+    import pandas as pd
+    print("\nAnalyzing LIV curves...")
+    if not os.path.isdir(input_dir):
+        print(f"Error: Folder {input_dir} not found")
+        return None
+
+    kept, current, light, voltage = load_liv_curves(liv_sources(input_dir))
+    if not kept:
+        print("No LIV files found")
+        return None
+
+    results = analyze_liv_batch(current, light, voltage, window=window, polyorder=polyorder,
+                                kink_tolerance=kink_tolerance)
+    chip_names = []
+    for filepath in kept:
+        match = re.search(r'[A-Za-z]{2}\d{4}', os.path.basename(filepath))
+        chip_names.append(match.group() if match else None)
+
+    results_df = pd.DataFrame({
+        "Chip Name": chip_names,
+        "File": [os.path.basename(f) for f in kept],
+        "Threshold_d2L_mA": results["threshold_mA"],
+        "Slope_Efficiency_mA_per_mA": results["slope_efficiency"],
+        "Kink_Count": results["kink_count"],
+        "First_Kink_mA": results["first_kink_mA"],
+        "Rollover_mA": results["rollover_mA"],
+        "Peak_PD_Current_mA": results["peak_pd_current_mA"],
+        "Series_Resistance_Ohm": results["series_resistance_ohm"],
+    })
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output_path = os.path.join(input_dir, f"liv_analysis_{timestamp}.xlsx")
+    results_df.to_excel(output_path, index=False)
+    print(f"File Saved to {output_path}")
+    return results_df
+
+
+if __name__ == "__main__":
+    import time
+
+    # Synthetic benchmark: tens of thousands of curves with threshold, kink and rollover
+    n_curves, n_points = 20000, 201
+    rng = np.random.default_rng(0)
+    current = np.tile(np.linspace(0, 100, n_points), (n_curves, 1))
+    ith = rng.uniform(10, 20, n_curves)[:, None]
+    light = 0.3 * np.logaddexp(0, (current - ith) / 1.5) * 1.5
+    light -= 1e-2 * np.clip(current - 70, 0, None) ** 2
+    light += rng.normal(0, 2e-3, light.shape)
+    voltage = 0.9 + 0.005 * current + 0.05 * np.log1p(current)
+
+    start = time.perf_counter()
+    out = analyze_liv_batch(current, light, voltage)
+    elapsed = time.perf_counter() - start
+    print(f"Analyzed {n_curves} curves x {n_points} points in {elapsed:.2f} s")
+    print(f"Median threshold error: {np.nanmedian(np.abs(out['threshold_mA'] - ith.ravel())):.2f} mA")
+    print(f"Median rollover: {np.nanmedian(out['rollover_mA']):.1f} mA, "
+          f"median Rs: {np.nanmedian(out['series_resistance_ohm']):.2f} Ohm")
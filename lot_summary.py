@@ -0,0 +1,156 @@
+"""
+Persistent lot summary.
+
+Instead of writing new timestamped threshold_/extinction_/spectrum_/final_values workbooks with every chip
+of the folder on each run, the folder keeps a results database (results_db.py) that only imports new or
+changed measurements, and a single lot_summary.xlsx is streamed from it with openpyxl in write-only mode.
+Its Threshold, Extinction, Spectrum and Final sheets have the columns of the four Extraction reports.
+
+Where the reports depend on file listing order, the summary uses the most recent measurement instead:
+Spectrum and Final take the chip's latest spectrum row, Final the latest 80 mA extinction ratio.
+"""
+
+import json
+import os
+import time
+
+from results_db import ResultsDB, default_db_path
+
+SUMMARY_FILENAME = "lot_summary.xlsx"
+
+THRESHOLD_COLUMNS = ["Chip Name", "Date", "PD_Current_at_0mA_Laser", "PD_Current_at_80mA_Laser",
+                     "PD_Current_at_100mA_Laser", "Laser_Current_Intercept_mA", "PD_Current_at_0V_EAM",
+                     "PD_Current_at_-3V_EAM"]
+EXTINCTION_COLUMNS = ["Chip Name", "Extinction Ratio (80mA)", "Extinction Ratio (100mA)"]
+SPECTRUM_COLUMNS = ["Chip Name", "pkpow", "pkwl", "wl1", "pow1", "wl2", "pow2", "dwl", "smsr"]
+FINAL_COLUMNS = ["Chip Name", "Threshold", "PD Current 80mA", "PD Current 100mA", "Extinction", "pkwl", "smsr",
+                 "Date"]
+
+
+def report_date(iso_date):
+    """YYYY-MM-DD -> MM/DD/YYYY, the date format of the Extraction reports"""
+    if not iso_date:
+        return None
+    year, month, day = iso_date.split("-")
+    return f"{month}/{day}/{year}"
+
+
+def _metric(metrics, key):
+    value = metrics.get(key)
+    return None if value in ("", None) else value
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def summary_rows(db, folder):
+    """
+    (sheet name, header, rows) for the four sheets, each rows a generator of (values, bold flags).
+    """
+    def measurements(test):
+        return db.query(folder=folder, test=test,
+                        columns="chip, date, ld_bias_mA, threshold_mA, pd_current_80mA, pd_current_100mA, "
+                                "extinction_ratio_dB, metrics")
+
+    # Latest spectrum row and 80 mA extinction of every chip (queries are ordered by timestamp)
+    spectrum_by_chip = {row["chip"]: json.loads(row["metrics"]) for row in measurements("Spectrum")}
+    extinction_80 = {row["chip"]: row["extinction_ratio_dB"] for row in measurements("EAM")
+                     if row["ld_bias_mA"] == 80}
+
+    def threshold():
+        for row in measurements("LIV"):
+            metrics = json.loads(row["metrics"])
+            yield [row["chip"], report_date(row["date"])] + \
+                [_float(_metric(metrics, key)) for key in THRESHOLD_COLUMNS[2:]], None
+
+    def extinction():
+        for row in measurements("EAM"):
+            metrics = json.loads(row["metrics"])
+            ratio = _float(_metric(metrics, "Extinction_Ratio_dB"))
+            bold = str(metrics.get("Extinction_Bold")) == "True" and isinstance(ratio, float)
+            if row["ld_bias_mA"] == 80:
+                yield [row["chip"], ratio, None], [False, bold, False]
+            elif row["ld_bias_mA"] == 100:
+                yield [row["chip"], None, ratio], [False, False, bold]
+
+    def spectrum():
+        liv_chips = set()
+        for row in measurements("LIV"):
+            liv_chips.add(row["chip"])
+            values = spectrum_by_chip.get(row["chip"], {})
+            yield [row["chip"]] + [values.get(key) for key in SPECTRUM_COLUMNS[1:]], None
+        for chip, values in spectrum_by_chip.items():
+            if chip not in liv_chips:
+                yield [f"NO LIV: {chip}"] + [values.get(key) for key in SPECTRUM_COLUMNS[1:]], None
+
+    def final():
+        for row in measurements("LIV"):
+            values = spectrum_by_chip.get(row["chip"], {})
+            yield [row["chip"], row["threshold_mA"], row["pd_current_80mA"], row["pd_current_100mA"],
+                   extinction_80.get(row["chip"]), values.get("pkwl"), values.get("smsr"),
+                   report_date(row["date"])], None
+
+    return [("Threshold", THRESHOLD_COLUMNS, threshold()), ("Extinction", EXTINCTION_COLUMNS, extinction()),
+            ("Spectrum", SPECTRUM_COLUMNS, spectrum()), ("Final", FINAL_COLUMNS, final())]
+
+
+def write_summary_workbook(sheets, output_path):
+    """
+    Stream the sheets into one workbook (openpyxl write-only mode: rows are written as they come and
+    never held as cells in memory). Written to a temporary file and renamed, so a reader never sees
+    half a workbook.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    bold_font = Font(bold=True)
+    workbook = Workbook(write_only=True)
+    counts = {}
+    for name, header, rows in sheets:
+        sheet = workbook.create_sheet(name)
+        sheet.append(header)
+        counts[name] = 0
+        for values, bold in rows:
+            if bold and any(bold):
+                cells = []
+                for value, is_bold in zip(values, bold):
+                    cell = WriteOnlyCell(sheet, value=value)
+                    if is_bold:
+                        cell.font = bold_font
+                    cells.append(cell)
+                sheet.append(cells)
+            else:
+                sheet.append(values)
+            counts[name] += 1
+    temporary_path = output_path + ".tmp"
+    workbook.save(temporary_path)
+    os.replace(temporary_path, output_path)
+    return counts
+
+
+def update_lot_summary(folder, db_path=None, output_path=None):
+    """
+    Import the new or changed measurements of folder into its results database and rewrite lot_summary.xlsx.
+    :return: (output_path, import counts, rows per sheet)
+    """
+    folder = os.path.normpath(folder)
+    output_path = output_path or os.path.join(folder, SUMMARY_FILENAME)
+    with ResultsDB(db_path or default_db_path(folder)) as db:
+        imported = db.import_folder(folder, recursive=False)
+        rows = write_summary_workbook(summary_rows(db, folder), output_path)
+    return output_path, imported, rows
+
+
+if __name__ == "__main__":
+    import sys
+
+    for data_folder in sys.argv[1:] or ["."]:
+        start = time.perf_counter()
+        path, imported, rows = update_lot_summary(data_folder)
+        print(f"{path}: {imported['imported']} new/changed, {imported['unchanged']} unchanged, "
+              f"{imported['removed']} removed; {rows} in {time.perf_counter() - start:.1f} s")
@@ -2,14 +2,14 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import threading
 from datetime import datetime
-import matplotlib
-from utils import *
-from data_extraction import Extraction
-from graph_panel import GraphPanel
+from utils import string_to_num
+from graph_panel import GraphPanel  # selects the TkAgg backend when its figure is first created
+from async_writer import get_writer
+from scpi_trace import get_tracer
+from run_telemetry import get_throughput_monitor
 """
 Ari Van Cruyningen, Matthew Manjaly
 """
-matplotlib.use('TkAgg')  # Use TkAgg backend for tkinter integration
 
 class PulsedGuiApp:
     def __init__(self, root):
@@ -23,10 +23,12 @@ class PulsedGuiApp:
         self.liv_controller = LIV()
         self.eam_controller = EAM()
         self.spectrum_controller = Spectrum()
-        self.extraction_controller = Extraction()
+        self.extraction_controller = None  # created with its tab, data_extraction loads pandas/openpyxl
         self.curr_controller = self.liv_controller
         self.graph_panel = None
 
+        get_writer().on_error = self.report_write_failure
+
         self.setup_gui()
 
     def on_focus_in(self, event, placeholder):
@@ -50,7 +52,15 @@ class PulsedGuiApp:
         directory = filedialog.askdirectory()
         if directory:
             self.path_var.set(directory.replace("\\", "/") + "/")
-            self.extraction_controller.path = directory
+            if self.extraction_controller:
+                self.extraction_controller.path = directory
+
+    def get_extraction_controller(self):
+        if self.extraction_controller is None:
+            from data_extraction import Extraction
+            self.extraction_controller = Extraction()
+            self.extraction_controller.path = self.path_var.get()
+        return self.extraction_controller
 
     def setup_gui(self):
         # Create main horizontal paned window
@@ -106,12 +116,21 @@ class PulsedGuiApp:
         self.run_button.config(command=self.run_test_threaded)
         self.run_button.grid(row=0, column=7, padx=10, pady=2)
 
+        # Instrument I/O tracing (opt-in) and its viewer
+        self.trace_var = tk.BooleanVar(value=get_tracer().enabled)
+        trace_check = ttk.Checkbutton(config_frame, text="Trace instrument I/O", variable=self.trace_var,
+                                      command=self.toggle_tracing)
+        trace_check.grid(row=1, column=0, columnspan=3, pady=2, sticky=tk.W)
+        trace_button = ttk.Button(config_frame, text="I/O Trace...", command=self.show_trace_viewer)
+        trace_button.grid(row=1, column=3, columnspan=2, pady=2, sticky=tk.W)
+
         # Configure column weights
         config_frame.columnconfigure(1, weight=1)
         config_frame.columnconfigure(5, weight=2)
 
         self.path_var.trace_add("write",
-                                lambda *args: setattr(self.extraction_controller, 'path', self.path_var.get()))
+                                lambda *args: self.extraction_controller and
+                                setattr(self.extraction_controller, 'path', self.path_var.get()))
 
         # --- Compact Status Display ---
         self.status_var = tk.StringVar(value="Ready")
@@ -124,16 +143,26 @@ class PulsedGuiApp:
         self.notebook.pack(expand=True, fill="both", pady=10)
 
         tab_config = [
-            ("LIV", self.liv_controller),
-            ("EAM", self.eam_controller),
-            ("Spectrum", self.spectrum_controller),
-            ("Data Extraction", self.extraction_controller)
+            ("LIV", lambda: self.liv_controller),
+            ("EAM", lambda: self.eam_controller),
+            ("Spectrum", lambda: self.spectrum_controller),
+            ("Data Extraction", self.get_extraction_controller)
         ]
 
-        for name, controller in tab_config:
+        # Only the first tab is built now; the others are built the first time they are selected
+        self.pending_tabs = {}
+        for name, get_controller in tab_config:
             tab = ttk.Frame(self.notebook, padding="10")
             self.notebook.add(tab, text=name)
-            controller.setup_tab(tab)
+            self.pending_tabs[str(tab)] = (tab, get_controller)
+        self.build_tab(self.notebook.tabs()[0])
+        self.notebook.bind("<<NotebookTabChanged>>", lambda e: self.build_tab(self.notebook.select()))
+
+    def build_tab(self, tab_id):
+        pending = self.pending_tabs.pop(str(tab_id), None)
+        if pending:
+            tab, get_controller = pending
+            get_controller().setup_tab(tab)
 
     def update_status(self, message, color="#333333"):
         """Update the status display with a message and color"""
@@ -157,7 +186,7 @@ class PulsedGuiApp:
             self.curr_controller = self.spectrum_controller
         else:                           # Data Extraction
             # Skip all initialization
-            self.curr_controller = self.extraction_controller
+            self.curr_controller = self.get_extraction_controller()
             test_thread = threading.Thread(target=self.execute_test_and_reenable_button,
                                            args=(device_id, temperature, timestamp))
             test_thread.daemon = True
@@ -205,10 +234,15 @@ class PulsedGuiApp:
         try:
             self.curr_controller.run_test(data_path=self.path_var.get(), device_id=device_id, temperature=temperature, timestamp=timestamp)
             print("Test execution finished.")
-            self.root.after(0, lambda: self.update_status("Test completed successfully ✓", "#2e8b57"))
+            status = "Test completed successfully ✓"
+            if self.curr_controller is not self.extraction_controller:
+                status += f"  |  {get_throughput_monitor().summary()}"
+            self.root.after(0, lambda: self.update_status(status, "#2e8b57"))
 
             # Auto-plot if enabled
             if self.graph_panel.auto_plot_var.get() and self.curr_controller is not self.extraction_controller:
+                # The plot needs the file, so wait for the background write of this run
+                get_writer().flush(timeout=60)
                 latest_file = self.graph_panel.find_latest_excel_file(self.path_var.get())
                 print(f"Latest file: {latest_file}")
 
@@ -229,27 +263,51 @@ class PulsedGuiApp:
         finally:
             self.root.after(0, lambda: self.run_button.config(state='normal', text="▶ Run", bg='#4CAF50'))
 
+    def toggle_tracing(self):
+        if self.trace_var.get():
+            get_tracer().enable()
+            print("Instrument I/O tracing enabled")
+        else:
+            get_tracer().disable()
+            print("Instrument I/O tracing disabled")
+
+    def show_trace_viewer(self):
+        from trace_viewer import TraceViewer
+        TraceViewer(self.root)
+
+    def report_write_failure(self, failure):
+        """Called from the writer thread when a background measurement write fails"""
+        self.root.after(0, lambda: self.update_status(f"Saving failed: {failure.description} ✗", "#dc143c"))
+        self.root.after(0, lambda: messagebox.showerror("Write Error",
+                                                        f"Saving {failure.description} failed:\n\n{failure.error}"))
+
     def on_closing(self):
         if messagebox.askokcancel("Quit", "Do you want to quit? This will close SMU connections if active."):
+            print("Flushing pending measurement writes...")
+            get_writer().close()
             print("Closing application, ensuring SMUs are closed...")
             self.curr_controller.close_smus()
             self.root.quit()
             self.root.destroy()
 
 # main----------------------------------------------------
-try:
-    from test_classes import LIV, EAM, Spectrum
+from test_classes import LIV, EAM, Spectrum
 
-    root = tk.Tk()
-    app = PulsedGuiApp(root)
 
-    from PIL import Image, ImageTk
-
-    ico = Image.open('inpho_logo.png')
-    photo = ImageTk.PhotoImage(ico)
+def set_window_icon(root, path='inpho_logo.png'):
+    try:
+        photo = tk.PhotoImage(file=path)  # Tk 8.6 reads PNG natively, PIL is not needed
+    except tk.TclError as e:
+        print(f"Could not load window icon {path}: {e}")
+        return
     root.wm_iconphoto(False, photo)
+    root.icon_photo = photo  # keep a reference
+
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = PulsedGuiApp(root)
+    set_window_icon(root)
 
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
-    root.mainloop()
-except ImportError:
-    print("Error: 'test_classes.py' not found")
\ No newline at end of file
+    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""
+Append-only columnar store for sweep measurements.
+
+Layout (one partition per lot and measurement date):
+    <root>/<lot>/<YYYYMMDD>/sweeps.f8    raw float64 samples, one (6, num_points) block per sweep
+    <root>/<lot>/<YYYYMMDD>/index.jsonl  one JSON line per sweep: name, offset, num_points, run parameters
+
+The data block is written before its index line, so a sweep only becomes visible once it is complete.
+Reads go through np.memmap and return views into the file, no parsing or copying.
+"""
+
+import json
+import os
+import time
+import numpy as np
+
+STORE_DIRNAME = "measurement_store"
+DATA_FILENAME = "sweeps.f8"
+INDEX_FILENAME = "index.jsonl"
+
+# Column order of the combined measurement (same as the Excel output)
+COMBINED_COLUMNS = [
+    'SMU2_Ch1_EAM_Voltage_Set_V',
+    'SMU2_Ch1_EAM_Current_Meas_mA',
+    'SMU1_Ch2_Laser_Current_Set_mA',
+    'SMU1_Ch2_Laser_Voltage_Meas_V',
+    'SMU1_Ch1_PD_Voltage_Set_V',
+    'SMU1_Ch1_PD_Current_Meas_mA',
+]
+
+
+def default_store_root(data_path):
+    return os.path.join(data_path or ".", STORE_DIRNAME)
+
+
+def lot_from_path(data_path):
+    """
+    The data folder name is used as the lot name (e.g. .../TX03_submount_xpt/ -> TX03_submount_xpt).
+    """
+    return os.path.basename(os.path.normpath(os.path.abspath(data_path or "."))) or "default"
+
+
+class MeasurementStore:
+    def __init__(self, root):
+        self.root = root
+        self._maps = {}  # partition dir -> (n_values, memmap)
+
+    # --- Writing ---
+    def append(self, columns, name, lot, timestamp, metadata=None):
+        """
+        Append one sweep.
+        :param columns: dict of column name -> 1D array, must contain COMBINED_COLUMNS
+        :param name: record name (the filename the sweep would have had as an Excel file)
+        :param lot: lot name used as the first partition level
+        :param timestamp: measurement timestamp, YYYYMMDDTHHMMSS
+        :param metadata: JSON serializable dict stored alongside (run parameters, device, temperature...)
+        :return: the index entry
+        """
+        block = np.vstack([np.asarray(columns[c], dtype='<f8') for c in COMBINED_COLUMNS])
+        date = (timestamp or time.strftime("%Y%m%dT%H%M%S"))[:8]
+        partition = os.path.join(self.root, lot, date)
+        os.makedirs(partition, exist_ok=True)
+
+        data_path = os.path.join(partition, DATA_FILENAME)
+        with open(data_path, "ab") as f:
+            offset = f.tell() // 8
+            f.write(block.tobytes())
+
+        entry = {
+            "name": name,
+            "lot": lot,
+            "date": date,
+            "timestamp": timestamp,
+            "offset": offset,
+            "num_points": block.shape[1],
+            "written": time.time(),
+            **(metadata or {}),
+        }
+        with open(os.path.join(partition, INDEX_FILENAME), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+        return entry
+
+    # --- Reading ---
+    def partitions(self, lot=None, date=None):
+        if not os.path.isdir(self.root):
+            return []
+        lots = [lot] if lot else sorted(os.listdir(self.root))
+        found = []
+        for lot_name in lots:
+            lot_dir = os.path.join(self.root, lot_name)
+            if not os.path.isdir(lot_dir):
+                continue
+            dates = [date] if date else sorted(os.listdir(lot_dir))
+            for d in dates:
+                partition = os.path.join(lot_dir, d)
+                if os.path.isfile(os.path.join(partition, INDEX_FILENAME)):
+                    found.append(partition)
+        return found
+
+    def records(self, lot=None, date=None, contains=None):
+        """
+        Iterate over index entries, optionally filtered by lot, date (YYYYMMDD) and a name substring.
+        """
+        for partition in self.partitions(lot, date):
+            with open(os.path.join(partition, INDEX_FILENAME), encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if contains and contains not in entry["name"]:
+                        continue
+                    yield entry
+
+    def latest_record(self):
+        latest = None
+        for entry in self.records():
+            if latest is None or entry.get("written", 0) >= latest.get("written", 0):
+                latest = entry
+        return latest
+
+    def find(self, name):
+        for entry in self.records():
+            if entry["name"] == name:
+                return entry
+        return None
+
+    def _memmap(self, partition, needed):
+        n_values, mm = self._maps.get(partition, (0, None))
+        if mm is None or n_values < needed:
+            data_path = os.path.join(partition, DATA_FILENAME)
+            n_values = os.path.getsize(data_path) // 8
+            mm = np.memmap(data_path, dtype='<f8', mode='r', shape=(n_values,))
+            self._maps[partition] = (n_values, mm)
+        return mm
+
+    def read(self, entry):
+        """
+        Columns of one sweep as a dict of read-only views into the data file.
+        """
+        partition = os.path.join(self.root, entry["lot"], entry["date"])
+        n = entry["num_points"]
+        start = entry["offset"]
+        stop = start + n * len(COMBINED_COLUMNS)
+        block = self._memmap(partition, stop)[start:stop].reshape(len(COMBINED_COLUMNS), n)
+        return dict(zip(COMBINED_COLUMNS, block))
+
+    def to_dataframe(self, entry):
+        import pandas as pd
+        return pd.DataFrame({k: np.array(v) for k, v in self.read(entry).items()})
+
+    def record_path(self, entry):
+        """
+        Virtual path of a record (partition dir + record name), understood by read_store_path.
+        """
+        return os.path.join(self.root, entry["lot"], entry["date"], entry["name"])
+
+    # --- Excel export (on demand) ---
+    def export_excel(self, entry, output_dir, overwrite=False):
+        output_path = os.path.join(output_dir, entry["name"])
+        if os.path.exists(output_path) and not overwrite:
+            return None
+        self.to_dataframe(entry).to_excel(output_path, index=False)
+        return output_path
+
+    def export_all_excel(self, output_dir, lot=None, date=None, overwrite=False):
+        exported = []
+        for entry in self.records(lot, date):
+            path = self.export_excel(entry, output_dir, overwrite)
+            if path:
+                print(f"Exported {path}")
+                exported.append(path)
+        return exported
+
+
+def is_store_path(path):
+    """
+    True for virtual record paths of the form <root>/measurement_store/<lot>/<date>/<name>
+    """
+    partition = os.path.dirname(path)
+    return (not os.path.exists(path)) and os.path.isfile(os.path.join(partition, INDEX_FILENAME))
+
+
+def read_store_path(path):
+    """
+    DataFrame for a virtual record path produced by MeasurementStore.record_path
+    """
+    partition = os.path.dirname(path)
+    date_dir = os.path.dirname(partition)
+    root = os.path.dirname(date_dir)
+    store = MeasurementStore(root)
+    lot, date = os.path.basename(date_dir), os.path.basename(partition)
+    for entry in store.records(lot=lot, date=date):
+        if entry["name"] == os.path.basename(path):
+            return store.to_dataframe(entry)
+    raise FileNotFoundError(f"No record {os.path.basename(path)} in {partition}")
+
+
+def store_sources(input_dir, marker):
+    """
+    (name, loader) pairs for store records of a data folder whose name contains `marker`.
+    loader() returns the sweep as a DataFrame with the Excel column layout.
+    """
+    store = MeasurementStore(default_store_root(input_dir))
+    return [(entry["name"], lambda e=entry: store.to_dataframe(e)) for entry in store.records(contains=marker)]
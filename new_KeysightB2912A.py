@@ -1,12 +1,14 @@
 import pyvisa
+from scpi_trace import traced_resource
+from visa_session import open_resource
 
 # --- KeysightB2912A Class Definition (Unchanged) ---
 class KeysightB2912A:
     def __init__(self, resource_name):
-        self.rm = pyvisa.ResourceManager()
+        self.rm = None  # the resource manager is owned by visa_session.open_resource (or a replayed session)
         self.instrument = None
         try:
-            self.instrument = self.rm.open_resource(resource_name)
+            self.instrument = traced_resource(open_resource(resource_name), f"B2912A {resource_name}")
             self.instrument.timeout = 10000  # Increased timeout
             self.instrument.write_termination = '\n'
             self.instrument.read_termination = '\n'
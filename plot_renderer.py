@@ -0,0 +1,129 @@
+"""
+Headless spectrum plot rendering.
+
+Images are drawn with the Agg canvas on a matplotlib Figure that is not registered with pyplot, so
+rendering never touches the Tk backend, never leaks figures, and can run on worker threads while the
+station keeps measuring. Each worker thread reuses one Figure and clears it between plots.
+Images are optional: ensure_image() renders a plot the first time it is needed.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def image_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + ".jpg"
+
+
+class SpectrumPlotRenderer:
+    def __init__(self, max_workers=1, dpi=100):
+        self.dpi = dpi
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="PlotRenderer")
+        self._local = threading.local()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _figure(self):
+        fig = getattr(self._local, "figure", None)
+        if fig is None:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            fig = Figure()
+            FigureCanvasAgg(fig)
+            self._local.figure = fig
+        else:
+            fig.clear()
+        return fig
+
+    def render(self, csv_path, image_path=None):
+        """
+        Draw the trace CSV written by Spectrum (header 'Freq, Amplitude'), or an archived trace given by its
+        virtual path, to a JPG. Returns the image path.
+        """
+        from spectrum_analysis import load_spectrum_csv
+        from spectrum_archive import is_archive_path, read_archive_path
+        image_path = image_path or image_path_for(csv_path)
+        if is_archive_path(csv_path):
+            df = read_archive_path(csv_path)
+            xvals, yvals = df['Freq'].to_numpy(), df[' Amplitude'].to_numpy()
+        else:
+            xvals, yvals = load_spectrum_csv(csv_path)
+
+        fig = self._figure()
+        ax1 = fig.add_subplot()
+        ax1.plot(xvals, yvals)
+        ax1.set_xlabel('Wavelength (nm)')
+        ax1.set_ylabel('Amplitude (dBm)')
+        ax1.set_title('Amplitude vs wavelength')
+        ax1.grid(True)
+        fig.savefig(image_path, dpi=self.dpi)
+        fig.clear()
+        return image_path
+
+    def submit(self, csv_path, image_path=None):
+        """
+        Render in the background; returns a Future. Repeated requests for the same image share one render.
+        """
+        image_path = image_path or image_path_for(csv_path)
+        with self._lock:
+            future = self._pending.get(image_path)
+            if future is None or future.done():
+                future = self._executor.submit(self._render_logged, csv_path, image_path)
+                self._pending[image_path] = future
+            return future
+
+    def _render_logged(self, csv_path, image_path):
+        try:
+            return self.render(csv_path, image_path)
+        except Exception as e:
+            print(f"Error rendering {image_path}: {e}")
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(image_path, None)
+
+    def ensure_image(self, csv_path, wait=False):
+        """
+        Lazy rendering: the image is drawn the first time it is viewed.
+        Returns the image path if it exists (or wait=True), otherwise schedules it and returns None.
+        """
+        image_path = image_path_for(csv_path)
+        if os.path.exists(image_path):
+            return image_path
+        future = self.submit(csv_path, image_path)
+        return future.result() if wait else None
+
+    def render_missing(self, input_dir):
+        """
+        Schedule images for every spectrum trace of a folder that does not have one yet.
+        """
+        futures = []
+        for filename in os.listdir(input_dir):
+            if filename.endswith(".csv") and "_Spectrum_" in filename:
+                csv_path = os.path.join(input_dir, filename)
+                if not os.path.exists(image_path_for(csv_path)):
+                    futures.append(self.submit(csv_path))
+
+        from spectrum_archive import SpectrumArchive, default_archive_dir
+        archive = SpectrumArchive(default_archive_dir(input_dir))
+        for entry in archive.records():
+            trace_path = archive.record_path(entry)
+            if not os.path.exists(image_path_for(trace_path)):
+                futures.append(self.submit(trace_path))
+        return futures
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = SpectrumPlotRenderer()
+        return _renderer
@@ -0,0 +1,443 @@
+"""
+Local results database: one row per measurement (LIV sweep, EAM sweep, spectrum analysis row) with its
+run parameters, derived metrics and a pointer to the file (or measurement store / spectrum archive
+record) it came from, indexed by chip, date, temperature and test type.
+
+Rows are imported from existing data folders, incrementally: workbooks and CSVs already imported with
+the same size and modification time are skipped, and LIV/EAM metrics are taken from the folder's
+metrics sidecar when it has them, so most workbooks never need to be opened.
+
+    python results_db.py import D:/Data/Lot42 D:/Data/Lot43 [--db results.sqlite]
+    python results_db.py query --chip AA1234 --test LIV --months 6
+"""
+
+import csv
+import json
+import math
+import os
+import re
+import sqlite3
+import time
+
+import numpy as np
+from device_metrics import METRICS_FILENAME, compute_liv_metrics, compute_eam_metrics
+from measurement_store import MeasurementStore, STORE_DIRNAME, default_store_root, lot_from_path
+from spectrum_archive import ARCHIVE_DIRNAME, SpectrumArchive, default_archive_dir
+from spectrum_analysis import SPECTRUM_ROW_HEADER
+
+DEFAULT_DB_FILENAME = "results.sqlite"
+TESTS = ("LIV", "EAM", "Spectrum")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS measurements (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,      -- workbook/CSV path, or store/archive record path
+    name TEXT NOT NULL,
+    folder TEXT,
+    lot TEXT,
+    chip TEXT,
+    test TEXT NOT NULL,             -- LIV, EAM or Spectrum
+    pulsed INTEGER,
+    date TEXT,                      -- YYYY-MM-DD
+    timestamp TEXT,                 -- YYYY-MM-DDTHH:MM:SS
+    temperature REAL,
+    ld_bias_mA REAL,
+    num_points INTEGER,
+    duty_cycle REAL,
+    threshold_mA REAL,              -- LIV: 30-50 mA intercept (Extraction 'Threshold')
+    slope_efficiency REAL,
+    pd_current_80mA REAL,
+    pd_current_100mA REAL,
+    extinction_ratio_dB REAL,
+    pkpow REAL,
+    pkwl REAL,
+    smsr REAL,
+    params TEXT,                    -- JSON: parameters from the filename / store metadata
+    metrics TEXT,                   -- JSON: every derived metric
+    file_size INTEGER,
+    file_mtime REAL,
+    imported REAL
+);
+CREATE INDEX IF NOT EXISTS idx_chip ON measurements (chip, test, date);
+CREATE INDEX IF NOT EXISTS idx_date ON measurements (date);
+CREATE INDEX IF NOT EXISTS idx_temperature ON measurements (temperature);
+CREATE INDEX IF NOT EXISTS idx_test ON measurements (test, date);
+CREATE INDEX IF NOT EXISTS idx_lot ON measurements (lot);
+CREATE INDEX IF NOT EXISTS idx_folder ON measurements (folder, test);
+"""
+
+COLUMNS = ("path", "name", "folder", "lot", "chip", "test", "pulsed", "date", "timestamp", "temperature",
+           "ld_bias_mA", "num_points", "duty_cycle", "threshold_mA", "slope_efficiency", "pd_current_80mA",
+           "pd_current_100mA", "extinction_ratio_dB", "pkpow", "pkwl", "smsr", "params", "metrics",
+           "file_size", "file_mtime", "imported")
+
+CHIP = re.compile(r'[A-Za-z]{2}\d{4}')
+TIMESTAMP = re.compile(r'(\d{4})(\d{2})(\d{2})T(\d{2})(\d{2})(\d{2})')
+TEMPERATURE = re.compile(r'_(-?\d+(?:\.\d+)?)°C_')
+LD_BIAS = re.compile(r'LDBias\((-?[\d.]+)(?:,(-?[\d.]+))?\)mA')
+EAM_BIAS = re.compile(r'EAMBias\((-?[\d.]+)(?:,(-?[\d.]+))?\)V')
+PD_BIAS = re.compile(r'PDBias\((-?[\d.]+)\)V')
+NUM_POINTS = re.compile(r'NumPoints(\d+)')
+DUTY_CYCLE = re.compile(r'DtyC([\d.]+)%')
+
+
+def default_db_path(data_path=None):
+    return os.path.join(data_path or ".", DEFAULT_DB_FILENAME)
+
+
+def test_from_name(filename):
+    if "_LIV_" in filename:
+        return "LIV"
+    if "_EAM_" in filename:
+        return "EAM"
+    if "pkpow_pkwl_smsr_" in filename or "_Spectrum_" in filename:
+        return "Spectrum"
+    return None
+
+
+def parse_measurement_name(filename):
+    """
+    Fields encoded in a measurement filename by create_combined_excel_file / Spectrum.save_spectrum.
+    """
+    fields = {"test": test_from_name(filename), "chip": None, "date": None, "timestamp": None,
+              "temperature": None, "pulsed": int("pulsed_" in filename), "params": {}}
+    match = CHIP.search(filename)
+    if match:
+        fields["chip"] = match.group()
+    match = TIMESTAMP.search(filename)
+    if match:
+        y, mo, d, h, mi, s = match.groups()
+        fields["date"] = f"{y}-{mo}-{d}"
+        fields["timestamp"] = f"{y}-{mo}-{d}T{h}:{mi}:{s}"
+    match = TEMPERATURE.search(filename)
+    if match:
+        fields["temperature"] = float(match.group(1))
+    params = fields["params"]
+    for key, pattern in (("ld_bias_mA", LD_BIAS), ("eam_bias_V", EAM_BIAS)):
+        match = pattern.search(filename)
+        if match:
+            values = [float(v) for v in match.groups() if v is not None]
+            params[key] = values[0] if len(values) == 1 else values
+    match = PD_BIAS.search(filename)
+    if match:
+        params["pd_bias_V"] = float(match.group(1))
+    match = NUM_POINTS.search(filename)
+    if match:
+        params["num_points"] = int(match.group(1))
+    match = DUTY_CYCLE.search(filename)
+    if match:
+        params["duty_cycle"] = float(match.group(1))
+    return fields
+
+
+def _number(value):
+    """float, or None for missing / non numeric / NaN values (metrics sidecar cells are strings)"""
+    if value is None or isinstance(value, bool):
+        return value if value is None else float(value)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _clean(metrics):
+    """JSON safe copy of a metrics dict (NaN and numpy scalars become None / Python numbers)"""
+    cleaned = {}
+    for key, value in metrics.items():
+        if isinstance(value, (np.generic,)):
+            value = value.item()
+        if isinstance(value, float) and not math.isfinite(value):
+            value = None
+        cleaned[key] = value
+    return cleaned
+
+
+# Index entry keys of store / archive records that locate the record rather than describe the run
+RECORD_KEYS = ("name", "param_name", "lot", "date", "timestamp", "offset", "written")
+
+
+def record_params(entry):
+    """
+    Run metadata of a measurement store or spectrum archive index entry (parameter sets with bias ranges and
+    compliance, device, temperature, number of points), stored in params like the values parsed from a file name.
+    """
+    skipped = set(RECORD_KEYS) | set(SPECTRUM_ROW_HEADER)
+    return {key: value for key, value in entry.items() if key not in skipped}
+
+
+def load_sidecar(folder):
+    """Metrics sidecar rows of a data folder by file name"""
+    path = os.path.join(folder, METRICS_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["File"]: row for row in csv.DictReader(f)}
+
+
+class ResultsDB:
+    def __init__(self, path=None):
+        self.path = path or default_db_path()
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Writing ---
+    def make_row(self, path, name, folder, test, metrics, params=None, fields=None, size=None, mtime=None):
+        """
+        :param fields: parse_measurement_name(name), parsed here if not given
+        :param metrics: derived metrics (device_metrics column names, or the spectrum row)
+        :param size/mtime: of the file, None for store/archive records
+        """
+        fields = fields or parse_measurement_name(name)
+        params = {**fields["params"], **(params or {})}
+        ld_bias = params.get("ld_bias_mA")
+        return {
+            "path": path, "name": name, "folder": folder, "lot": lot_from_path(folder),
+            "chip": fields["chip"], "test": test, "pulsed": fields["pulsed"],
+            "date": fields["date"], "timestamp": fields["timestamp"], "temperature": fields["temperature"],
+            "ld_bias_mA": ld_bias if isinstance(ld_bias, float) else None,
+            "num_points": params.get("num_points"), "duty_cycle": params.get("duty_cycle"),
+            "threshold_mA": _number(metrics.get("Laser_Current_Intercept_mA")),
+            "slope_efficiency": _number(metrics.get("Slope_Efficiency_mA_per_mA")),
+            "pd_current_80mA": _number(metrics.get("PD_Current_at_80mA_Laser")),
+            "pd_current_100mA": _number(metrics.get("PD_Current_at_100mA_Laser")),
+            "extinction_ratio_dB": _number(metrics.get("Extinction_Ratio_dB")),
+            "pkpow": _number(metrics.get("pkpow")), "pkwl": _number(metrics.get("pkwl")),
+            "smsr": _number(metrics.get("smsr")),
+            "params": json.dumps(params, default=str), "metrics": json.dumps(_clean(metrics), default=str),
+            "file_size": size, "file_mtime": mtime,
+            "imported": time.time(),
+        }
+
+    def upsert(self, rows):
+        placeholders = ", ".join(f":{c}" for c in COLUMNS)
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO measurements ({', '.join(COLUMNS)}) "
+                                  f"VALUES ({placeholders})", rows)
+
+    def cached(self, path, size=None, mtime=None):
+        """The row of path if it was imported with this size and mtime (any, for store/archive records)"""
+        row = self.conn.execute("SELECT * FROM measurements WHERE path = ?", (path,)).fetchone()
+        if row is None or (size is not None and (row["file_size"], row["file_mtime"]) != (size, mtime)):
+            return None
+        return row
+
+    def known_files(self, folder):
+        """path -> (size, mtime) of the rows already imported from folder"""
+        cursor = self.conn.execute("SELECT path, file_size, file_mtime FROM measurements WHERE folder = ?", (folder,))
+        return {row["path"]: (row["file_size"], row["file_mtime"]) for row in cursor}
+
+    # --- Importing ---
+    def import_folder(self, folder, recursive=True):
+        """
+        Import (or refresh) every measurement of a data folder and, if recursive, of its subfolders.
+        :return: dict with the number of rows imported, skipped as unchanged and removed (file gone)
+        """
+        totals = {"imported": 0, "unchanged": 0, "errors": 0, "removed": 0}
+        folders = [folder]
+        if recursive:
+            folders = []
+            for dirpath, dirnames, _ in os.walk(folder):
+                dirnames[:] = [d for d in dirnames if d not in (STORE_DIRNAME, ARCHIVE_DIRNAME)]
+                folders.append(dirpath)
+        for path in folders:
+            counts = self._import_one_folder(os.path.normpath(path))
+            for key in totals:
+                totals[key] += counts[key]
+        return totals
+
+    def _import_one_folder(self, folder):
+        counts = {"imported": 0, "unchanged": 0, "errors": 0, "removed": 0}
+        known = self.known_files(folder)
+        seen = set()
+        file_names = set()
+        sidecar = None
+        rows = []
+        for filename in sorted(os.listdir(folder)):
+            test = test_from_name(filename)
+            is_sweep = filename.endswith(".xlsx") and test in ("LIV", "EAM")
+            is_row = filename.endswith(".csv") and "pkpow_pkwl_smsr_" in filename
+            if filename.startswith("~") or not (is_sweep or is_row):
+                continue
+            path = os.path.join(folder, filename)
+            seen.add(path)
+            file_names.add(filename)
+            stat = os.stat(path)
+            if known.get(path) == (stat.st_size, stat.st_mtime):
+                counts["unchanged"] += 1
+                continue
+            try:
+                if is_row:
+                    values = np.atleast_1d(np.loadtxt(path, delimiter=",", skiprows=1))
+                    metrics = dict(zip(SPECTRUM_ROW_HEADER, (float(v) for v in values)))
+                else:
+                    if sidecar is None:
+                        sidecar = load_sidecar(folder)
+                    metrics = sidecar.get(filename) or self._sweep_metrics(path, test, filename)
+                rows.append(self.make_row(path, filename, folder, test, metrics, size=stat.st_size,
+                                          mtime=stat.st_mtime))
+            except Exception as e:
+                print(f"Error importing {path}: {e}")
+                counts["errors"] += 1
+
+        # Measurement store and spectrum archive records never change once written. A sweep saved both to the
+        # store and as a workbook (output_format "both", Excel export), or a spectrum row both archived and written as
+        # a CSV (spectrum_output "both"), is imported once, from the file.
+        store = MeasurementStore(default_store_root(folder))
+        for entry in store.records():
+            if entry["name"] in file_names:
+                continue
+            path = store.record_path(entry)
+            seen.add(path)
+            if path in known:
+                counts["unchanged"] += 1
+                continue
+            test = entry.get("test") or test_from_name(entry["name"])
+            columns = store.read(entry)
+            metrics = self._column_metrics(columns, test, entry["name"])
+            fields = parse_measurement_name(entry["name"])
+            if entry.get("temperature") not in (None, ""):
+                fields["temperature"] = _number(entry["temperature"])
+            rows.append(self.make_row(path, entry["name"], folder, test, metrics, fields=fields,
+                                      params=record_params(entry)))
+        archive = SpectrumArchive(default_archive_dir(folder))
+        for entry in archive.records():
+            if entry["param_name"] in file_names:
+                continue
+            path = archive.record_path(entry)
+            seen.add(path)
+            if path in known:
+                counts["unchanged"] += 1
+                continue
+            metrics = {k: entry[k] for k in SPECTRUM_ROW_HEADER}
+            rows.append(self.make_row(path, entry["param_name"], folder, "Spectrum", metrics,
+                                      params=record_params(entry)))
+
+        self.upsert(rows)
+        counts["imported"] = len(rows)
+        # Files deleted or renamed since the last import
+        removed = [(path,) for path in known if path not in seen]
+        if removed:
+            with self.conn:
+                self.conn.executemany("DELETE FROM measurements WHERE path = ?", removed)
+        counts["removed"] = len(removed)
+        return counts
+
+    @staticmethod
+    def _column_metrics(columns, test, name):
+        if test == "EAM":
+            match = LD_BIAS.search(name)
+            return compute_eam_metrics(columns['SMU1_Ch1_PD_Current_Meas_mA'],
+                                       float(match.group(1)) if match else None)
+        return compute_liv_metrics(columns['SMU1_Ch2_Laser_Current_Set_mA'], columns['SMU1_Ch1_PD_Current_Meas_mA'],
+                                   columns['SMU2_Ch1_EAM_Voltage_Set_V'], columns['SMU1_Ch2_Laser_Voltage_Meas_V'])
+
+    def _sweep_metrics(self, path, test, name):
+        import pandas as pd
+        df = pd.read_excel(path)
+        return self._column_metrics({c: df[c].to_numpy(dtype=float) for c in df.columns}, test, name)
+
+    # --- Queries ---
+    def query(self, chip=None, test=None, since=None, until=None, temperature=None, lot=None, folder=None,
+              columns="*", limit=None):
+        """
+        Measurements matching every given filter, oldest first.
+        :param since/until: YYYY-MM-DD (inclusive)
+        :param temperature: exact value, or (min, max)
+        """
+        clauses, args = [], []
+        for column, value in (("chip", chip), ("test", test), ("lot", lot), ("folder", folder)):
+            if value:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if since:
+            clauses.append("date >= ?")
+            args.append(since)
+        if until:
+            clauses.append("date <= ?")
+            args.append(until)
+        if isinstance(temperature, (tuple, list)):
+            clauses.append("temperature BETWEEN ? AND ?")
+            args.extend(temperature)
+        elif temperature is not None:
+            clauses.append("temperature = ?")
+            args.append(temperature)
+        sql = f"SELECT {columns} FROM measurements"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp, id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self.conn.execute(sql, args).fetchall()
+
+    def query_dataframe(self, **filters):
+        import pandas as pd
+        rows = self.query(**filters)
+        return pd.DataFrame([dict(r) for r in rows], columns=rows[0].keys() if rows else None)
+
+    def counts(self):
+        """Number of measurements per test"""
+        return {row[0]: row[1] for row in self.conn.execute("SELECT test, COUNT(*) FROM measurements GROUP BY test")}
+
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import date, timedelta
+
+    parser = argparse.ArgumentParser(description="Results database of LIV/EAM/Spectrum measurements")
+    parser.add_argument("--db", default=default_db_path(), help="database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="import data folders (incremental)")
+    importer.add_argument("folders", nargs="+")
+    importer.add_argument("--no-recursive", action="store_true")
+    query = commands.add_parser("query", help="list measurements")
+    query.add_argument("--chip")
+    query.add_argument("--test", choices=TESTS)
+    query.add_argument("--lot")
+    query.add_argument("--since", help="YYYY-MM-DD")
+    query.add_argument("--until", help="YYYY-MM-DD")
+    query.add_argument("--months", type=int, help="last N months (instead of --since)")
+    query.add_argument("--temperature", type=float)
+    query.add_argument("--limit", type=int)
+    query.add_argument("--csv", help="write the rows to this CSV file instead of printing them")
+    args = parser.parse_args()
+
+    with ResultsDB(args.db) as db:
+        if args.command == "import":
+            for folder in args.folders:
+                start = time.perf_counter()
+                counts = db.import_folder(folder, recursive=not args.no_recursive)
+                print(f"{folder}: {counts['imported']} imported, {counts['unchanged']} unchanged, "
+                      f"{counts['removed']} removed, {counts['errors']} errors in {time.perf_counter() - start:.1f} s")
+            print(f"{args.db}: {db.counts()}")
+        else:
+            since = args.since
+            if args.months:
+                since = (date.today() - timedelta(days=round(args.months * 30.44))).isoformat()
+            start = time.perf_counter()
+            rows = db.query(chip=args.chip, test=args.test, lot=args.lot, since=since, until=args.until,
+                            temperature=args.temperature, limit=args.limit)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            shown = ("timestamp", "chip", "test", "temperature", "ld_bias_mA", "threshold_mA",
+                     "extinction_ratio_dB", "pkwl", "smsr", "path")
+            if args.csv:
+                with open(args.csv, "w", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(rows[0].keys() if rows else shown)
+                    writer.writerows(tuple(row) for row in rows)
+            else:
+                for row in rows:
+                    print("  ".join("" if row[c] is None else
+                                    f"{row[c]:.4g}" if isinstance(row[c], float) else str(row[c]) for c in shown))
+            print(f"{len(rows)} measurement(s) in {elapsed_ms:.1f} ms")
@@ -0,0 +1,240 @@
+"""
+Per-stage timing of test runs and devices-per-hour throughput.
+
+Every run_test creates a RunTimer; each stage (connect, reset, configure, measure, fetch, save, write,
+cleanup...) appends one record to <data path>/run_log.csv when it ends, plus a 'total' record when the
+run finishes. Finished runs also feed a rolling ThroughputMonitor (devices/hour over the last hour and
+mean stage times over the last runs). The log can be summarized later, per stage and per hour of the
+shift, to see where time goes and whether a station slows down:
+
+    python run_telemetry.py <data path>/run_log.csv
+"""
+
+import collections
+import csv
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+
+RUN_LOG_FILENAME = "run_log.csv"
+RUN_LOG_FIELDS = ["run_id", "station", "test", "device_id", "stage", "start", "duration_s", "status"]
+
+_log_lock = threading.Lock()
+
+
+def run_log_path(data_path):
+    return os.path.join(data_path or ".", RUN_LOG_FILENAME)
+
+
+def append_run_log(path, records):
+    with _log_lock:
+        new_file = not os.path.exists(path)
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=RUN_LOG_FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(records)
+
+
+class RunTimer:
+    def __init__(self, test, device_id="", data_path="", monitor=None, log=True):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.test = test
+        self.device_id = device_id
+        self.log_path = run_log_path(data_path) if log else None
+        self.monitor = monitor if monitor is not None else get_throughput_monitor()
+        self.status = "ok"
+        self.start = time.time()
+        self.end = None
+        self.stages = []  # (stage, start, duration_s, status)
+        self._open = {}  # thread id -> (stage, start)
+        self._lock = threading.Lock()
+        self._holds = 0  # work still pending on other threads (background write)
+        self._finish_requested = False
+
+    def _record(self, stage, start, duration, status="ok"):
+        with self._lock:
+            self.stages.append((stage, start, duration, status))
+        if self.log_path:
+            try:
+                append_run_log(self.log_path, [{
+                    "run_id": self.run_id, "station": socket.gethostname(), "test": self.test,
+                    "device_id": self.device_id, "stage": stage,
+                    "start": datetime.fromtimestamp(start).isoformat(timespec="milliseconds"),
+                    "duration_s": f"{duration:.4f}", "status": status}])
+            except OSError as e:
+                print(f"Error writing run log {self.log_path}: {e}")
+
+    def stage(self, name):
+        """
+        End the current stage of the calling thread and start stage name.
+        """
+        now = time.time()
+        previous = self._open.pop(threading.get_ident(), None)
+        if previous:
+            self._record(previous[0], previous[1], now - previous[1])
+        if name:
+            self._open[threading.get_ident()] = (name, now)
+
+    def timed(self, name, func, *args, **kwargs):
+        """
+        Run func as stage name (from any thread, e.g. concurrent setup or the background writer).
+        """
+        start = time.time()
+        status = "error"
+        try:
+            result = func(*args, **kwargs)
+            status = "error" if result is False else "ok"
+            return result
+        finally:
+            self._record(name, start, time.time() - start, status)
+
+    def hold(self):
+        """
+        Keep the run open for work still pending on another thread, e.g. the background write:
+        finish() then only takes effect once every hold is released.
+        """
+        with self._lock:
+            self._holds += 1
+
+    def release(self, status=None):
+        """
+        Release a hold. Returns the run duration if this finished the run, else None.
+        """
+        with self._lock:
+            if status:
+                self.status = status
+            self._holds -= 1
+            if self._holds or not self._finish_requested:
+                return None
+        return self._finish()
+
+    def finish(self, status=None):
+        """
+        Close the open stages, log the run total and add the run to the throughput monitor.
+        While a hold is pending the run is finished by the last release() instead; returns None then.
+        """
+        self.stage(None)
+        with self._lock:
+            if status:
+                self.status = status
+            self._finish_requested = True
+            if self._holds:
+                return None
+        return self._finish()
+
+    def _finish(self):
+        self.end = time.time()
+        for name, start in list(self._open.values()):
+            self._record(name, start, self.end - start)
+        self._open.clear()
+        self._record("total", self.start, self.end - self.start, self.status)
+        self.monitor.add(self)
+        return self.end - self.start
+
+    def stage_totals(self):
+        totals = collections.OrderedDict()
+        with self._lock:
+            for stage, _, duration, _ in self.stages:
+                if stage != "total":
+                    totals[stage] = totals.get(stage, 0.0) + duration
+        return totals
+
+
+class ThroughputMonitor:
+    def __init__(self, window_s=3600.0, history=50):
+        self.window_s = window_s
+        self.runs = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def add(self, run):
+        with self._lock:
+            self.runs.append((run.start, run.end, run.status, run.test, run.stage_totals()))
+
+    def devices_per_hour(self, now=None):
+        """
+        Finished devices per hour over the rolling window, idle time between devices included.
+        """
+        now = now or time.time()
+        with self._lock:
+            recent = [r for r in self.runs if r[1] >= now - self.window_s and r[2] == "ok"]
+        if not recent:
+            return 0.0
+        span = max(r[1] for r in recent) - min(r[0] for r in recent)
+        return 3600.0 * len(recent) / span if span > 0 else 0.0
+
+    def stage_means(self, last_n=20):
+        with self._lock:
+            runs = list(self.runs)[-last_n:]
+        sums, counts = collections.OrderedDict(), collections.Counter()
+        for _, _, _, _, totals in runs:
+            for stage, duration in totals.items():
+                sums[stage] = sums.get(stage, 0.0) + duration
+                counts[stage] += 1
+        return collections.OrderedDict((stage, sums[stage] / counts[stage]) for stage in sums)
+
+    def summary(self):
+        """One line for the status bar / console"""
+        with self._lock:
+            if not self.runs:
+                return "No runs yet"
+            start, end, status, test, totals = self.runs[-1]
+        line = f"{self.devices_per_hour():.1f} devices/h, last {test} {end - start:.1f} s ({status})"
+        if totals:
+            slowest = max(totals, key=totals.get)
+            line += f", slowest stage {slowest} {totals[slowest]:.1f} s"
+        return line
+
+
+_monitor = ThroughputMonitor()
+
+
+def get_throughput_monitor():
+    return _monitor
+
+
+def summarize_run_log(path):
+    """
+    Per stage statistics and per hour throughput from a run log.
+    :return: (stage_stats, hourly) lists of dicts
+    """
+    import numpy as np
+    durations = collections.defaultdict(list)
+    hourly = collections.OrderedDict()
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            key = (row["test"], row["stage"])
+            durations[key].append(float(row["duration_s"]))
+            if row["stage"] == "total":
+                hour = row["start"][:13]  # YYYY-MM-DDTHH
+                entry = hourly.setdefault(hour, {"hour": hour, "devices": 0, "failed": 0, "run_time_s": 0.0})
+                entry["devices"] += row["status"] == "ok"
+                entry["failed"] += row["status"] != "ok"
+                entry["run_time_s"] += float(row["duration_s"])
+    stage_stats = []
+    for (test, stage), values in durations.items():
+        values = np.array(values)
+        stage_stats.append({"test": test, "stage": stage, "count": len(values),
+                            "mean_s": float(values.mean()), "p50_s": float(np.percentile(values, 50)),
+                            "p95_s": float(np.percentile(values, 95)), "total_s": float(values.sum())})
+    for entry in hourly.values():
+        runs = entry["devices"] + entry["failed"]
+        entry["mean_run_s"] = entry["run_time_s"] / runs if runs else 0.0
+    return stage_stats, list(hourly.values())
+
+
+if __name__ == "__main__":
+    import sys
+
+    log = sys.argv[1] if len(sys.argv) > 1 else RUN_LOG_FILENAME
+    stage_stats, hourly = summarize_run_log(log)
+    print(f"{'test':<10}{'stage':<14}{'count':>7}{'mean s':>10}{'p50 s':>10}{'p95 s':>10}{'total s':>11}")
+    for s in stage_stats:
+        print(f"{s['test']:<10}{s['stage']:<14}{s['count']:>7}{s['mean_s']:>10.2f}{s['p50_s']:>10.2f}"
+              f"{s['p95_s']:>10.2f}{s['total_s']:>11.1f}")
+    print(f"\n{'hour':<16}{'devices':>9}{'failed':>8}{'mean run s':>12}")
+    for h in hourly:
+        print(f"{h['hour']:<16}{h['devices']:>9}{h['failed']:>8}{h['mean_run_s']:>12.1f}")
@@ -0,0 +1,259 @@
+"""
+Opt-in latency tracing of instrument I/O.
+
+Drivers wrap their VISA resource with traced_resource(); while tracing is enabled every write/query/read
+is recorded (command, bytes sent/received, wall time, VISA errors) into a fixed size ring buffer.
+Instrument error queue hits (SYST:ERR? answers other than 0) are attached to the command that caused them.
+Events are tagged with the current test phase, set by the test classes with set_phase().
+
+    from scpi_trace import get_tracer
+    tracer = get_tracer()
+    tracer.enable()
+    ...run tests...
+    tracer.export_csv("trace.csv"); tracer.export_json("trace_summary.json")
+"""
+
+import collections
+import csv
+import json
+import re
+import threading
+import time
+
+import numpy as np
+
+EVENT_FIELDS = ("time", "instrument", "phase", "kind", "command", "bytes_sent", "bytes_received",
+                "duration_ms", "error", "error_queue")
+ERROR_QUERY = re.compile(r"^:?SYST(EM)?:ERR(OR)?(:NEXT)?\?", re.IGNORECASE)
+TRAILING_ARGUMENT = re.compile(r"[\s,]*[-+]?\.?\d[\d.eE+-]*$")
+
+
+def command_key(command):
+    """
+    Command without its arguments, to group events: ':SOUR1:VOLT 0.5' -> ':SOUR1:VOLT', 'CNT1310' -> 'CNT'
+    """
+    command = command.strip()
+    head = command.split(None, 1)[0] if command else ""
+    return TRAILING_ARGUMENT.sub("", head) or head
+
+
+class TraceEvent:
+    __slots__ = EVENT_FIELDS
+
+    def __init__(self, instrument, phase, kind, command, bytes_sent, bytes_received, duration_ms, error):
+        self.time = time.time()
+        self.instrument = instrument
+        self.phase = phase
+        self.kind = kind
+        self.command = command
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+        self.duration_ms = duration_ms
+        self.error = error
+        self.error_queue = None
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in EVENT_FIELDS}
+
+
+class SCPITracer:
+    def __init__(self, capacity=20000):
+        self.enabled = False
+        self.events = collections.deque(maxlen=capacity)
+        self._local = threading.local()
+        self._default_phase = ""
+        self._last_command = {}  # instrument -> last event that was not an error query
+
+    def enable(self, capacity=None):
+        if capacity and capacity != self.events.maxlen:
+            self.events = collections.deque(self.events, maxlen=capacity)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self.events.clear()
+        self._last_command.clear()
+
+    # --- test phases ---
+    def set_phase(self, phase):
+        """
+        Tag the following events of this thread with phase. Threads that never set a phase use the
+        last phase set by any thread.
+        """
+        self._local.phase = phase
+        self._default_phase = phase
+
+    @property
+    def phase(self):
+        return getattr(self._local, "phase", self._default_phase)
+
+    # --- recording ---
+    def record(self, instrument, kind, command, bytes_sent, bytes_received, duration_s, error=None, response=None):
+        event = TraceEvent(instrument, self.phase, kind, command, bytes_sent, bytes_received,
+                           round(duration_s * 1000, 3), error)
+        if command and ERROR_QUERY.match(command):
+            answer = (response or "").strip()
+            code = answer.split(",", 1)[0].strip()
+            if answer and code.lstrip("+-0") != "":  # "+0,No error" / "0" is not a hit
+                previous = self._last_command.get(instrument)
+                if previous is not None:
+                    previous.error_queue = answer
+                event.error_queue = answer
+        elif kind in ("write", "query", "write_raw"):
+            self._last_command[instrument] = event
+        self.events.append(event)
+        return event
+
+    # --- summaries ---
+    def snapshot(self):
+        return list(self.events)
+
+    def command_summary(self, events=None):
+        """
+        Per instrument and command: count, p50/p95/p99/max latency (ms), bytes and error counts
+        """
+        groups = collections.defaultdict(list)
+        for event in self.snapshot() if events is None else events:
+            key = command_key(event.command)
+            if event.kind not in ("write", "query"):  # reads are grouped under the command they answer
+                key = f"{key} [{event.kind}]".strip()
+            groups[event.instrument, key].append(event)
+        rows = []
+        for (instrument, command), group in groups.items():
+            durations = np.array([e.duration_ms for e in group])
+            p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+            rows.append({
+                "instrument": instrument,
+                "command": command,
+                "count": len(group),
+                "total_ms": round(float(durations.sum()), 3),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(durations.max()), 3),
+                "bytes_sent": sum(e.bytes_sent for e in group),
+                "bytes_received": sum(e.bytes_received for e in group),
+                "visa_errors": sum(1 for e in group if e.error),
+                "error_queue_hits": sum(1 for e in group if e.error_queue and not ERROR_QUERY.match(e.command)),
+            })
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return rows
+
+    def phase_summary(self, events=None):
+        """
+        Per test phase: number of I/O calls, total I/O time (ms) and bytes
+        """
+        totals = {}
+        for event in self.snapshot() if events is None else events:
+            row = totals.setdefault(event.phase or "-", {"phase": event.phase or "-", "calls": 0, "io_ms": 0.0,
+                                                         "bytes_sent": 0, "bytes_received": 0, "errors": 0})
+            row["calls"] += 1
+            row["io_ms"] += event.duration_ms
+            row["bytes_sent"] += event.bytes_sent
+            row["bytes_received"] += event.bytes_received
+            row["errors"] += bool(event.error or event.error_queue)
+        for row in totals.values():
+            row["io_ms"] = round(row["io_ms"], 3)
+        return list(totals.values())
+
+    # --- export ---
+    def export_csv(self, path):
+        """Every event in the ring buffer, one row per I/O call"""
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=EVENT_FIELDS)
+            writer.writeheader()
+            for event in self.snapshot():
+                writer.writerow(event.as_dict())
+        return path
+
+    def export_json(self, path, include_events=False):
+        """Command and phase summaries (and optionally the events)"""
+        events = self.snapshot()
+        report = {"generated": time.time(), "events": len(events),
+                  "commands": self.command_summary(events), "phases": self.phase_summary(events)}
+        if include_events:
+            report["trace"] = [event.as_dict() for event in events]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return path
+
+    def export(self, path):
+        return self.export_csv(path) if path.lower().endswith(".csv") else self.export_json(path)
+
+
+def _size(data):
+    if data is None:
+        return 0
+    return len(data) if isinstance(data, (bytes, bytearray, memoryview)) else len(str(data))
+
+
+class TracedResource:
+    """
+    Proxy around a pyvisa resource (or a simulated one) that records its I/O in a tracer.
+    Attribute reads and writes (timeout, terminations, baud_rate...) go to the wrapped resource.
+    Reads are recorded with the last command written, the one they answer.
+    """
+    _TRACED = ("write", "query", "read", "read_raw", "read_bytes", "write_raw")
+
+    def __init__(self, resource, name, tracer):
+        object.__setattr__(self, "_resource", resource)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_tracer", tracer)
+        object.__setattr__(self, "_last_command", "")
+
+    def __getattr__(self, attr):
+        value = getattr(self._resource, attr)
+        if attr in self._TRACED and callable(value):
+            return lambda *args, **kwargs: self._call(attr, value, args, kwargs)
+        return value
+
+    def __setattr__(self, attr, value):
+        setattr(self._resource, attr, value)
+
+    def _call(self, kind, func, args, kwargs):
+        tracer = self._tracer
+        if not tracer.enabled:
+            return func(*args, **kwargs)
+        if kind in ("write", "query"):
+            command = args[0] if args else kwargs.get("message", "")
+            object.__setattr__(self, "_last_command", command)
+            sent = len(command) + len(getattr(self._resource, "write_termination", "") or "")
+        elif kind == "write_raw":
+            command = ""
+            sent = _size(args[0] if args else kwargs.get("message"))
+        else:
+            command = self._last_command
+            sent = 0
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            tracer.record(self._name, kind, command, sent, 0, time.perf_counter() - start, error=str(e))
+            raise
+        duration = time.perf_counter() - start
+        received = _size(result) if kind in ("query", "read", "read_raw", "read_bytes") else 0
+        tracer.record(self._name, kind, command, sent, received, duration,
+                      response=result if kind == "query" else None)
+        return result
+
+
+_tracer = SCPITracer()
+
+
+def get_tracer():
+    return _tracer
+
+
+def set_phase(phase):
+    _tracer.set_phase(phase)
+
+
+def traced_resource(resource, name, tracer=None):
+    """
+    Wrap an opened resource for tracing. Cheap when tracing is off: one attribute check per call.
+    """
+    if resource is None or isinstance(resource, TracedResource):
+        return resource
+    return TracedResource(resource, name, tracer or _tracer)
@@ -0,0 +1,185 @@
+"""
+Vectorized analysis of OSA traces (wavelength in nm, level in dBm).
+
+Computes the same row the OSA analysis functions give (pkpow, pkwl, wl1, pow1, wl2, pow2, dwl, smsr)
+directly from the fetched trace, plus the -20 dB width and the longitudinal mode spacing.
+Batch functions take 2D arrays of shape (n_spectra, n_points), one trace per row.
+"""
+
+import os
+import re
+from datetime import datetime
+import numpy as np
+
+SPECTRUM_ROW_HEADER = ['pkpow', 'pkwl', 'wl1', 'pow1', 'wl2', 'pow2', 'dwl', 'smsr']
+
+
+def _local_maxima(levels):
+    peaks = np.zeros(levels.shape, dtype=bool)
+    peaks[:, 1:-1] = (levels[:, 1:-1] >= levels[:, :-2]) & (levels[:, 1:-1] > levels[:, 2:])
+    return peaks
+
+
+def _crossing(wl, levels, rows, inner, outer, target):
+    """
+    Linear interpolation of the wavelength where the level crosses target between two neighbouring points.
+    """
+    x0, x1 = wl[rows, inner], wl[rows, outer]
+    y0, y1 = levels[rows, inner], levels[rows, outer]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac = np.where(y1 != y0, (target - y0) / (y1 - y0), 0.0)
+    return x0 + frac * (x1 - x0)
+
+
+def analyze_spectra(wavelength, levels, min_separation=0.1, width_db=20.0, mode_threshold_db=10.0):
+    """
+    Peak / side mode analysis for a batch of spectra.
+    :param wavelength: wavelengths (nm), shape (n_points,) shared by all rows or (n_spectra, n_points)
+    :param levels: levels (dBm), shape (n_spectra, n_points)
+    :param min_separation: side mode candidates must be at least this far (nm) from the main peak
+    :param width_db: level below the peak for the spectral width (default -20 dB width)
+    :param mode_threshold_db: peaks this far above the median (noise floor) count for the mode spacing
+    :return: dict of 1D arrays
+    """
+    levels = np.atleast_2d(np.asarray(levels, dtype=float))
+    wavelength = np.asarray(wavelength, dtype=float)
+    wl = np.broadcast_to(wavelength, levels.shape) if wavelength.ndim == 1 else np.atleast_2d(wavelength)
+    n_spectra, n_points = levels.shape
+    rows = np.arange(n_spectra)
+    levels = np.where(np.isfinite(levels), levels, -np.inf)
+
+    # Main peak
+    pk_idx = np.argmax(levels, axis=1)
+    pkpow = levels[rows, pk_idx]
+    pkwl = wl[rows, pk_idx]
+
+    # Side mode: highest local maximum outside the exclusion band around the main peak
+    peaks = _local_maxima(levels)
+    candidates = peaks & (np.abs(wl - pkwl[:, None]) >= min_separation)
+    side_levels = np.where(candidates, levels, -np.inf)
+    side_idx = np.argmax(side_levels, axis=1)
+    has_side = np.isfinite(side_levels[rows, side_idx])
+    wl2 = np.where(has_side, wl[rows, side_idx], np.nan)
+    pow2 = np.where(has_side, levels[rows, side_idx], np.nan)
+
+    # Width at width_db below the peak: nearest points under the target on each side
+    target = pkpow - width_db
+    idx = np.arange(n_points)[None, :]
+    below = levels < target[:, None]
+    left_below = np.where(below & (idx < pk_idx[:, None]), idx, -1).max(axis=1)
+    right_below = np.where(below & (idx > pk_idx[:, None]), idx, n_points).min(axis=1)
+    has_width = (left_below >= 0) & (right_below < n_points)
+    left_below = np.clip(left_below, 0, n_points - 1)
+    right_below = np.clip(right_below, 0, n_points - 1)
+    left_wl = _crossing(wl, levels, rows, np.clip(left_below + 1, 0, n_points - 1), left_below, target)
+    right_wl = _crossing(wl, levels, rows, np.clip(right_below - 1, 0, n_points - 1), right_below, target)
+    width = np.where(has_width, right_wl - left_wl, np.nan)
+
+    # Mode spacing: median distance between neighbouring significant peaks
+    floor = np.median(np.where(np.isfinite(levels), levels, np.nan), axis=1)
+    significant = peaks & (levels > (floor + mode_threshold_db)[:, None])
+    significant[rows, pk_idx] = True
+    mode_spacing = np.full(n_spectra, np.nan)
+    for r in np.flatnonzero(significant.sum(axis=1) >= 2):
+        mode_spacing[r] = np.median(np.diff(wl[r, significant[r]]))
+
+    finite_peak = np.isfinite(pkpow)
+    return {
+        "pkpow": np.where(finite_peak, pkpow, np.nan),
+        "pkwl": np.where(finite_peak, pkwl, np.nan),
+        "wl1": np.where(finite_peak, pkwl, np.nan),
+        "pow1": np.where(finite_peak, pkpow, np.nan),
+        "wl2": wl2,
+        "pow2": pow2,
+        "dwl": wl2 - pkwl,
+        "smsr": pkpow - pow2,
+        "width": width,
+        "mode_spacing": mode_spacing,
+    }
+
+
+def spectrum_row(wavelength, levels, **kwargs):
+    """
+    pkpow, pkwl, wl1, pow1, wl2, pow2, dwl, smsr for a single trace, rounded like the OSA readings.
+    """
+    result = analyze_spectra(wavelength, np.asarray(levels, dtype=float)[None, :], **kwargs)
+    return [round(float(result[key][0]), 3) for key in SPECTRUM_ROW_HEADER]
+
+
+def load_spectrum_csv(filepath):
+    """
+    Read a trace CSV written by Spectrum.run_test (header 'Freq, Amplitude').
+    """
+    data = np.loadtxt(filepath, delimiter=',', skiprows=1, ndmin=2)
+    return data[:, 0], data[:, 1]
+
+
+def analyze_spectrum_folder(input_dir, **kwargs):
+    """
+    Reprocess every trace of a folder (trace CSVs and the spectrum archive) and save spectrum_analysis_<timestamp>.xlsx
+    """
+    import pandas as pd
+    print("\nAnalyzing spectra...")
+    if not os.path.isdir(input_dir):
+        print(f"Error: Folder {input_dir} not found")
+        return None
+
+    filenames, wavelengths, levels = [], [], []
+
+    def add_trace(name, wl, lv):
+        wl, lv = np.asarray(wl, dtype=float).ravel(), np.asarray(lv, dtype=float).ravel()
+        if wl.size == 0 or wl.size != lv.size:
+            print(f"Skipping {name}: empty or truncated trace ({wl.size} wavelengths, {lv.size} levels)")
+            return
+        filenames.append(name)
+        wavelengths.append(wl)
+        levels.append(lv)
+
+    seen = set()
+    for filename in sorted(os.listdir(input_dir)):
+        if filename.endswith(".csv") and "_Spectrum_" in filename:
+            seen.add(filename)
+            try:
+                wl, lv = load_spectrum_csv(os.path.join(input_dir, filename))
+            except Exception as e:
+                print(f"Error reading {filename}: {e}")
+                continue
+            add_trace(filename, wl, lv)
+
+    from spectrum_archive import SpectrumArchive, default_archive_dir
+    archive = SpectrumArchive(default_archive_dir(input_dir))
+    for entry in archive.records():
+        if entry["name"] not in seen:
+            try:
+                wl, lv = archive.read(entry)
+            except Exception as e:
+                print(f"Error reading {entry['name']}: {e}")
+                continue
+            add_trace(entry["name"], wl, lv)
+    if not filenames:
+        print("No spectrum files found")
+        return None
+
+    # Traces with the same sampling are analysed together in one batch
+    groups = {}
+    for i, wl in enumerate(wavelengths):
+        groups.setdefault((len(wl), wl[0], wl[-1]), []).append(i)
+    rows = [None] * len(filenames)
+    for members in groups.values():
+        result = analyze_spectra(wavelengths[members[0]], np.vstack([levels[i] for i in members]), **kwargs)
+        for j, i in enumerate(members):
+            rows[i] = {key: result[key][j] for key in result}
+
+    chip_names = []
+    for filename in filenames:
+        match = re.search(r'[A-Za-z]{2}\d{4}', filename)
+        chip_names.append(match.group() if match else None)
+    results_df = pd.DataFrame(rows)
+    results_df.insert(0, "File", filenames)
+    results_df.insert(0, "Chip Name", chip_names)
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output_path = os.path.join(input_dir, f"spectrum_analysis_{timestamp}.xlsx")
+    results_df.to_excel(output_path, index=False)
+    print(f"File Saved to {output_path}")
+    return results_df
@@ -0,0 +1,169 @@
+"""
+Per-lot spectrum trace archive.
+
+Layout:
+    <data path>/spectrum_archive/<lot>/spectra.f8    float64 blocks, one (2, n_points) block per trace (wavelength, level)
+    <data path>/spectrum_archive/<lot>/index.jsonl   one JSON line per trace: names, offset, analysis row, run info
+
+Traces are appended with their analysis row, replacing the per-device trace / pkpow_pkwl_smsr CSVs.
+Reads are memory mapped; when every trace of a lot has the same number of points, levels_matrix()
+returns the whole lot as a (n_traces, n_points) view without copying.
+"""
+
+import json
+import os
+import time
+import numpy as np
+from measurement_store import lot_from_path
+from spectrum_analysis import SPECTRUM_ROW_HEADER
+
+ARCHIVE_DIRNAME = "spectrum_archive"
+DATA_FILENAME = "spectra.f8"
+INDEX_FILENAME = "index.jsonl"
+
+
+def default_archive_dir(data_path):
+    return os.path.join(data_path or ".", ARCHIVE_DIRNAME, lot_from_path(data_path))
+
+
+class SpectrumArchive:
+    def __init__(self, lot_dir):
+        self.lot_dir = lot_dir
+        self._map = (0, None)
+
+    @property
+    def data_path(self):
+        return os.path.join(self.lot_dir, DATA_FILENAME)
+
+    @property
+    def index_path(self):
+        return os.path.join(self.lot_dir, INDEX_FILENAME)
+
+    def append(self, wavelength, levels, row, name, param_name, metadata=None):
+        """
+        Append one trace and its [pkpow, pkwl, wl1, pow1, wl2, pow2, dwl, smsr] row.
+        :param name: trace name (the filename the trace CSV would have had)
+        :param param_name: analysis row name (the filename the pkpow_pkwl_smsr CSV would have had)
+        """
+        block = np.vstack([np.asarray(wavelength, dtype='<f8'), np.asarray(levels, dtype='<f8')])
+        os.makedirs(self.lot_dir, exist_ok=True)
+        with open(self.data_path, "ab") as f:
+            offset = f.tell() // 8
+            f.write(block.tobytes())
+
+        entry = {
+            "name": name,
+            "param_name": param_name,
+            "offset": offset,
+            "num_points": block.shape[1],
+            "written": time.time(),
+            **dict(zip(SPECTRUM_ROW_HEADER, (float(v) for v in row))),
+            **(metadata or {}),
+        }
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+        return entry
+
+    def records(self, contains=None):
+        if not os.path.isfile(self.index_path):
+            return []
+        entries = []
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    if contains is None or contains in entry["name"]:
+                        entries.append(entry)
+        return entries
+
+    def _memmap(self, needed):
+        n_values, mm = self._map
+        if mm is None or n_values < needed:
+            n_values = os.path.getsize(self.data_path) // 8
+            mm = np.memmap(self.data_path, dtype='<f8', mode='r', shape=(n_values,))
+            self._map = (n_values, mm)
+        return mm
+
+    def read(self, entry):
+        """
+        (wavelength, levels) views of one trace.
+        """
+        n = entry["num_points"]
+        start = entry["offset"]
+        block = self._memmap(start + 2 * n)[start:start + 2 * n].reshape(2, n)
+        return block[0], block[1]
+
+    def _contiguous(self, entries):
+        # The data file holds exactly these blocks back to back. A block written without its index line
+        # (append interrupted between the two writes) shifts every later trace, so the view would be wrong.
+        n = entries[0]["num_points"]
+        if any(entry["offset"] != i * 2 * n for i, entry in enumerate(entries)):
+            return False
+        return os.path.getsize(self.data_path) == len(entries) * 2 * n * 8
+
+    def levels_matrix(self, entries=None):
+        """
+        (wavelength, levels) for many traces. Zero-copy 2D view when the selected traces are the
+        whole archive with a common length, stored back to back; otherwise a NaN padded copy.
+        """
+        all_entries = self.records()
+        entries = all_entries if entries is None else entries
+        if not entries:
+            return np.empty((0, 0)), np.empty((0, 0))
+        lengths = {e["num_points"] for e in entries}
+        if len(lengths) == 1 and entries == all_entries and self._contiguous(entries):
+            n = next(iter(lengths))
+            total = len(entries) * 2 * n
+            blocks = self._memmap(total)[:total].reshape(len(entries), 2, n)
+            return blocks[:, 0, :], blocks[:, 1, :]
+        length = max(lengths)
+        wavelength = np.full((len(entries), length), np.nan)
+        levels = np.full((len(entries), length), np.nan)
+        for i, entry in enumerate(entries):
+            wl, lv = self.read(entry)
+            wavelength[i, :len(wl)] = wl
+            levels[i, :len(lv)] = lv
+        return wavelength, levels
+
+    def to_dataframe(self, entry):
+        import pandas as pd
+        wavelength, levels = self.read(entry)
+        # same column names as the trace CSV header 'Freq, Amplitude'
+        return pd.DataFrame({'Freq': np.array(wavelength), ' Amplitude': np.array(levels)})
+
+    def row_dataframe(self, entry):
+        import pandas as pd
+        return pd.DataFrame([[entry[k] for k in SPECTRUM_ROW_HEADER]], columns=SPECTRUM_ROW_HEADER)
+
+    def record_path(self, entry):
+        return os.path.join(self.lot_dir, entry["name"])
+
+    def latest_record(self):
+        entries = self.records()
+        return max(entries, key=lambda e: e.get("written", 0)) if entries else None
+
+
+def is_archive_path(path):
+    """
+    True for virtual trace paths of the form <data path>/spectrum_archive/<lot>/<name>
+    """
+    lot_dir = os.path.dirname(path)
+    return (not os.path.exists(path)) and os.path.basename(os.path.dirname(lot_dir)) == ARCHIVE_DIRNAME \
+        and os.path.isfile(os.path.join(lot_dir, INDEX_FILENAME))
+
+
+def read_archive_path(path):
+    archive = SpectrumArchive(os.path.dirname(path))
+    for entry in archive.records():
+        if entry["name"] == os.path.basename(path):
+            return archive.to_dataframe(entry)
+    raise FileNotFoundError(f"No trace {os.path.basename(path)} in {archive.lot_dir}")
+
+
+def archive_row_sources(input_dir):
+    """
+    (param_name, loader) pairs for the analysis rows archived for a data folder.
+    loader() returns a one-row DataFrame laid out like the pkpow_pkwl_smsr CSV.
+    """
+    archive = SpectrumArchive(default_archive_dir(input_dir))
+    return [(entry["param_name"], lambda e=entry: archive.row_dataframe(e)) for entry in archive.records()]
@@ -0,0 +1,116 @@
+"""
+GUI startup benchmark.
+
+Each run starts a fresh interpreter (cold imports) that imports main_gui, builds PulsedGuiApp and
+processes the first frame, then reports the time of every phase and which heavy modules were loaded.
+The first-frame phases need a display (use Xvfb on a headless box); without one only the import
+phase is measured.
+
+usage: python startup_benchmark.py [--runs 5] [--log startup_benchmark.csv]
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+HEAVY_MODULES = ("numpy", "pandas", "matplotlib", "pyvisa", "openpyxl", "PIL")
+PHASES = ("interpreter", "import", "window", "first_frame", "extraction_tab", "first_plot_figure")
+
+
+def child():
+    start = time.perf_counter()
+    timings = {}
+    import main_gui
+    timings["import"] = time.perf_counter() - start
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+    try:
+        t = time.perf_counter()
+        root = main_gui.tk.Tk()
+        app = main_gui.PulsedGuiApp(root)
+        main_gui.set_window_icon(root)
+        timings["window"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        root.update()
+        timings["first_frame"] = time.perf_counter() - t
+        loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+
+        # Deferred work, paid the first time the user needs it
+        t = time.perf_counter()
+        app.notebook.select(3)
+        app.build_tab(app.notebook.select())
+        root.update()
+        timings["extraction_tab"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        app.graph_panel.ensure_figure()
+        root.update()
+        timings["first_plot_figure"] = time.perf_counter() - t
+        root.destroy()
+    except main_gui.tk.TclError as e:
+        print(f"No display, first frame not measured: {e}", file=sys.stderr)
+    print(json.dumps({"timings": timings, "loaded": loaded}))
+
+
+def run_once():
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "child failed")
+    if result.stderr.strip():
+        print(result.stderr.strip().splitlines()[-1])
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    timings = report["timings"]
+    timings["interpreter"] = wall - sum(timings.values())
+    return timings, report["loaded"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure GUI cold start (import + first frame)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--log", help="append the medians to this CSV file to track startup over time")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        child()
+        return
+
+    runs = []
+    loaded = None
+    for i in range(args.runs):
+        timings, loaded = run_once()
+        runs.append(timings)
+        print(f"run {i + 1}: " + ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in timings.items()))
+
+    medians = {}
+    print(f"\nMedian of {len(runs)} cold starts:")
+    for phase in PHASES:
+        values = sorted(r[phase] for r in runs if phase in r)
+        if values:
+            medians[phase] = values[len(values) // 2]
+            print(f"  {phase:<18} {medians[phase] * 1000:8.0f} ms")
+    startup = sum(medians.get(p, 0) for p in ("interpreter", "import", "window", "first_frame"))
+    print(f"  {'startup total':<18} {startup * 1000:8.0f} ms")
+    print(f"Heavy modules loaded at startup: {', '.join(loaded) or 'none'}")
+
+    if args.log:
+        new_file = not os.path.exists(args.log)
+        with open(args.log, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["date", *PHASES, "startup_total", "loaded_at_startup"])
+            writer.writerow([datetime.now().isoformat(timespec="seconds"),
+                             *(f"{medians[p]:.4f}" if p in medians else "" for p in PHASES),
+                             f"{startup:.4f}", " ".join(loaded)])
+        print(f"Logged to {args.log}")
+
+
+if __name__ == "__main__":
+    main()
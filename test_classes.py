@@ -1,18 +1,17 @@
-import tkinter as tk
-from tkinter import ttk
 from utils import *
 import time
 import threading
-import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait as futures_wait
 from datetime import datetime
 import os
-import pandas as pd
 import numpy as np
 import sys
-import matplotlib
-from new_KeysightB2912A import KeysightB2912A
-import pyvisa
-matplotlib.use('TkAgg')
+from async_writer import get_writer
+from scpi_trace import set_phase
+from run_telemetry import RunTimer, get_throughput_monitor
+from instruments.osa_backends import make_osa_backend
+from plot_renderer import get_renderer
+from spectrum_archive import SpectrumArchive, default_archive_dir
 
 
 class Base:
@@ -30,6 +29,15 @@ class Base:
 
         self.param_sets = []
 
+        # "store" (measurement store, Excel on demand), "xlsx" or "both"
+        self.output_format = "store"
+        # Hand the file write to the background writer so the SMUs are released right after the fetch
+        self.background_write = True
+        # Stage timing of the run in progress (run_telemetry.py), logged to <data path>/run_log.csv
+        self.current_run = None
+        # the last finished run, to check its status after run_test returns
+        self.last_run = None
+
         self.param_vars = {}
         self.sync_in_progress = False # Flag to prevent infinite sync loops
 
@@ -44,6 +52,9 @@ class Base:
         # For 50% duty cycle: pulse_width = 20.0e-3, trigger_period = 40e-3
 
     def setup_tab(self, parent):
+        # Tk is only imported by the GUI, so the controllers also run headless (batch_runner.py)
+        import tkinter as tk
+        from tkinter import ttk
         # Create main columns container
         columns_container = tk.Frame(parent, bg='white')
         columns_container.pack(expand=True, fill="both")
@@ -94,6 +105,8 @@ class Base:
         columns_container.rowconfigure(0, weight=1)
 
     def create_param_entries_vertical(self, parent, param_config, params_dict, param_set_name, bg_color):
+        import tkinter as tk
+        from tkinter import ttk
         row_idx = 0
 
         for key, (label_text, data_type, options) in param_config.items():
@@ -228,7 +241,40 @@ class Base:
         finally:
             self.sync_in_progress = False
 
+    def stage(self, name):
+        """Start a timed stage of the current run; also tags the instrument I/O trace"""
+        set_phase(name)
+        if self.current_run:
+            self.current_run.stage(name)
+
+    def timed_stage(self, name, func, *args, **kwargs):
+        """Run func as a stage of the current run, e.g. on another thread"""
+        set_phase(name)
+        if self.current_run:
+            return self.current_run.timed(name, func, *args, **kwargs)
+        return func(*args, **kwargs)
+
+    def finish_run(self, status=None):
+        if self.current_run:
+            # with a background write pending, the writer finishes the run once the file is written
+            if self.current_run.finish(status) is not None:
+                print(f"Throughput: {get_throughput_monitor().summary()}")
+            self.last_run = self.current_run
+            self.current_run = None
+
+    @staticmethod
+    def write_and_finish(run, save_args):
+        """Background writer job: save the sweep, then release the run with the outcome of the write"""
+        ok = False
+        try:
+            ok = run.timed("write", create_combined_excel_file, *save_args) is not False
+            return ok
+        finally:
+            if run.release(None if ok else "error") is not None:
+                print(f"Throughput: {get_throughput_monitor().summary()}")
+
     def connect_smus(self, connect_eam):
+        from new_KeysightB2912A import KeysightB2912A  # loads pyvisa on first connection
         try:
             if self.smu1 is None or self.smu1.instrument is None:
                 print(f"Attempting to connect to SMU1: {self.params_laser["smu_ip"]}")
@@ -250,8 +296,8 @@ class Base:
         print("\n--- Setting SMU to defaults ---")
         if self.smu1 and self.smu1.instrument:
             # Turn off outputs first
-            self.smu1.output_off(self.params_photodetector['smu_channel'])
-            self.smu1.output_off(self.params_laser['smu_channel'])
+            self.smu1.output_off(self.params_photodetector.get('smu_channel', 1))
+            self.smu1.output_off(self.params_laser.get('smu_channel', 2))
             print("SMU1 outputs off.")
 
             # Set channel 1 (PD) to -1V bias with 50mA compliance
@@ -267,7 +313,7 @@ class Base:
             print("SMU1 Channel 2 set to 80mA bias with 2V compliance.")
 
         if self.smu2 and self.smu2.instrument:
-            self.smu2.output_off(self.params_eam['smu_channel'])
+            self.smu2.output_off(self.params_eam.get('smu_channel', 1))
             print("SMU2 outputs off.")
 
             # Set channel 3 (EAM) to -2. bias with 80mA compliance
@@ -277,6 +323,8 @@ class Base:
             print("SMU2 Channel 1 set to -2V bias with 80mA compliance.")
 
     def run_test(self, data_path="", device_id="", temperature="", timestamp=""):
+        import pyvisa
+        self.current_run = RunTimer(self.name, device_id, data_path)
         try:
             current_timestamp = timestamp or datetime.now().strftime("%Y%m%dT%H%M%S")
 
@@ -299,10 +347,13 @@ class Base:
                 num_measurement_points = self.params_eam['num_points']
                 active_trigger_period = self.params_eam['trigger_period']
 
+            self.stage("connect")
             if not self.connect_smus(is_eam):
                 print("SMU connection failed. Aborting test.")
+                self.current_run.status = "error"
                 return
 
+            self.stage("reset")
             print("\n--- Initializing SMU1 ---")
             self.smu1.reset()
             if is_eam:
@@ -311,11 +362,13 @@ class Base:
 
             time.sleep(0.5) #settle time
 
+            self.stage("configure")
             self.smu1.config_pulsed_params(self.params_photodetector)
             self.smu1.config_pulsed_params(self.params_laser)
             if is_eam:
                 self.smu2.config_pulsed_params(self.params_eam)
 
+            self.stage("measure")
             print("\nTurning on outputs and initiating measurement...")
             self.smu1.output_on(self.params_photodetector['smu_channel'])
             self.smu1.output_on(self.params_laser['smu_channel'])
@@ -336,6 +389,7 @@ class Base:
                 time.sleep(1)
             print("\nMeasurement potentially complete. Fetching data.")
 
+            self.stage("fetch")
             print("\nFetching measurement results...")
             laser_voltage_data = self.smu1.query(f":fetc:arr:volt? (@{self.params_laser['smu_channel']})")
             photodetector_current_data = self.smu1.query(
@@ -349,38 +403,56 @@ class Base:
             if is_eam:
                 print(f"  EAM Fetched (I): {eam_current_data[:50]}...")
 
-            success = create_combined_excel_file(
+            save_args = (
                 laser_voltage_data,
                 photodetector_current_data,
                 eam_current_data,
                 current_timestamp,
-                self.params_photodetector,
-                self.params_laser,
-                self.params_eam,
+                dict(self.params_photodetector),  # copies, the GUI may edit the params while the write is queued
+                dict(self.params_laser),
+                dict(self.params_eam),
                 is_eam,
                 device_id,
                 temperature,
-                data_path
+                data_path,
+                self.output_format
             )
 
-            if success:
-                print("\n--- Excel file creation completed successfully ---")
+            self.stage("save")
+            if self.background_write:
+                # the 'write' stage, run total and throughput are logged when the writer thread has finished the file
+                self.current_run.hold()
+                try:
+                    get_writer().submit(self.write_and_finish, self.current_run, save_args,
+                                        description=f"{self.name} {device_id} {current_timestamp}")
+                except Exception:
+                    self.current_run.release("error")
+                    raise
+                print("\n--- Measurement queued for background write ---")
+            elif self.timed_stage("write", create_combined_excel_file, *save_args):
+                print("\n--- Measurement saved successfully ---")
             else:
-                print("\n--- Excel file creation failed ---")
+                self.current_run.status = "error"
+                print("\n--- Saving measurement failed ---")
 
             print("\n--- Measurement Sequence Finished ---")
 
         except ConnectionError as e:
+            self.current_run.status = "error"
             print(f"Connection Error during test: {e}")
         except pyvisa.errors.VisaIOError as e:
+            self.current_run.status = "error"
             print(f"A VISA communication error occurred: {e}")
         except Exception as e:
+            self.current_run.status = "error"
             print(f"An unexpected error occurred during the script execution: {e}")
             import traceback
             traceback.print_exc()
         finally:
             # ✨ Modified cleanup procedure
+            self.stage("cleanup")
             self.set_smu_defaults()
+            self.finish_run()
 
     def close_smus(self):
         if self.smu1:
@@ -523,10 +595,14 @@ class Spectrum(Base):
             "smu_ip": ("SMU IP Address", str, None),
             "source_func2": ("Channel 2 Mode", str, [("Voltage(V)", "VOLT"), ("Current(A)", "CURR")]),
             "smu_channel2_source": ("Channel 2 Value", float, None),
-            "smu_channel2_limit": ("Channel 2 Limit", float, None)
+            "smu_channel2_limit": ("Channel 2 Limit", float, None),
+            "bias_list": ("Bias List for Map (comma sep.)", str, None),
+            "settle_time": ("Bias Settle Time (s)", float, None)
         }
 
         self.PARAM_SPECTRUM_METADATA = {
+            "osa_type": ("OSA Type", str, [("Yokogawa AQ6370", "aq6370"), ("Anritsu MS9710C", "ms9710c"),
+                                           ("Simulated", "sim")]),
             "osa_ip": ("OSA Address", str, None),
             "centre": ("Centre", float, None),
             "span": ("Span", float, None),
@@ -538,11 +614,12 @@ class Spectrum(Base):
 
         self.params_laser = {
             "smu_ip": "10.20.0.231", "source_func2": "CURR",
-            "smu_channel2_source": 0.08, "smu_channel2_limit": 2.5
+            "smu_channel2_source": 0.08, "smu_channel2_limit": 2.5,
+            "bias_list": "", "settle_time": 0.2
         }
 
         self.params_spectrum = {
-            "osa_ip": "10.20.0.199", "centre": 1310, "span": 12,
+            "osa_type": "aq6370", "osa_ip": "10.20.0.199", "centre": 1310, "span": 12,
             "res": 0.02, "sens": 'High1', "avg": 1, "ref_val": -20
         }
 
@@ -551,12 +628,29 @@ class Spectrum(Base):
             ("Spectrum (OSA)", self.PARAM_SPECTRUM_METADATA, self.params_spectrum, '#cbc3e3'),
         ]
 
-    # override of run_test function to run spectrum test
-    def run_test(self, data_path="", device_id="", temperature="", timestamp=""):
-
-
+        # SMU bias/settle and OSA connect/configure run concurrently, each with its own timeout (s)
+        self.smu_setup_timeout = 30
+        self.osa_setup_timeout = 60
+
+        # Spectrum images: "lazy" (rendered when first viewed), "background" (rendered after each run) or "off"
+        self.plot_mode = "lazy"
+        # Trace + analysis row output: "archive" (per-lot spectrum archive), "csv" (text files) or "both"
+        self.spectrum_output = "archive"
+
+    def parse_bias_list(self):
+        """Laser biases for a spectrum-vs-bias map, from the comma separated bias_list parameter"""
+        bias_list = self.params_laser.get("bias_list") or ""
+        biases = [string_to_num(b.strip(), float) for b in str(bias_list).split(",") if b.strip()]
+        if None in biases:
+            raise ValueError(f"Invalid bias list: {bias_list}")
+        return biases
+
+    def setup_smu(self):
+        """Configure SMU1 channel 2 for the laser bias and turn it on"""
         #connecting to SMU1 channel 2 for spectrum test
-        self.connect_smus(False)
+        if not self.connect_smus(False):
+            raise ConnectionError("SMU connection failed.")
+        smu = self.smu1
         #smu = KeysightB2912A('TCPIP0::'+self.params_laser['smu_ip']+'::hislip0::INSTR')  # Replace with your actual IP
         #smu.get_idn()
         smu.reset()
@@ -573,114 +667,205 @@ class Spectrum(Base):
         smu.set_autorange(2)
         smu.output_off(1) #photodiode is not needed for spectrum test
         smu.output_on(2)
+        self.read_bias(self.params_laser['smu_channel2_source'])
+        return smu
+
+    def set_bias(self, bias):
+        """Step the laser bias on SMU1 channel 2 (output already on)"""
+        self.stage("bias_step")
         if self.params_laser['source_func2'] == 'CURR':
-            out2 = smu.read_voltage(2)
+            self.smu1.set_current(2, bias)
         else:
-            out2 = smu.read_current(2)
-        print(f"Applied {self.params_laser['source_func2']}: {self.params_laser['smu_channel2_source']}, Measured Current: {out2}A")
+            self.smu1.set_voltage(2, bias)
+        time.sleep(self.params_laser.get("settle_time") or 0)
+        self.read_bias(bias)
 
-        #library for optical spectrum analyzer
-        from AQ6370Controls import AQ6370Controls
-        osa = AQ6370Controls(self.params_spectrum['osa_ip'])
-        osaBusy = threading.Event()  # OSA Busy Event
+    def read_bias(self, bias):
+        if self.params_laser['source_func2'] == 'CURR':
+            out2 = self.smu1.read_voltage(2)
+        else:
+            out2 = self.smu1.read_current(2)
+        print(f"Applied {self.params_laser['source_func2']}: {bias}, Measured: {out2}")
+        return out2
 
+    def connect_osa(self):
         """
-        Connect to OSA: Retrieves inputs and tries to connect to OSA
-        Does not try to connect if OSA connection is busy
+        Connect to OSA: opens the backend selected by osa_type (see instruments/osa_backends.py)
         """
-        if osaBusy.is_set():  # If OSA busy
-            # write_text_box(textbox, 'OSA Busy Error')
-            print("OSA Busy Error")
-            print("OSA busy. Exiting function")
-
-        osaBusy.set()  # Set event osaBusy
-        osa.setAddress(self.params_spectrum['osa_ip'])  # connect to OSA through IP address
-
+        osa = make_osa_backend(self.params_spectrum.get('osa_type', 'aq6370'), self.params_spectrum['osa_ip'])
+        print(f"Connecting to OSA ({osa.name})")
         try:
-            # write_text_box(textbox, 'Connecting to OSA')
-            print("Connecting to OSA")
-            osa.open()  # Try to open OSA
-        except Exception as e:  # Exception
-            # write_text_box(textbox, f'Cannot Connect to OSA: error {e}')  # Print error to text box
-            print(f'Cannot Connect to OSA: error {e}')
-            # connectedlabel.config(text='Not Connected', bg='red3')  # Red label
-        else:  # Connected
-            # connectedlabel.config(text='Connected', bg='green3')  # Set green label
-            print("Connected to OSA")
-            # write_text_box(textbox, 'Connected to OSA')  # Write connected to OSA
-        finally:
-            osaBusy.clear()  # Clear event
-
-        osa.setCenter(self.params_spectrum['centre'])  # '1310'
-        osa.setSpan(self.params_spectrum['span'])  # '10'
-        osa.setResolution(self.params_spectrum['res'])  # '0.02'
-        osa.setSensitivity(self.params_spectrum['sens'])  # 'High1'
-        osa.setAvg(self.params_spectrum['avg'])
-        osa.setRefValue(self.params_spectrum['ref_val'])
-
+            osa.connect()
+        except Exception as e:
+            raise ConnectionError(f"Cannot Connect to OSA: error {e}")
+        print("Connected to OSA")
+        return osa
+
+    def configure_osa(self, osa):
+        osa.configure(self.params_spectrum['centre'],  # '1310'
+                      self.params_spectrum['span'],  # '10'
+                      self.params_spectrum['res'],  # '0.02'
+                      self.params_spectrum['sens'],  # 'High1'
+                      self.params_spectrum['avg'],
+                      self.params_spectrum['ref_val'])
+
+    def connect_and_configure_osa(self):
+        osa = self.connect_osa()
+        self.configure_osa(osa)
+        return osa
+
+    def setup_concurrently(self):
+        """
+        Run the SMU bias/settle phase and the OSA connect/configure phase in parallel and join before the sweep.
+        Setup takes as long as the slower phase instead of their sum.
+        """
+        start = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="SpectrumSetup")
+        smu_future = executor.submit(self.timed_stage, "smu_setup", self.setup_smu)
+        osa_future = executor.submit(self.timed_stage, "osa_setup", self.connect_and_configure_osa)
+        executor.shutdown(wait=False)
+        try:
+            for future, timeout, phase in ((smu_future, self.smu_setup_timeout, "SMU setup"),
+                                           (osa_future, self.osa_setup_timeout, "OSA setup")):
+                remaining = max(0.0, start + timeout - time.monotonic())
+                try:
+                    future.result(timeout=remaining)
+                except FutureTimeoutError:
+                    raise TimeoutError(f"{phase} did not finish within {timeout} s")
+        except Exception:
+            # an OSA that connected while the SMU phase failed still has to be closed
+            osa_future.add_done_callback(lambda f: f.exception() is None and f.result().close())
+            # the cleanup talks to the SMU next: let a timed out SMU phase finish first (bounded by the VISA timeout)
+            if not smu_future.done():
+                print("Waiting for the SMU setup to finish before cleanup...")
+                futures_wait([smu_future])
+            raise
+        print(f"Setup complete in {time.monotonic() - start:.2f} s")
+        return osa_future.result()
+
+    def acquire_spectrum(self, osa):
+        """One sweep: returns (xvals, yvals, [pkpow, pkwl, wl1, pow1, wl2, pow2, dwl, smsr])"""
         print("Performing Sweep...")
+        self.stage("sweep")
+        osa.sweep()  # Perform single sweep
+        osa.wait()
+        self.stage("fetch")
+        (xvals, yvals) = osa.fetch_trace()  # Get trace vals (xvals, yvals)
+        self.stage("analyse")
 
-        osa.singleSweep()  # Perform single sweep and print peak power and peak wavelength
-        pkpow = round(osa.getPeakPower(), 3)
-        pkwl = round(osa.getPeakWavelength(), 3)
-        smsr = [round(item * 1e9, 3) if item > 0 and item < 1e-5 else item for item in osa.getSMSR()]
+        # Peak power/wavelength and SMSR computed locally from the trace instead of OSA analysis round trips
+        row = osa.analyse(xvals, yvals)
 
-        print(f'Peak Power: {pkpow} dBm')
-        print(f'Peak Wavelength: {pkwl} nm')
-        print(f'SMSR: {smsr} dB')
+        print(f'Peak Power: {row[0]} dBm')
+        print(f'Peak Wavelength: {row[1]} nm')
+        print(f'SMSR: {row[2:]} dB')
+        return xvals, yvals, row
 
-        osaBusy.clear()  # Clear OSA busy event
+    # override of run_test function to run spectrum test
+    def run_test(self, data_path="", device_id="", temperature="", timestamp=""):
+        timestamp = timestamp or datetime.now().strftime("%Y%m%dT%H%M%S")
+        biases = self.parse_bias_list()
+        osa = None
+        self.current_run = RunTimer(self.name, device_id, data_path)
+        status = "error"
+        try:
+            osa = self.setup_concurrently()  # the OSA is configured once, also for a multi-bias map
 
-        """ 
-        Saves sweep data in Excel sheet
-        Does not save sweep data if OSA is not connected or is busy
+            if biases:
+                self.run_bias_map(osa, biases, data_path, device_id, temperature, timestamp)
+            else:
+                xvals, yvals, row = self.acquire_spectrum(osa)
+                self.stage("save")
+                self.save_spectrum(xvals, yvals, row, data_path, device_id, temperature, timestamp)
+            status = "ok"
+        finally:
+            print("\n--- Cleaning Up ---")
+            self.stage("cleanup")
+            if osa is not None:
+                try:
+                    osa.close()
+                except Exception as e:
+                    print(f"Error closing OSA: {e}")
+            if self.smu1 and self.smu1.instrument:
+                # Turn off outputs first
+                self.smu1.output_off(2)
+                print("SMU1 outputs off.")
+
+                self.set_smu_defaults()
+            self.finish_run(status)
+
+    def run_bias_map(self, osa, biases, data_path, device_id, temperature, timestamp):
         """
-        if not osa.connected:
-            print("OSA Not Connected Error")
-            sys.exit()
-        if osaBusy.is_set():  # OSA Busy
-            print("OSA busy. Exiting function")
-            sys.exit()
-
-        # Create plot
-        osaBusy.set()  # Set OSA busy event
-        (xvals, yvals) = osa.getTraceVals()  # Get trace vals (xvals, yvals)
-        osaBusy.clear()  # Clear OSA busy event
-        fig1, ax1 = plt.subplots()  # Set up plot window
-        ax1.plot(xvals, yvals)
-        ax1.set_xlabel('Wavelength (nm)')
-        ax1.set_ylabel('Amplitude (dBm)')
-        ax1.set_title('Amplitude vs wavelength')
-        plt.grid(True)
+        Spectrum vs laser bias: step the SMU and sweep at each bias within one OSA session. Every trace is saved
+        like a single-bias spectrum (save_spectrum, so into the spectrum archive and/or CSVs per spectrum_output);
+        with CSV output the map is also written as one trace file and one analysis file per device.
+        """
+        traces = []
+        rows = []
+        xvals = None
+        for bias in biases:
+            print(f"\n--- Spectrum at bias {bias} ---")
+            self.set_bias(bias)
+            x, y, row = self.acquire_spectrum(osa)
+            self.stage("save")
+            self.save_spectrum(x, y, row, data_path, device_id, temperature, timestamp, ld_bias=f"{bias:g}")
+            if xvals is None:
+                xvals = x
+            elif len(x) != len(xvals):
+                y = np.interp(xvals, x, y)
+            traces.append(y)
+            rows.append([bias] + row)
+
+        if self.spectrum_output not in ("csv", "both"):
+            return None
+
+        # Consolidated per-device files: one trace column per bias plus one analysis row per bias
+        common_prefix = f"{device_id}_" if device_id else ""
+        bias_label = ";".join(f"{b:g}" for b in biases)
+        common_suffix = f"LDBias({bias_label})mA_{temperature}°C_{timestamp}"
+
+        map_file_path = os.path.join(data_path, f"{common_prefix}_SpectrumMap_{common_suffix}.csv")
+        np.savetxt(map_file_path, np.column_stack([xvals] + traces), delimiter=',',
+                   header='Freq, ' + ', '.join(f'Amplitude_{b:g}' for b in biases), comments='', fmt='%f')
+
+        summary_file_path = os.path.join(data_path, f"{common_prefix}_SpectrumMap_summary_{common_suffix}.csv")
+        np.savetxt(summary_file_path, np.array(rows), delimiter=',',
+                   header='bias, pkpow, pkwl, wl1, pow1, wl2, pow2, dwl, smsr ', comments='', fmt='%f')
+        print(f"Spectrum map saved to {map_file_path}")
+        return map_file_path
 
+    def save_spectrum(self, xvals, yvals, row, data_path, device_id, temperature, timestamp, ld_bias=None):
         # Create files
         common_prefix = f"{device_id}_" if device_id else ""
-        ld_bias = self.params_laser["smu_channel2_source"]
+        if ld_bias is None:
+            ld_bias = self.params_laser["smu_channel2_source"]
         common_suffix = f"LDBias({ld_bias})mA_{temperature}°C_{timestamp}"
         plot_file_name = f"{common_prefix}_Spectrum_{common_suffix}"
 
-        image_file_name = f'{plot_file_name}.jpg'
-        image_file_path = os.path.join(data_path, image_file_name)
-
         csv_file_name = f'{plot_file_name}.csv'
         csv_file_path = os.path.join(data_path, csv_file_name)
-        np.savetxt(csv_file_path, np.transpose([xvals, yvals]), delimiter=',', header='Freq, Amplitude',
-                    comments='', fmt='%f')
-
-        list1 = [pkpow, pkwl]
-        list1.extend(smsr)
-        data_to_save_np = np.array(list1).reshape(1, -1)
         param_file_name = f'{common_prefix}_pkpow_pkwl_smsr_{common_suffix}.csv'
-        param_file_path = os.path.join(data_path, param_file_name)
-        np.savetxt(param_file_path, data_to_save_np, delimiter=',',
-                    header='pkpow, pkwl, wl1, pow1, wl2, pow2, dwl, smsr ',
-                    comments='', fmt='%f')
-        plt.savefig(image_file_path)
-
-        print("\n--- Cleaning Up ---")
-        if smu and smu.instrument:
-            # Turn off outputs first
-            smu.output_off(2)
-            print("SMU1 outputs off.")
 
-            self.set_smu_defaults()
\ No newline at end of file
+        if self.spectrum_output in ("archive", "both"):
+            archive = SpectrumArchive(default_archive_dir(data_path))
+            entry = archive.append(xvals, yvals, row, csv_file_name, param_file_name,
+                                   metadata={"device_id": device_id, "temperature": temperature,
+                                             "timestamp": timestamp, "ld_bias": ld_bias,
+                                             "params_spectrum": dict(self.params_spectrum)})
+            print(f"Spectrum archived to {archive.lot_dir}")
+            if self.spectrum_output == "archive":
+                csv_file_path = archive.record_path(entry)
+
+        if self.spectrum_output in ("csv", "both"):
+            np.savetxt(csv_file_path, np.transpose([xvals, yvals]), delimiter=',', header='Freq, Amplitude',
+                        comments='', fmt='%f')
+
+            data_to_save_np = np.array(row).reshape(1, -1)
+            param_file_path = os.path.join(data_path, param_file_name)
+            np.savetxt(param_file_path, data_to_save_np, delimiter=',',
+                        header='pkpow, pkwl, wl1, pow1, wl2, pow2, dwl, smsr ',
+                        comments='', fmt='%f')
+
+        # The JPG is drawn off the acquisition path: by the background renderer, or lazily when first viewed
+        if self.plot_mode == "background":
+            get_renderer().submit(csv_file_path)
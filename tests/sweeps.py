@@ -0,0 +1,49 @@
+"""Measurement folders written the way the station saves them, and a fake SMU, for the tests"""
+
+import numpy as np
+
+from test_classes import LIV, EAM
+from utils import create_combined_excel_file
+
+CHIPS = ["AA0001", "AA0002"]
+# LIV has no EAM parameter set but the combined file has an EAM voltage column: EAM held at 0 V
+LIV_EAM = {"source_mode": "fix", "start": 0.0, "stop": 0.0, "initval": 0.0, "num_points": 1}
+
+
+def write_lot(data_path, output_format, chips=CHIPS):
+    """One LIV and one EAM sweep per chip, saved with output_format"""
+    liv, eam = LIV(), EAM()
+    for i, chip in enumerate(chips):
+        timestamp = f"20250729T08{i:02d}00"
+        n = liv.params_laser["num_points"]
+        current = np.linspace(0.0, 0.1, n)
+        light = np.clip(current - 0.01, 0.0, None) * 0.3
+        create_combined_excel_file(",".join(map(str, 1.0 + current)), ",".join(map(str, light)), "", timestamp,
+                                   dict(liv.params_photodetector), dict(liv.params_laser), dict(LIV_EAM), False,
+                                   chip, "25.0", data_path, output_format)
+        n = eam.params_eam["num_points"]
+        eam_current = ",".join(map(str, np.linspace(1e-3, 1e-5, n)))
+        create_combined_excel_file(",".join(["1.5"] * n), eam_current, eam_current, timestamp,
+                                   dict(eam.params_photodetector), dict(eam.params_laser), dict(eam.params_eam), True,
+                                   chip, "25.0", data_path, output_format)
+
+
+class FakeSMU:
+    """Answers every fetch with a ramp, enough for the LIV/EAM run_test sequence"""
+
+    def __init__(self, num_points=21):
+        self.instrument = object()
+        self.num_points = num_points
+
+    def query(self, command):
+        return ",".join(f"{v:.6e}" for v in np.linspace(0.0, 1e-3, self.num_points))
+
+    def __getattr__(self, name):
+        # reset, write, config_pulsed_params, output_on/off, set_*...
+        return lambda *args, **kwargs: None
+
+
+def connect_fake_smus(self, connect_eam):
+    self.smu1 = FakeSMU()
+    self.smu2 = FakeSMU() if connect_eam else None
+    return True
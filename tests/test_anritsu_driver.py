@@ -0,0 +1,43 @@
+import numpy as np
+
+from instruments.Anritsu_MS9710C_driver import AnritsuMS9710CDriver
+
+
+class FakeOSA:
+    """Serves a canned response in chunks through read_raw/read_bytes"""
+
+    def __init__(self, response, chunk_size):
+        self.response = response
+        self.chunk_size = chunk_size
+        self.read_termination = "\n"
+
+    def read_raw(self, size=None):
+        chunk, self.response = self.response[:self.chunk_size], self.response[self.chunk_size:]
+        return chunk
+
+    def read_bytes(self, count):
+        chunk, self.response = self.response[:count], self.response[count:]
+        return chunk
+
+
+def driver_reading(response, chunk_size=8):
+    driver = AnritsuMS9710CDriver("ASRL1::INSTR")
+    driver.osa = FakeOSA(response, chunk_size)
+    return driver
+
+
+def test_definite_length_block():
+    payload = np.array([-40000, -39500, -12000], dtype=">i4").tobytes()
+    driver = driver_reading(b"#212" + payload + b"\n")
+    assert driver._readBlock() == payload
+
+
+def test_indefinite_length_block():
+    payload = np.array([-40000, -39500, -12000], dtype=">i4").tobytes()
+    driver = driver_reading(b"#0" + payload + b"\n")
+    assert driver._readBlock() == payload
+
+
+def test_ascii_response():
+    driver = driver_reading(b"-40.00,-39.50,-12.00\r\n")
+    assert driver._readBlock() == b"-40.00,-39.50,-12.00\r\n"
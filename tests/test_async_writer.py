@@ -0,0 +1,40 @@
+import threading
+
+from async_writer import BackgroundWriter
+
+
+def test_close_returns_after_a_timeout_with_a_full_queue():
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocked_write():
+        started.set()
+        release.wait(10)
+
+    writer = BackgroundWriter(max_pending=1)
+    writer.submit(blocked_write)
+    started.wait(5)
+    writer.submit(blocked_write)  # fills the queue behind the running write
+
+    closer = threading.Thread(target=writer.close, kwargs={"timeout": 0.05}, daemon=True)
+    closer.start()
+    closer.join(2)
+    closed_in_time = not closer.is_alive()
+    release.set()
+
+    assert closed_in_time
+    for worker in writer._workers:
+        worker.join(2)
+        assert not worker.is_alive()
+
+
+def test_close_finishes_queued_writes():
+    written = []
+    writer = BackgroundWriter()
+    for i in range(3):
+        writer.submit(written.append, i)
+    writer.close()
+    assert written == [0, 1, 2]
+    for worker in writer._workers:
+        worker.join(2)
+        assert not worker.is_alive()
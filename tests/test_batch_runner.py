@@ -0,0 +1,51 @@
+import json
+import os
+
+import numpy as np
+
+import batch_runner
+import test_classes
+from sweeps import connect_fake_smus
+from test_classes import Base, LIV
+
+
+def write_job_file(tmp_path, jobs, **defaults):
+    path = tmp_path / "jobs.json"
+    path.write_text(json.dumps({**defaults, "jobs": jobs}), encoding="utf-8")
+    return str(path)
+
+
+def test_failed_smu_connection_fails_the_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(Base, "connect_smus", lambda self, connect_eam: False)
+    job_file = write_job_file(tmp_path, [{"test": "LIV", "devices": ["AA0001", "AA0002"]},
+                                         {"test": "EAM", "device_id": "AA0001"}],
+                              data_path=str(tmp_path / "Lot42"))
+
+    assert batch_runner.run_jobs(batch_runner.load_job_file(job_file)) == 3
+    assert batch_runner.main([job_file]) != 0
+
+
+def test_successful_runs_pass_the_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(Base, "connect_smus", connect_fake_smus)
+    monkeypatch.setattr(test_classes.time, "sleep", lambda seconds: None)
+    job_file = write_job_file(tmp_path, [{"test": "EAM", "devices": ["AA0001", "AA0002"]}],
+                              data_path=str(tmp_path / "Lot42"), output_format="xlsx")
+
+    assert batch_runner.main([job_file]) == 0
+    assert len([name for name in os.listdir(tmp_path / "Lot42") if name.endswith(".xlsx")]) == 2
+
+
+def test_data_path_without_trailing_separator(tmp_path):
+    from utils import create_combined_excel_file
+
+    lot_dir = tmp_path / "Lot42"
+    lot_dir.mkdir()
+    liv = LIV()
+    liv_eam = {"source_mode": "fix", "start": 0.0, "stop": 0.0, "initval": 0.0, "num_points": 1}
+    n = liv.params_laser["num_points"]
+    values = ",".join(str(v) for v in np.linspace(0.0, 1.0, n))
+    create_combined_excel_file(values, values, "", "20250729T080000", dict(liv.params_photodetector),
+                               dict(liv.params_laser), liv_eam, False, "AA1234", "25.0", str(lot_dir), "xlsx")
+
+    assert [name for name in os.listdir(lot_dir) if name.startswith("AA1234_")]
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("Lot42AA1234")]
@@ -0,0 +1,19 @@
+import csv
+
+from extraction_pipeline import CsvSink, ExtractionPipeline
+from sweeps import CHIPS, write_lot
+
+
+def test_store_and_workbook_copies_are_extracted_once(tmp_path):
+    lot_dir = tmp_path / "Lot42"
+    lot_dir.mkdir()
+    write_lot(str(lot_dir), "both")
+    output_path = str(tmp_path / "measurements.csv")
+
+    stats = ExtractionPipeline().run([str(lot_dir)], [CsvSink(output_path)])
+
+    with open(output_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert stats["written"] == 2 * len(CHIPS)
+    assert sorted(row["Chip Name"] for row in rows if row["Test"] == "LIV") == CHIPS
+    assert sorted(row["Chip Name"] for row in rows if row["Test"] == "EAM") == CHIPS
@@ -0,0 +1,41 @@
+import os
+
+from openpyxl import load_workbook
+
+from data_extraction import Extraction
+from lot_summary import SUMMARY_FILENAME, update_lot_summary
+from sweeps import CHIPS, write_lot
+
+
+def sheet_chips(path, sheet):
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = list(workbook[sheet].iter_rows(values_only=True))
+    finally:
+        workbook.close()
+    return sorted(row[0] for row in rows[1:])
+
+
+def test_one_row_per_chip_with_store_and_workbook_output(tmp_path):
+    lot_dir = tmp_path / "Lot42"
+    lot_dir.mkdir()
+    write_lot(str(lot_dir), "both")
+
+    output_path, imported, rows = update_lot_summary(str(lot_dir))
+
+    assert rows["Threshold"] == len(CHIPS)
+    assert rows["Final"] == len(CHIPS)
+    assert sheet_chips(output_path, "Threshold") == CHIPS
+    assert sheet_chips(output_path, "Final") == CHIPS
+    assert sheet_chips(output_path, "Extinction") == CHIPS
+
+
+def test_extraction_run_updates_the_summary(tmp_path):
+    lot_dir = tmp_path / "Lot42"
+    lot_dir.mkdir()
+    write_lot(str(lot_dir), "both")
+
+    Extraction().run_test(os.path.join(str(lot_dir), ""))
+    Extraction().run_test(os.path.join(str(lot_dir), ""))
+
+    assert sheet_chips(str(lot_dir / SUMMARY_FILENAME), "Threshold") == CHIPS
@@ -0,0 +1,26 @@
+from results_db import ResultsDB
+from sweeps import CHIPS, write_lot
+
+
+def test_sweeps_saved_to_store_and_workbook_are_imported_once(tmp_path):
+    lot_dir = tmp_path / "Lot42"
+    lot_dir.mkdir()
+    write_lot(str(lot_dir), "both")
+
+    with ResultsDB(str(tmp_path / "results.sqlite")) as db:
+        counts = db.import_folder(str(lot_dir))
+        assert counts["imported"] == 2 * len(CHIPS)
+        assert sorted(row["chip"] for row in db.query(test="LIV")) == CHIPS
+        assert sorted(row["chip"] for row in db.query(test="EAM")) == CHIPS
+        # and again, unchanged
+        assert db.import_folder(str(lot_dir))["unchanged"] == 2 * len(CHIPS)
+
+
+def test_store_only_sweeps_are_imported(tmp_path):
+    lot_dir = tmp_path / "Lot42"
+    lot_dir.mkdir()
+    write_lot(str(lot_dir), "store")
+
+    with ResultsDB(str(tmp_path / "results.sqlite")) as db:
+        db.import_folder(str(lot_dir))
+        assert sorted(row["chip"] for row in db.query(test="LIV")) == CHIPS
@@ -0,0 +1,51 @@
+import threading
+
+import test_classes
+from async_writer import get_writer
+from run_telemetry import get_throughput_monitor
+from sweeps import connect_fake_smus
+from test_classes import Base, EAM
+
+
+def run_with_background_write(tmp_path, monkeypatch, write):
+    """Run an EAM test against a fake SMU whose background write is write(); returns (controller, release event)"""
+    monkeypatch.setattr(Base, "connect_smus", connect_fake_smus)
+    monkeypatch.setattr(test_classes.time, "sleep", lambda seconds: None)
+    release = threading.Event()
+
+    def blocked_write(*args):
+        release.wait(10)
+        return write(*args)
+
+    monkeypatch.setattr(test_classes, "create_combined_excel_file", blocked_write)
+    controller = EAM()
+    controller.background_write = True
+    controller.run_test(data_path=str(tmp_path) + "/", device_id="AA0001", temperature="25.0")
+    return controller, release
+
+
+def test_run_is_finished_after_the_background_write(tmp_path, monkeypatch):
+    monitor = get_throughput_monitor()
+    runs_before = len(monitor.runs)
+    controller, release = run_with_background_write(tmp_path, monkeypatch, lambda *args: True)
+
+    run = controller.last_run
+    assert run.end is None
+    assert len(monitor.runs) == runs_before
+    release.set()
+    get_writer().flush()
+
+    assert run.end is not None and run.status == "ok"
+    assert "write" in run.stage_totals()
+    assert monitor.runs[-1][2] == "ok"
+
+
+def test_failed_background_write_fails_the_run(tmp_path, monkeypatch):
+    controller, release = run_with_background_write(tmp_path, monkeypatch, lambda *args: False)
+
+    release.set()
+    get_writer().flush()
+    get_writer().pop_failures()
+
+    assert controller.last_run.status == "error"
+    assert get_throughput_monitor().runs[-1][2] == "error"
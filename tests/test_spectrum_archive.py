@@ -0,0 +1,60 @@
+import numpy as np
+
+from spectrum_archive import SpectrumArchive
+
+ROW = [-3.0, 1310.0, 1309.9, -40.0, 1310.1, -40.0, 0.2, 37.0]
+
+
+def make_trace(i, n=50):
+    wavelength = np.linspace(1300.0, 1320.0, n) + i
+    levels = -60.0 + i + np.arange(n) / 100.0
+    return wavelength, levels
+
+
+def append_trace(archive, i):
+    wavelength, levels = make_trace(i)
+    archive.append(wavelength, levels, ROW, f"AA{i:04d}__Spectrum.csv", f"AA{i:04d}__pkpow_pkwl_smsr.csv")
+
+
+def test_levels_matrix_is_a_view_when_contiguous(tmp_path):
+    archive = SpectrumArchive(str(tmp_path))
+    for i in range(3):
+        append_trace(archive, i)
+
+    wavelength, levels = archive.levels_matrix()
+
+    assert isinstance(levels.base, np.ndarray) and not levels.flags.owndata
+    for i in range(3):
+        np.testing.assert_array_equal(wavelength[i], make_trace(i)[0])
+        np.testing.assert_array_equal(levels[i], make_trace(i)[1])
+
+
+def test_levels_matrix_skips_orphan_block(tmp_path):
+    archive = SpectrumArchive(str(tmp_path))
+    append_trace(archive, 0)
+    # Append interrupted after the data block was written but before its index line
+    orphan = np.vstack(make_trace(99)).astype('<f8')
+    with open(archive.data_path, "ab") as f:
+        f.write(orphan.tobytes())
+    append_trace(archive, 1)
+    append_trace(archive, 2)
+
+    wavelength, levels = archive.levels_matrix()
+
+    assert levels.shape == (3, 50)
+    for i in range(3):
+        np.testing.assert_array_equal(wavelength[i], make_trace(i)[0])
+        np.testing.assert_array_equal(levels[i], make_trace(i)[1])
+
+
+def test_levels_matrix_ignores_trailing_orphan_block(tmp_path):
+    archive = SpectrumArchive(str(tmp_path))
+    append_trace(archive, 0)
+    append_trace(archive, 1)
+    with open(archive.data_path, "ab") as f:
+        f.write(np.vstack(make_trace(99)).astype('<f8').tobytes())
+
+    wavelength, levels = archive.levels_matrix()
+
+    assert levels.shape == (2, 50)
+    np.testing.assert_array_equal(levels[1], make_trace(1)[1])
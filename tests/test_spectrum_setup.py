@@ -0,0 +1,24 @@
+import threading
+import time
+
+import pytest
+
+from test_classes import Spectrum
+
+
+def test_smu_setup_finishes_before_a_timeout_is_raised(monkeypatch):
+    smu_setup_done = threading.Event()
+
+    def slow_setup_smu(self):
+        time.sleep(0.3)
+        smu_setup_done.set()
+
+    monkeypatch.setattr(Spectrum, "setup_smu", slow_setup_smu)
+    monkeypatch.setattr(Spectrum, "connect_and_configure_osa", lambda self: None)
+    spectrum = Spectrum()
+    spectrum.smu_setup_timeout = 0.05
+
+    with pytest.raises(TimeoutError):
+        spectrum.setup_concurrently()
+    # the cleanup after the timeout resets the SMU; the setup thread must no longer be using it
+    assert smu_setup_done.is_set()
@@ -0,0 +1,77 @@
+"""
+Window showing the instrument I/O trace of the last runs (see scpi_trace.py):
+per-command latency percentiles and per-phase totals, with CSV/JSON export.
+"""
+
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+from scpi_trace import get_tracer
+
+COMMAND_COLUMNS = [("instrument", 170), ("command", 150), ("count", 60), ("total_ms", 80), ("p50_ms", 70),
+                   ("p95_ms", 70), ("p99_ms", 70), ("max_ms", 70), ("bytes_sent", 80), ("bytes_received", 100),
+                   ("visa_errors", 80), ("error_queue_hits", 110)]
+PHASE_COLUMNS = [("phase", 120), ("calls", 70), ("io_ms", 90), ("bytes_sent", 90), ("bytes_received", 110),
+                 ("errors", 70)]
+
+
+class TraceViewer:
+    def __init__(self, parent, tracer=None):
+        self.tracer = tracer or get_tracer()
+        self.window = tk.Toplevel(parent)
+        self.window.title("Instrument I/O Trace")
+        self.window.geometry("1200x600")
+
+        controls = tk.Frame(self.window)
+        controls.pack(fill='x', padx=8, pady=8)
+        ttk.Button(controls, text="Refresh", command=self.refresh).pack(side='left', padx=(0, 5))
+        ttk.Button(controls, text="Export CSV...", command=lambda: self.export(".csv")).pack(side='left', padx=5)
+        ttk.Button(controls, text="Export JSON...", command=lambda: self.export(".json")).pack(side='left', padx=5)
+        ttk.Button(controls, text="Clear", command=self.clear).pack(side='left', padx=5)
+        self.info_var = tk.StringVar()
+        tk.Label(controls, textvariable=self.info_var, font=('Arial', 9)).pack(side='left', padx=15)
+
+        self.phase_tree = self.make_table("Per test phase", PHASE_COLUMNS, height=6)
+        self.command_tree = self.make_table("Per command (slowest total first)", COMMAND_COLUMNS, height=16)
+        self.refresh()
+
+    def make_table(self, title, columns, height):
+        frame = ttk.LabelFrame(self.window, text=title, padding="5")
+        frame.pack(fill='both', expand=True, padx=8, pady=(0, 8))
+        tree = ttk.Treeview(frame, columns=[name for name, _ in columns], show='headings', height=height)
+        for name, width in columns:
+            tree.heading(name, text=name)
+            tree.column(name, width=width, anchor='w' if name in ("instrument", "command", "phase") else 'e')
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side='right', fill='y')
+        tree.pack(side='left', fill='both', expand=True)
+        return tree
+
+    @staticmethod
+    def fill(tree, columns, rows):
+        tree.delete(*tree.get_children())
+        for row in rows:
+            tree.insert('', 'end', values=[row[name] for name, _ in columns])
+
+    def refresh(self):
+        events = self.tracer.snapshot()
+        self.fill(self.phase_tree, PHASE_COLUMNS, self.tracer.phase_summary(events))
+        self.fill(self.command_tree, COMMAND_COLUMNS, self.tracer.command_summary(events))
+        state = "on" if self.tracer.enabled else "off"
+        self.info_var.set(f"Tracing {state}, {len(events)} events (buffer {self.tracer.events.maxlen})")
+
+    def export(self, extension):
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=extension,
+                                            filetypes=[(extension[1:].upper(), f"*{extension}")])
+        if not path:
+            return
+        try:
+            self.tracer.export(path)
+        except OSError as e:
+            messagebox.showerror("Export Error", f"Could not write {path}:\n\n{e}", parent=self.window)
+            return
+        self.info_var.set(f"Exported to {path}")
+
+    def clear(self):
+        self.tracer.clear()
+        self.refresh()
@@ -1,5 +1,10 @@
-import pandas as pd
+import os
 import numpy as np
+from device_metrics import record_device_metrics
+from measurement_store import MeasurementStore, default_store_root, lot_from_path
+
+# Called with a measurement dict right after each sweep is saved, while the arrays are still in memory
+POST_ACQUISITION_HOOKS = [record_device_metrics]
 
 # --- Utility Functions (RESTORED TO ORIGINAL) ---
 def string_to_num(s, target_type=float):
@@ -14,25 +19,98 @@ def string_to_num(s, target_type=float):
         except ValueError:
             return None  # Indicates conversion failure
 
+EMPTY_DATA = np.empty(0)
+
+
 def parse_measurement_data(data_string):
+    """
+    Parse fetched measurement data into a float64 array.
+    Accepts a comma separated ASCII string, raw little-endian float64 bytes (binary transfer),
+    or an already parsed sequence/array.
+    """
     try:
+        if isinstance(data_string, np.ndarray):  # Already parsed
+            return data_string.astype(float, copy=False).ravel()
         if isinstance(data_string, (list, tuple)):  # Already parsed
-            return [float(x) for x in data_string]
-        if not data_string: return []
-        values = [float(x.strip()) for x in data_string.strip().split(',')]
+            return np.asarray(data_string, dtype=float)
+        if isinstance(data_string, (bytes, bytearray, memoryview)):
+            return np.frombuffer(data_string, dtype='<f8')
+        if not data_string: return EMPTY_DATA
+        data_string = data_string.strip()
+        values = np.fromstring(data_string, dtype=float, sep=',')
+        if values.size != data_string.count(',') + 1:  # fromstring stops silently at a bad token
+            raise ValueError(f"parsed {values.size} of {data_string.count(',') + 1} values")
         return values
-    except ValueError as e:
+    except (ValueError, DeprecationWarning) as e:
         print(f"Error parsing measurement data string '{data_string}': {e}")
-        return []
+        return EMPTY_DATA
     except TypeError:
         print(f"Invalid data type for parsing: {data_string}")
-        return []
+        return EMPTY_DATA
+
+
+def fill_buffer(values, length, scale=1.0):
+    """
+    Copy values into a preallocated NaN-filled buffer of the given length, truncating extra points.
+    """
+    out = np.full(length, np.nan)
+    n = min(len(values), length)
+    if n:
+        np.multiply(values[:n], scale, out=out[:n])
+    return out
+
+
+class SweepRecord:
+    """
+    The six channels of one sweep, in the combined column order.
+    """
+    __slots__ = ("eam_voltage_set_V", "eam_current_mA", "laser_current_set_mA",
+                 "laser_voltage_V", "pd_voltage_set_V", "pd_current_mA")
+
+    def __init__(self, eam_voltage_set_V, eam_current_mA, laser_current_set_mA,
+                 laser_voltage_V, pd_voltage_set_V, pd_current_mA):
+        self.eam_voltage_set_V = eam_voltage_set_V
+        self.eam_current_mA = eam_current_mA
+        self.laser_current_set_mA = laser_current_set_mA
+        self.laser_voltage_V = laser_voltage_V
+        self.pd_voltage_set_V = pd_voltage_set_V
+        self.pd_current_mA = pd_current_mA
+
+    def __len__(self):
+        return len(self.laser_current_set_mA)
+
+    def columns(self):
+        return {
+            'SMU2_Ch1_EAM_Voltage_Set_V': self.eam_voltage_set_V,
+            'SMU2_Ch1_EAM_Current_Meas_mA': self.eam_current_mA,
+            'SMU1_Ch2_Laser_Current_Set_mA': self.laser_current_set_mA,
+            'SMU1_Ch2_Laser_Voltage_Meas_V': self.laser_voltage_V,
+            'SMU1_Ch1_PD_Voltage_Set_V': self.pd_voltage_set_V,
+            'SMU1_Ch1_PD_Current_Meas_mA': self.pd_current_mA,
+        }
+
+    def as_array(self):
+        """(6, num_points) float64 block in column order"""
+        return np.vstack([self.eam_voltage_set_V, self.eam_current_mA, self.laser_current_set_mA,
+                          self.laser_voltage_V, self.pd_voltage_set_V, self.pd_current_mA])
+
+
+def run_post_acquisition_hooks(measurement):
+    for hook in POST_ACQUISITION_HOOKS:
+        try:
+            hook(measurement)
+        except Exception as e:
+            print(f"Post-acquisition hook {getattr(hook, '__name__', hook)} failed: {e}")
 
 
 # ✨ Modified function to multiply PD current by 1.69
 def create_combined_excel_file(laser_data, detector_data, eam_data, timestamp,
                                detector_params, laser_params, eam_params,
-                               is_eam, device_id, temperature, base_path_config):
+                               is_eam, device_id, temperature, base_path_config, output_format="store"):
+    """
+    Save one sweep. output_format is "store" (measurement store only, Excel exported on demand),
+    "xlsx" (one workbook per sweep) or "both".
+    """
     try:
         laser_voltages_fetched = parse_measurement_data(laser_data)
         detector_currents_fetched = parse_measurement_data(detector_data)
@@ -56,31 +134,19 @@ def create_combined_excel_file(laser_data, detector_data, eam_data, timestamp,
             detector_voltage_setpoints = np.linspace(detector_params['start'], detector_params['stop'],
                                                      num_points_sweep)
 
-        def pad_or_truncate(data_list, length):
-            if not isinstance(data_list, list): data_list = []
-            if len(data_list) < length:
-                return data_list + [np.nan] * (length - len(data_list))
-            return data_list[:length]
-
-        laser_voltages_final = pad_or_truncate(laser_voltages_fetched, num_points_sweep)
-        detector_currents_final = pad_or_truncate(detector_currents_fetched, num_points_sweep)
-        eam_currents_final = pad_or_truncate(eam_currents_fetched, num_points_sweep)
-
-        laser_currents_mA = laser_current_setpoints
         # ✨ Apply 1.69 multiplication factor to PD current readings
-        detector_currents_mA = np.array(detector_currents_final) * 1000
-        eam_currents_mA = np.array(eam_currents_final) * 1000
-
-        combined_data = {
-            'SMU2_Ch1_EAM_Voltage_Set_V': eam_voltage_setpoints,
-            'SMU2_Ch1_EAM_Current_Meas_mA': eam_currents_mA,
-            'SMU1_Ch2_Laser_Current_Set_mA': laser_currents_mA,
-            'SMU1_Ch2_Laser_Voltage_Meas_V': laser_voltages_final,
-            'SMU1_Ch1_PD_Voltage_Set_V': detector_voltage_setpoints,
-            'SMU1_Ch1_PD_Current_Meas_mA': np.abs(detector_currents_mA),
-        }
-
-        combined_df = pd.DataFrame(combined_data)
+        detector_currents_mA = fill_buffer(detector_currents_fetched, num_points_sweep, 1000)
+        np.abs(detector_currents_mA, out=detector_currents_mA)
+
+        sweep = SweepRecord(
+            eam_voltage_set_V=eam_voltage_setpoints,
+            eam_current_mA=fill_buffer(eam_currents_fetched, num_points_sweep, 1000),
+            laser_current_set_mA=laser_current_setpoints,
+            laser_voltage_V=fill_buffer(laser_voltages_fetched, num_points_sweep),
+            pd_voltage_set_V=detector_voltage_setpoints,
+            pd_current_mA=detector_currents_mA,
+        )
+        combined_data = sweep.columns()
 
         pulse_width_s = laser_params.get('pulse_width', 0)
         period_s = laser_params.get('trigger_period', 0)
@@ -107,8 +173,8 @@ def create_combined_excel_file(laser_data, detector_data, eam_data, timestamp,
 
             # Only add "pulsed_" prefix if actually in pulsed mode
             mode_prefix = "pulsed_" if is_pulsed else ""
-            filename = (
-                f"{base_path}{file_prefix}{mode_prefix}LIV_LDBias({ld_start_mA},{ld_stop_mA})mA_"
+            filename = os.path.join(base_path,
+                f"{file_prefix}{mode_prefix}LIV_LDBias({ld_start_mA},{ld_stop_mA})mA_"
                 f"EAMBias({eam_bias_V})V_PDBias({pd_bias_V})V_{common_suffix}"
             )
         else:
@@ -119,13 +185,39 @@ def create_combined_excel_file(laser_data, detector_data, eam_data, timestamp,
 
             # Only add "pulsed_" prefix if actually in pulsed mode
             mode_prefix = "pulsed_" if is_pulsed else ""
-            filename = (
-                f"{base_path}{file_prefix}{mode_prefix}EAM_LDBias({ld_bias_mA})mA_"
+            filename = os.path.join(base_path,
+                f"{file_prefix}{mode_prefix}EAM_LDBias({ld_bias_mA})mA_"
                 f"EAMBias({eam_start_V},{eam_stop_V})V_PDBias({pd_bias_V})V_{common_suffix}"
             )
 
-        combined_df.to_excel(filename, index=False)
-        print(f"\nCombined Excel file created successfully: {filename}")
+        if output_format in ("store", "both"):
+            MeasurementStore(default_store_root(base_path)).append(
+                combined_data, os.path.basename(filename), lot_from_path(base_path), timestamp,
+                metadata={
+                    "test": "EAM" if is_eam else "LIV",
+                    "device_id": device_id,
+                    "temperature": temperature,
+                    "params_photodetector": detector_params,
+                    "params_laser": laser_params,
+                    "params_eam": eam_params,
+                })
+            print(f"\nMeasurement stored: {os.path.basename(filename)}")
+        if output_format in ("xlsx", "both"):
+            import pandas as pd
+            combined_df = pd.DataFrame(combined_data)
+            combined_df.to_excel(filename, index=False)
+            print(f"\nCombined Excel file created successfully: {filename}")
+
+        run_post_acquisition_hooks({
+            "filename": filename,
+            "data_path": base_path,
+            "device_id": device_id,
+            "temperature": temperature,
+            "timestamp": timestamp,
+            "is_eam": is_eam,
+            "ld_bias_mA": laser_params['initval'] if is_eam else None,
+            "columns": combined_data,
+        })
         return True
 
     except Exception as e:
@@ -0,0 +1,235 @@
+"""
+Record and replay of instrument sessions.
+
+While recording, every VISA resource opened through open_resource() is wrapped so that its full
+transcript (call, command, response, duration) is kept; save() writes it to a gzip compressed JSON file.
+While replaying, open_resource() returns ReplayResource objects that answer from such a file, with the
+recorded latencies (scaled by latency_scale), so run_test can run on a laptop without instruments.
+
+    from visa_session import start_recording, stop_recording, start_replay
+    start_recording(); ...run_test...; stop_recording("liv_AA1234.visa.json.gz")
+    start_replay("liv_AA1234.visa.json.gz"); ...run_test with the same parameters...
+
+or from the command line: python batch_runner.py jobs.yaml --record FILE / --replay FILE
+"""
+
+import base64
+import gzip
+import json
+import threading
+import time
+
+FORMAT_VERSION = 1
+IO_CALLS = ("write", "query", "read", "read_raw", "read_bytes", "write_raw")
+
+
+class ReplayMismatch(Exception):
+    pass
+
+
+def _encode(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"b64": base64.b64encode(bytes(value)).decode("ascii")}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and "b64" in value:
+        return base64.b64decode(value["b64"])
+    return value
+
+
+class SessionRecorder:
+    def __init__(self):
+        self.transcripts = {}  # resource name -> [[call, command, response, duration_s], ...]
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def wrap(self, resource, name):
+        with self._lock:
+            transcript = self.transcripts.setdefault(name, [])
+        return RecordingResource(resource, transcript)
+
+    def save(self, path, metadata=None):
+        session = {"version": FORMAT_VERSION, "recorded": self.started, "metadata": metadata or {},
+                   "resources": self.transcripts}
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(session, f, separators=(",", ":"))
+        return path
+
+
+class RecordingResource:
+    """
+    Proxy around an opened resource that appends every I/O call to a transcript.
+    """
+
+    def __init__(self, resource, transcript):
+        object.__setattr__(self, "_resource", resource)
+        object.__setattr__(self, "_transcript", transcript)
+
+    def __getattr__(self, attr):
+        value = getattr(self._resource, attr)
+        if attr in IO_CALLS and callable(value):
+            return lambda *args, **kwargs: self._call(attr, value, args, kwargs)
+        return value
+
+    def __setattr__(self, attr, value):
+        setattr(self._resource, attr, value)
+
+    def _call(self, call, func, args, kwargs):
+        command = args[0] if call in ("write", "query") and args else None
+        if call == "write_raw" and args:
+            command = _encode(args[0])
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self._transcript.append([call, command, _encode(result), round(time.perf_counter() - start, 6)])
+        return result
+
+
+class ReplaySession:
+    def __init__(self, path, latency_scale=1.0, strict=False, lookahead=8):
+        """
+        :param latency_scale: 1.0 replays the recorded latencies, 0 answers immediately
+        :param strict: raise on the first command that differs from the recording; otherwise skip up to
+                       lookahead recorded calls to find it
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            session = json.load(f)
+        if session.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported session format {session.get('version')}")
+        self.path = path
+        self.metadata = session.get("metadata", {})
+        self.recorded = session.get("recorded")
+        self.transcripts = session["resources"]
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.lookahead = lookahead
+        self.positions = {name: 0 for name in self.transcripts}
+        self.skipped = {name: 0 for name in self.transcripts}
+        self._lock = threading.Lock()
+
+    def has(self, name):
+        return name in self.transcripts
+
+    def open(self, name):
+        if name not in self.transcripts:
+            raise ReplayMismatch(f"{name} was not recorded in {self.path} (recorded: {list(self.transcripts)})")
+        return ReplayResource(self, name)
+
+    def next_response(self, name, call, command):
+        with self._lock:
+            transcript = self.transcripts[name]
+            position = self.positions[name]
+            window = transcript[position:position + (1 if self.strict else self.lookahead + 1)]
+            offset = next((i for i, e in enumerate(window) if e[0] == call and e[1] == command), None)
+            if offset is None:
+                expected = transcript[position][:2] if position < len(transcript) else "end of recording"
+                raise ReplayMismatch(f"{name}: {call} {command!r} does not match the recording "
+                                     f"(expected {expected}, call {position + 1})")
+            entry = window[offset]
+            self.positions[name] = position + offset + 1
+            self.skipped[name] += offset
+        if self.latency_scale:
+            time.sleep(entry[3] * self.latency_scale)
+        return _decode(entry[2])
+
+    def report(self):
+        """Recorded calls left unused and skipped per resource; both 0 for an exact replay"""
+        return {name: {"calls": len(t), "unused": len(t) - self.positions[name], "skipped": self.skipped[name]}
+                for name, t in self.transcripts.items()}
+
+
+class ReplayResource:
+    """
+    Stand-in for a VISA resource that answers from a recorded transcript.
+    Attributes (timeout, terminations, serial settings...) are accepted and kept.
+    """
+
+    def __init__(self, session, name):
+        self._session = session
+        self.resource_name = name
+        self.timeout = None
+        self.read_termination = '\n'
+        self.write_termination = '\n'
+
+    def write(self, command, *args, **kwargs):
+        return self._session.next_response(self.resource_name, "write", command)
+
+    def query(self, command, *args, **kwargs):
+        return self._session.next_response(self.resource_name, "query", command)
+
+    def read(self, *args, **kwargs):
+        return self._session.next_response(self.resource_name, "read", None)
+
+    def read_raw(self, *args, **kwargs):
+        return self._session.next_response(self.resource_name, "read_raw", None)
+
+    def read_bytes(self, *args, **kwargs):
+        return self._session.next_response(self.resource_name, "read_bytes", None)
+
+    def write_raw(self, message):
+        return self._session.next_response(self.resource_name, "write_raw", _encode(message))
+
+    def close(self):
+        pass
+
+
+_recorder = None
+_replay = None
+
+
+def start_recording():
+    global _recorder
+    _recorder = SessionRecorder()
+    return _recorder
+
+
+def stop_recording(path=None, metadata=None):
+    """Stop recording; saves the transcript to path if given. Returns the recorder."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None and path:
+        recorder.save(path, metadata)
+    return recorder
+
+
+def start_replay(path, latency_scale=1.0, strict=False):
+    global _replay
+    _replay = ReplaySession(path, latency_scale=latency_scale, strict=strict)
+    return _replay
+
+
+def stop_replay():
+    global _replay
+    replay, _replay = _replay, None
+    return replay
+
+
+def open_resource(resource_name, resource=None):
+    """
+    Open a VISA resource (or use an already opened / simulated one), replayed or recorded when a
+    session is active.
+    """
+    if _replay is not None and (resource is None or _replay.has(resource_name)):
+        return _replay.open(resource_name)
+    if resource is None:
+        import pyvisa
+        resource = pyvisa.ResourceManager().open_resource(resource_name)
+    if _recorder is not None:
+        resource = _recorder.wrap(resource, resource_name)
+    return resource
+
+
+if __name__ == "__main__":
+    # usage: python visa_session.py session.visa.json.gz   -- summary of a recorded session
+    import sys
+
+    replay = ReplaySession(sys.argv[1])
+    print(f"{sys.argv[1]}  recorded {time.ctime(replay.recorded)}  {replay.metadata}")
+    for name, transcript in replay.transcripts.items():
+        io_time = sum(entry[3] for entry in transcript)
+        calls = {}
+        for entry in transcript:
+            calls[entry[0]] = calls.get(entry[0], 0) + 1
+        print(f"  {name}: {len(transcript)} calls ({', '.join(f'{k} {v}' for k, v in calls.items())}), "
+              f"I/O time {io_time:.2f} s")